@@ -23,6 +23,23 @@ def create_app(test_config=None):
         UPLOAD_FOLDER=os.path.join(os.getcwd(), 'app', 'uploads'),
         ALLOWED_EXTENSIONS={'ifc'},
         MAX_CONTENT_LENGTH=100 * 1024 * 1024,  # 100MB max upload
+        GEOMETRY_ENGINE='create_shape',  # 'create_shape' or opt-in 'iterator' (multi-core)
+        GEOMETRY_WORKERS=None,  # None uses all available CPU cores
+        EXTRACTION_MODE='geometry',  # 'geometry', 'quantity_set' (prefer Qto_* quantities) or 'bounding_box'
+        ANALYSIS_PROCESSES=1,  # Worker processes for sharded analysis
+        EXCLUDED_ELEMENT_CLASSES=None,  # None skips openings, surface features and virtual elements
+        GEOMETRY_PROFILE='precise',  # Default tessellation profile: 'precise', 'balanced' or 'fast'
+        GEOMETRY_BUDGET=None,  # Highest estimated tessellation cost per element, None for no limit
+        GEOMETRY_TIME_LIMIT=60,  # Seconds an over-budget element may take to tessellate in full, None for no limit
+        MAX_ANALYSIS_ELEMENTS=None,  # Uploads with more elements to analyze are refused, None for no limit
+        MESH_CACHE_PATH=None,  # Opt-in mesh statistics cache file, None disables the cache
+        MESH_CACHE_SIZE=512 * 1024 * 1024,  # Size bound of the mesh cache in bytes
+        TYPE_LIBRARY_PATH=None,  # Opt-in type geometry library file, None disables the library
+        TYPE_LIBRARY_SIZE=256 * 1024 * 1024,  # Size bound of the type geometry library in bytes
+        REVISION_STORE_PATH=None,  # Opt-in revision store file, None analyzes every revision in full
+        CHECKPOINT_PATH=None,  # Opt-in checkpoint file, None disables checkpoints
+        CHECKPOINT_INTERVAL=60,  # Seconds between checkpoints of a running analysis
+        TASK_REGISTRY_PATH=None,  # Opt-in task registry file, None keeps tasks in memory only
     )
 
     if test_config is None:
@@ -41,6 +58,9 @@ def create_app(test_config=None):
     app.register_blueprint(api.bp)
     app.register_blueprint(errors.bp)
 
+    # Analyses interrupted by a restart resume from their checkpoints
+    main.restore_analysis_tasks(app)
+
     # Register error handlers
     from app.routes.errors import not_found_error, internal_error, forbidden_error, too_large_error, bad_request_error
     app.register_error_handler(404, not_found_error)
@@ -0,0 +1,159 @@
+"""
+Checkpoints of long-running analyses.
+
+The recorded results of analyzed elements are written to an SQLite database
+at regular intervals while a file is analyzed, keyed by the content hash of
+the file, the analysis settings and the element's entity id. If the process
+dies, analyzing the same file again with the same settings replays the
+checkpointed elements and only analyzes the rest. A checkpoint is cleared once
+its analysis completes, and checkpoints of abandoned analyses expire.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from app.models.mesh_cache import file_content_hash
+
+# Seconds between checkpoints of an analysis
+DEFAULT_CHECKPOINT_INTERVAL = 60
+
+# Seconds after which the checkpoint of an analysis that was never resumed expires
+CHECKPOINT_MAX_AGE = 7 * 24 * 3600
+
+# Version of the checkpointed element records; records of another version are not readable
+RECORD_VERSION = 2
+
+
+class AnalysisCheckpoint:
+    """Checkpointed element records of the analysis of one file."""
+
+    def __init__(self, checkpoint_path, ifc_file_path, settings_key, interval=DEFAULT_CHECKPOINT_INTERVAL,
+                 logger=None):
+        """
+        Args:
+            checkpoint_path (str): Path to the SQLite checkpoint database
+            ifc_file_path (str): Path to the analyzed IFC file
+            settings_key (str): Identifies the analysis settings the records were measured with
+            interval (float): Seconds between checkpoints
+            logger: Logger for checkpoint warnings
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.file_hash = file_content_hash(ifc_file_path)
+        self.settings_key = settings_key
+        self.interval = interval
+        self._last_write = time.monotonic()
+
+        directory = os.path.dirname(checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Worker processes checkpoint the elements of their shards
+        self.conn = sqlite3.connect(checkpoint_path, timeout=30)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                file_hash TEXT NOT NULL,
+                settings_key TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (file_hash, settings_key)
+            );
+
+            CREATE TABLE IF NOT EXISTS checkpoint_elements (
+                file_hash TEXT NOT NULL,
+                settings_key TEXT NOT NULL,
+                element_id INTEGER NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (file_hash, settings_key, element_id)
+            );
+        ''')
+        self._expire()
+
+    @staticmethod
+    def make_settings_key(**settings):
+        """Build a settings key from the keyword arguments that affect element results."""
+        return json.dumps(dict(settings, record_version=RECORD_VERSION), sort_keys=True)
+
+    def _expire(self):
+        """Delete checkpoints of other analyses that were not updated within CHECKPOINT_MAX_AGE."""
+        try:
+            expired = self.conn.execute(
+                'SELECT file_hash, settings_key FROM checkpoints WHERE updated < ?',
+                (time.time() - CHECKPOINT_MAX_AGE,)
+            ).fetchall()
+            with self.conn:
+                for key in expired:
+                    self.conn.execute(
+                        'DELETE FROM checkpoint_elements WHERE file_hash = ? AND settings_key = ?', key
+                    )
+                    self.conn.execute('DELETE FROM checkpoints WHERE file_hash = ? AND settings_key = ?', key)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error expiring checkpoints: {str(e)}")
+
+    def load(self):
+        """
+        Get the checkpointed element records of the analysis.
+
+        Returns:
+            dict: Records by element id, see ElementTable.records
+        """
+        try:
+            return {
+                element_id: json.loads(record)
+                for element_id, record in self.conn.execute(
+                    'SELECT element_id, record FROM checkpoint_elements WHERE file_hash = ? AND settings_key = ?',
+                    (self.file_hash, self.settings_key)
+                )
+            }
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error reading checkpoint: {str(e)}")
+            return {}
+
+    def due(self):
+        """Check whether the interval since the last checkpoint has passed."""
+        return time.monotonic() - self._last_write >= self.interval
+
+    def write(self, records):
+        """
+        Checkpoint element records.
+
+        Elements that are already checkpointed keep their first record, as an
+        element measured in an earlier checkpoint may be passed again as only
+        counted.
+
+        Args:
+            records (dict): Records by element id of elements analyzed since the last checkpoint
+        """
+        self._last_write = time.monotonic()
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    '''INSERT OR IGNORE INTO checkpoint_elements (file_hash, settings_key, element_id, record)
+                       VALUES (?, ?, ?, ?)''',
+                    [
+                        (self.file_hash, self.settings_key, element_id, json.dumps(record))
+                        for element_id, record in records.items()
+                    ]
+                )
+                self.conn.execute(
+                    '''INSERT INTO checkpoints (file_hash, settings_key, updated) VALUES (?, ?, ?)
+                       ON CONFLICT (file_hash, settings_key) DO UPDATE SET updated = excluded.updated''',
+                    (self.file_hash, self.settings_key, time.time())
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error writing checkpoint: {str(e)}")
+
+    def clear(self):
+        """Delete the checkpoint once its analysis is complete."""
+        try:
+            with self.conn:
+                key = (self.file_hash, self.settings_key)
+                self.conn.execute('DELETE FROM checkpoint_elements WHERE file_hash = ? AND settings_key = ?', key)
+                self.conn.execute('DELETE FROM checkpoints WHERE file_hash = ? AND settings_key = ?', key)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error clearing checkpoint: {str(e)}")
+
+    def close(self):
+        """Close the checkpoint database."""
+        self.conn.close()
@@ -0,0 +1,75 @@
+"""
+Compact storage of retained mesh geometry.
+
+Meshes kept in memory after they are measured (cached representation maps,
+element points waiting for their oriented bounding box) are stored as
+contiguous float32 coordinates relative to the mesh's minimum corner and int32
+triangle indices, a quarter of the size of float64 coordinates with int64
+indices. Coordinates relative to the corner keep float32 precise even for
+models placed far from the world origin. Coordinates can optionally be
+quantized to 16-bit steps across the mesh extents, halving the size again.
+"""
+
+import numpy as np
+
+# Storage types of coordinates relative to the mesh origin and of triangle indices
+VERTEX_DTYPE = np.float32
+INDEX_DTYPE = np.int32
+
+# Storage type and number of steps of quantized coordinates
+QUANTIZED_DTYPE = np.uint16
+QUANTIZATION_STEPS = np.iinfo(QUANTIZED_DTYPE).max
+
+
+class CompactMesh:
+    """Vertices and optional triangles of a mesh in compact arrays."""
+
+    __slots__ = ('origin', 'step', 'coordinates', 'faces')
+
+    def __init__(self, verts, faces=None, quantize=False):
+        """
+        Args:
+            verts (array-like): Vertex coordinates, flat or shaped (n, 3)
+            faces (array-like): Triangle vertex indices, flat or shaped (m, 3)
+            quantize (bool): Store coordinates as 16-bit steps across the mesh
+                extents instead of float32
+        """
+        verts = np.asarray(verts, dtype=np.float64).reshape(-1, 3)
+        self.origin = verts.min(axis=0) if len(verts) else np.zeros(3)
+        local = verts - self.origin
+        if quantize and len(verts):
+            extents = local.max(axis=0)
+            self.step = np.where(extents > 0.0, extents / QUANTIZATION_STEPS, 1.0)
+            self.coordinates = np.rint(local / self.step).astype(QUANTIZED_DTYPE)
+        else:
+            self.step = None
+            self.coordinates = np.ascontiguousarray(local, dtype=VERTEX_DTYPE)
+        self.faces = None if faces is None else np.ascontiguousarray(
+            np.asarray(faces).reshape(-1, 3), dtype=INDEX_DTYPE
+        )
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    @property
+    def local_vertices(self):
+        """Vertex coordinates relative to the origin as an (n, 3) float64 array."""
+        local = self.coordinates.astype(np.float64)
+        if self.step is not None:
+            local *= self.step
+        return local
+
+    @property
+    def vertices(self):
+        """Vertex coordinates as an (n, 3) float64 array."""
+        return self.local_vertices + self.origin
+
+    @property
+    def nbytes(self):
+        """Size of the stored arrays in bytes."""
+        size = self.origin.nbytes + self.coordinates.nbytes
+        if self.step is not None:
+            size += self.step.nbytes
+        if self.faces is not None:
+            size += self.faces.nbytes
+        return size
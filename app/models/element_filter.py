@@ -0,0 +1,92 @@
+"""
+Selection of the elements to include in a takeoff.
+
+Classes to include and exclude are given as IFC classes and resolved once,
+through the schema's class hierarchy, into the set of concrete classes to
+analyze. Elements are then collected per class, so excluded elements are
+never touched.
+"""
+
+import logging
+
+import ifcopenshell.ifcopenshell_wrapper
+
+# Classes analyzed when no selection is given
+DEFAULT_INCLUDED_CLASSES = ('IfcElement',)
+
+# Elements without quantities of their own: openings and voids are subtracted
+# from their hosts and virtual elements only bound spaces
+DEFAULT_EXCLUDED_CLASSES = (
+    'IfcFeatureElementSubtraction',
+    'IfcSurfaceFeature',
+    'IfcVirtualElement',
+)
+
+
+class ElementFilter:
+    """
+    Concrete IFC classes selected for analysis.
+
+    A class is selected if it is a subtype of an included class and not a
+    subtype of an excluded class. Class names not in the file's schema are
+    ignored, so the same policy works for IFC2X3 and IFC4 files.
+    """
+
+    def __init__(self, ifc_file, include_classes=None, exclude_classes=None, logger=None):
+        """
+        Args:
+            ifc_file: The opened IFC file, or a StepCensus of a file that is not opened yet
+            include_classes (list): IFC classes to analyze, with their subtypes
+                (defaults to DEFAULT_INCLUDED_CLASSES)
+            exclude_classes (list): IFC classes to skip, with their subtypes
+                (defaults to DEFAULT_EXCLUDED_CLASSES)
+            logger: Logger for unknown class names
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        schema_name = getattr(ifc_file, 'schema_identifier', None) or ifc_file.schema
+        self.schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(schema_name)
+
+        if include_classes is None:
+            include_classes = DEFAULT_INCLUDED_CLASSES
+        if exclude_classes is None:
+            exclude_classes = DEFAULT_EXCLUDED_CLASSES
+
+        self.classes = self._resolve(include_classes) - self._resolve(exclude_classes)
+        if not self.classes:
+            self.logger.warning(f"No element classes selected from {', '.join(include_classes)}")
+
+    def _resolve(self, class_names):
+        """Get the concrete classes of a list of classes and their subtypes."""
+        concrete = set()
+        for class_name in class_names:
+            try:
+                declaration = self.schema.declaration_by_name(class_name)
+            except RuntimeError:
+                self.logger.debug(f"Class {class_name} is not in schema {self.schema.name()}")
+                continue
+
+            pending = [declaration]
+            while pending:
+                declaration = pending.pop()
+                if not hasattr(declaration, 'subtypes'):
+                    continue
+                if not declaration.is_abstract():
+                    concrete.add(declaration.name())
+                pending.extend(declaration.subtypes())
+        return concrete
+
+    def __contains__(self, element):
+        return element.is_a() in self.classes
+
+    def select(self, ifc_file):
+        """
+        Get the selected elements of a file.
+
+        Returns:
+            list: Elements of the selected classes, in file order
+        """
+        elements = []
+        for class_name in self.classes:
+            elements.extend(ifc_file.by_type(class_name, include_subtypes=False))
+        elements.sort(key=lambda element: element.id())
+        return elements
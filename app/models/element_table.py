@@ -0,0 +1,432 @@
+"""
+Columnar table of measured elements.
+
+Recording an element only appends a row of codes and quantities to compact
+columns, one row per element and one per element material. The takeoff
+results (element type, type material and material totals and the element
+catalog) are built from the columns at the end with one vectorized group-by
+per summary, so aggregation costs a few NumPy passes instead of several
+nested dictionary updates and a catalog key format per element and material.
+"""
+
+import json
+from array import array
+
+import numpy as np
+
+from app.models.takeoff_results import (
+    QUANTITY_SOURCES, SOURCE_CODES, CatalogEntry, DimensionStats, ElementTypeTotals, TakeoffResults,
+    element_material_json, freeze_element_material
+)
+
+
+class _Codes:
+    """Dense integer codes of names, in order of first use."""
+
+    __slots__ = ('codes', 'names')
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def get(self, name):
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+def _group_sums(groups, count, values):
+    """Sum the rows of a (n,) or (n, k) array per group."""
+    if values.ndim == 1:
+        return np.bincount(groups, weights=values, minlength=count)
+    return np.stack([np.bincount(groups, weights=values[:, axis], minlength=count)
+                     for axis in range(values.shape[1])], axis=1)
+
+
+def _group_dimension_stats(groups, count, dimensions):
+    """
+    Get the dimension statistics of each group of rows.
+
+    Returns:
+        list: DimensionStats of each group
+    """
+    counts = np.bincount(groups, minlength=count)
+    means = _group_sums(groups, count, dimensions) / np.maximum(counts, 1)[:, None]
+    deviations = dimensions - means[groups]
+    m2 = _group_sums(groups, count, deviations * deviations)
+    minimums = np.full((count, 3), np.inf)
+    maximums = np.full((count, 3), -np.inf)
+    np.minimum.at(minimums, groups, dimensions)
+    np.maximum.at(maximums, groups, dimensions)
+    return [
+        DimensionStats(
+            int(counts[group]), means[group].tolist(), m2[group].tolist(),
+            minimums[group].tolist(), maximums[group].tolist()
+        ) if counts[group] else DimensionStats()
+        for group in range(count)
+    ]
+
+
+def _group_rows(*columns):
+    """
+    Group rows by equal values in all columns, numbering groups in order of first use.
+
+    Args:
+        columns: (n,) arrays of the grouping keys
+
+    Returns:
+        tuple: First row of each group and group of each row
+    """
+    order = np.lexsort(columns[::-1])
+    starts = np.ones(len(order), dtype=bool)
+    for column in columns:
+        ordered = column[order]
+        starts[1:] &= ordered[1:] == ordered[:-1]
+    starts = ~starts
+    starts[0] = True
+    sorted_groups = np.cumsum(starts) - 1
+    first_rows = np.minimum.reduceat(order, np.flatnonzero(starts))
+
+    # Renumber groups by their first row
+    rank = np.empty(len(first_rows), dtype=np.intp)
+    by_first = np.argsort(first_rows, kind='stable')
+    rank[by_first] = np.arange(len(first_rows))
+    groups = np.empty(len(order), dtype=np.intp)
+    groups[order] = rank[sorted_groups]
+    return first_rows[by_first], groups
+
+
+class ElementTable:
+    """
+    Measured elements and their materials in growable columns.
+
+    Names (element types, materials, quantity sources) are stored as codes and
+    material data as references into a list of the distinct material data
+    dicts, which the analyzer shares between elements of the same material.
+    """
+
+    def __init__(self):
+        self.type_codes = _Codes()
+        self.material_codes = _Codes()
+        self._material_data = []
+        self._material_data_codes = {}
+        self._stored_material_data = {}
+
+        # Elements counted per type, whether measured or not
+        self.counted_ids = array('q')
+        self.counted_types = array('i')
+
+        # One row per measured element
+        self.ids = array('q')
+        self.names = []
+        self.types = array('i')
+        self.sources = array('B')
+        self.volumes = array('d')
+        self.areas = array('d')
+        self.surface_areas = array('d')
+        self.bbox_dimensions = array('d')
+        self.dimensions = array('d')
+
+        # One row per material of a measured element
+        self.material_elements = array('q')
+        self.materials = array('i')
+        self.material_data = array('i')
+        self.material_volumes = array('d')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def count(self, element_id, element_type):
+        """Count an element of a type, whether or not it is measured."""
+        self.counted_ids.append(element_id)
+        self.counted_types.append(self.type_codes.get(element_type))
+
+    def add(self, element_id, name, element_type, source, volume, area, surface_areas,
+            bbox_dimensions, dimensions, materials):
+        """
+        Append a measured element.
+
+        Args:
+            element_id (int): Entity id of the element
+            name (str): Name of the element
+            element_type (str): IFC class of the element
+            source (str): Where the quantities came from, e.g. 'geometry' or 'analytic'
+            volume (float): Volume of the element
+            area (float): Surface area of the element
+            surface_areas: Vertical, top and soffit areas, or None if unknown
+            bbox_dimensions: Extents of the axis-aligned bounding box
+            dimensions (tuple): Rounded length, width and height of the catalog entry
+            materials (list): (material name, material data, material volume) of each material
+        """
+        row = len(self.ids)
+        self.ids.append(element_id)
+        self.names.append(name)
+        self.types.append(self.type_codes.get(element_type))
+        self.sources.append(SOURCE_CODES[source])
+        self.volumes.append(volume)
+        self.areas.append(area)
+        if surface_areas is None:
+            self.surface_areas.extend((np.nan, np.nan, np.nan))
+        else:
+            self.surface_areas.extend(surface_areas)
+        self.bbox_dimensions.extend(bbox_dimensions)
+        self.dimensions.extend(dimensions)
+
+        for material_name, material_data, material_volume in materials:
+            data_code = self._material_data_codes.get(id(material_data))
+            if data_code is None:
+                data_code = self._material_data_codes[id(material_data)] = len(self._material_data)
+                self._material_data.append(material_data)
+            self.material_elements.append(row)
+            self.materials.append(self.material_codes.get(material_name))
+            self.material_data.append(data_code)
+            self.material_volumes.append(material_volume)
+
+    def mark(self):
+        """Get the position of the table's end, to get the records added after it."""
+        return len(self.counted_ids), len(self.ids), len(self.material_elements)
+
+    def records(self, start=(0, 0, 0)):
+        """
+        Get the recorded values of each counted element, e.g. to store them for later revisions.
+
+        Args:
+            start (tuple): Position from mark; only elements counted or measured
+                after it are included
+
+        Returns:
+            dict: Records by element id. Each record has the element type, and for
+            measured elements the arguments of add besides the id and name
+        """
+        counted_start, row_start, material_start = start
+        type_names = self.type_codes.names
+        records = {
+            element_id: {'element_type': type_names[type_code]}
+            for element_id, type_code in zip(self.counted_ids[counted_start:], self.counted_types[counted_start:])
+        }
+        measured = {}
+        for row in range(row_start, len(self.ids)):
+            record = records.setdefault(self.ids[row], {'element_type': type_names[self.types[row]]})
+            surface_areas = self.surface_areas[3 * row:3 * row + 3].tolist()
+            record.update({
+                'source': QUANTITY_SOURCES[self.sources[row]],
+                'volume': self.volumes[row],
+                'area': self.areas[row],
+                'surface_areas': None if any(np.isnan(surface_areas)) else surface_areas,
+                'bbox_dimensions': self.bbox_dimensions[3 * row:3 * row + 3].tolist(),
+                'dimensions': self.dimensions[3 * row:3 * row + 3].tolist(),
+                'materials': []
+            })
+            measured[row] = record
+        material_names = self.material_codes.names
+        for index in range(material_start, len(self.material_elements)):
+            measured[self.material_elements[index]]['materials'].append((
+                material_names[self.materials[index]],
+                element_material_json(self._material_data[self.material_data[index]]),
+                self.material_volumes[index]
+            ))
+        return records
+
+    def add_record(self, element_id, name, record):
+        """
+        Count and add an element from a record returned by records.
+
+        Args:
+            element_id (int): Entity id of the element in the current file
+            name (str): Name of the element
+            record (dict): Recorded values of the element
+        """
+        self.count(element_id, record['element_type'])
+        if 'source' not in record:
+            return
+        materials = []
+        for material_name, material_data, material_volume in record['materials']:
+            # Elements of the same material share their material data, as when measured
+            key = json.dumps(material_data, sort_keys=True)
+            if key not in self._stored_material_data:
+                self._stored_material_data[key] = freeze_element_material(material_data)
+            material_data = self._stored_material_data[key]
+            materials.append((material_name, material_data, material_volume))
+        self.add(
+            element_id, name, record['element_type'], record['source'], record['volume'], record['area'],
+            record['surface_areas'], record['bbox_dimensions'], tuple(record['dimensions']), materials
+        )
+
+    def _set_material_fields(self, entries, groups, data_codes):
+        """
+        Set the descriptive fields of material totals from their rows' material data.
+
+        Matches adding the rows' material data one row at a time: properties
+        and grades are added in order of first use, then the final property
+        values and single-valued fields are set in order of last use.
+        """
+        if not len(groups):
+            return
+        pair_count = len(self._material_data)
+        pairs = groups.astype(np.int64) * pair_count + data_codes
+        unique_pairs, first = np.unique(pairs, return_index=True)
+        last = len(pairs) - 1 - np.unique(pairs[::-1], return_index=True)[1]
+
+        for pair in unique_pairs[np.argsort(first, kind='stable')]:
+            entries[pair // pair_count].add_material_data(self._material_data[pair % pair_count])
+        for pair in unique_pairs[np.argsort(last, kind='stable')]:
+            entries[pair // pair_count].add_material_data(self._material_data[pair % pair_count])
+
+    def aggregate(self, results=None):
+        """
+        Add the table's elements to takeoff results.
+
+        Args:
+            results (TakeoffResults): Results to add to, or None for new results
+
+        Returns:
+            TakeoffResults: Results of the recorded elements, to merge with
+            results of other elements
+        """
+        if results is None:
+            results = TakeoffResults()
+        type_names = self.type_codes.names
+        material_names = self.material_codes.names
+        type_count = len(type_names)
+
+        # Element types, counted over all elements and totalled over measured ones
+        types = np.frombuffer(self.types, dtype=np.int32).astype(np.intp)
+        volumes = np.frombuffer(self.volumes, dtype=np.float64)
+        areas = np.frombuffer(self.areas, dtype=np.float64)
+        raw_surface_areas = np.frombuffer(self.surface_areas, dtype=np.float64).reshape(-1, 3)
+        surface_areas = np.nan_to_num(raw_surface_areas)
+        bbox_dimensions = np.frombuffer(self.bbox_dimensions, dtype=np.float64).reshape(-1, 3)
+        dimensions = np.frombuffer(self.dimensions, dtype=np.float64).reshape(-1, 3)
+
+        type_counts = np.bincount(np.frombuffer(self.counted_types, dtype=np.int32), minlength=type_count)
+        type_volumes = _group_sums(types, type_count, volumes)
+        type_areas = _group_sums(types, type_count, areas)
+        type_surfaces = _group_sums(types, type_count, surface_areas)
+        type_stats = _group_dimension_stats(types, type_count, bbox_dimensions)
+        type_entries = []
+        for code, element_type in enumerate(type_names):
+            entry = ElementTypeTotals()
+            entry.count = int(type_counts[code])
+            entry.volume = float(type_volumes[code])
+            entry.area = float(type_areas[code])
+            entry.surface_areas = type_surfaces[code].tolist()
+            entry.dimension_stats = type_stats[code]
+            type_entries.append(entry)
+
+        source_counts = np.bincount(np.frombuffer(self.sources, dtype=np.uint8), minlength=len(QUANTITY_SOURCES))
+        for source, count in zip(QUANTITY_SOURCES, source_counts.tolist()):
+            results.quantity_sources[source] += count
+
+        if len(self.material_elements):
+            self._aggregate_materials(
+                results, type_entries, types, areas, raw_surface_areas, surface_areas, bbox_dimensions, dimensions
+            )
+
+        partial = TakeoffResults()
+        partial.element_types = dict(zip(type_names, type_entries))
+        results.merge(partial)
+        return results
+
+    def _aggregate_materials(self, results, type_entries, types, areas, raw_surface_areas, surface_areas,
+                             bbox_dimensions, dimensions):
+        """Add type material, material and catalog totals from the element material rows."""
+        type_names = self.type_codes.names
+        material_names = self.material_codes.names
+
+        # Rows of element materials with their element's quantities
+        rows = np.frombuffer(self.material_elements, dtype=np.int64)
+        materials = np.frombuffer(self.materials, dtype=np.int32).astype(np.intp)
+        data_codes = np.frombuffer(self.material_data, dtype=np.int32)
+        material_volumes = np.frombuffer(self.material_volumes, dtype=np.float64)
+        row_types = types[rows]
+        row_areas = areas[rows]
+        row_surfaces = surface_areas[rows]
+        row_bbox = bbox_dimensions[rows]
+
+        # Materials of each element type
+        first_pairs, pair_groups = _group_rows(row_types, materials)
+        pair_count = len(first_pairs)
+        pair_counts = np.bincount(pair_groups, minlength=pair_count)
+        pair_volumes = _group_sums(pair_groups, pair_count, material_volumes)
+        pair_areas = _group_sums(pair_groups, pair_count, row_areas)
+        pair_surfaces = _group_sums(pair_groups, pair_count, row_surfaces)
+        pair_stats = _group_dimension_stats(pair_groups, pair_count, row_bbox)
+        pair_entries = []
+        for group, first in enumerate(first_pairs.tolist()):
+            entry = type_entries[row_types[first]].material(material_names[materials[first]])
+            entry.count = int(pair_counts[group])
+            entry.volume = float(pair_volumes[group])
+            entry.area = float(pair_areas[group])
+            entry.surface_areas = pair_surfaces[group].tolist()
+            entry.dimension_stats = pair_stats[group]
+            pair_entries.append(entry)
+        self._set_material_fields(pair_entries, pair_groups, data_codes)
+
+        # Materials across element types
+        material_count = len(material_names)
+        material_counts = np.bincount(materials, minlength=material_count)
+        material_totals = _group_sums(materials, material_count, material_volumes)
+        material_areas = _group_sums(materials, material_count, row_areas)
+        material_surfaces = _group_sums(materials, material_count, row_surfaces)
+        material_stats = _group_dimension_stats(materials, material_count, row_bbox)
+        material_entries = []
+        partial = TakeoffResults()
+        for code, material_name in enumerate(material_names):
+            entry = partial.material(material_name)
+            entry.count = int(material_counts[code])
+            entry.volume = float(material_totals[code])
+            entry.area = float(material_areas[code])
+            entry.surface_areas = material_surfaces[code].tolist()
+            entry.dimension_stats = material_stats[code]
+            material_entries.append(entry)
+        for material_code, type_code in set(zip(materials.tolist(), row_types.tolist())):
+            material_entries[material_code].element_types.add(type_names[type_code])
+        self._set_material_fields(material_entries, materials, data_codes)
+
+        # Catalog of elements grouped by type, material and rounded dimensions,
+        # in order of their first element
+        row_dimensions = dimensions[rows]
+        first_rows, catalog_groups = _group_rows(
+            row_types, materials, row_dimensions[:, 0], row_dimensions[:, 1], row_dimensions[:, 2]
+        )
+        catalog_count = len(first_rows)
+        catalog_counts = np.bincount(catalog_groups, minlength=catalog_count)
+        catalog_volumes = _group_sums(catalog_groups, catalog_count, material_volumes)
+        catalog_areas = _group_sums(catalog_groups, catalog_count, row_areas)
+        catalog_surfaces = _group_sums(catalog_groups, catalog_count, row_surfaces)
+
+        # Element columns of each entry, in the order the elements were recorded
+        by_entry = np.argsort(catalog_groups, kind='stable')
+        entry_starts = np.concatenate(([0], np.cumsum(catalog_counts))).tolist()
+        entry_rows = rows[by_entry]
+        entry_ids = np.frombuffer(self.ids, dtype=np.int64)[entry_rows]
+        entry_volumes = material_volumes[by_entry]
+        entry_areas = row_areas[by_entry]
+        entry_surfaces = np.ascontiguousarray(raw_surface_areas[entry_rows])
+        entry_sources = np.frombuffer(self.sources, dtype=np.uint8)[entry_rows]
+        entry_names = [self.names[element] for element in entry_rows.tolist()]
+
+        for group, (first, count, volume, area, surfaces) in enumerate(zip(
+                first_rows.tolist(), catalog_counts.tolist(), catalog_volumes.tolist(),
+                catalog_areas.tolist(), catalog_surfaces.tolist())):
+            length, width, height = row_dimensions[first].tolist()
+            key = f"{type_names[row_types[first]]}|{material_names[materials[first]]}|{length}x{width}x{height}"
+            entry = CatalogEntry(
+                (length, width, height), element_material_json(self._material_data[data_codes[first]])
+            )
+            entry.count = count
+            entry.volume = volume
+            entry.area = area
+            entry.surface_areas = surfaces
+            start, end = entry_starts[group], entry_starts[group + 1]
+            entry.element_ids.frombytes(entry_ids[start:end].tobytes())
+            entry.element_names = entry_names[start:end]
+            entry.element_volumes.frombytes(entry_volumes[start:end].tobytes())
+            entry.element_areas.frombytes(entry_areas[start:end].tobytes())
+            entry.element_surface_areas.frombytes(entry_surfaces[start:end].tobytes())
+            entry.element_sources.frombytes(entry_sources[start:end].tobytes())
+            partial.element_catalog[key] = entry
+
+        results.merge(partial)
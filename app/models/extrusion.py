@@ -0,0 +1,266 @@
+"""
+Analytic measurement of extruded area solids.
+
+An IfcExtrudedAreaSolid is a prism, so its volume, surface area and bounding
+box follow directly from the cross-section properties of its profile, the
+extrusion depth and its placement, without tessellating it. Surface areas are
+split by orientation from the normals of its end caps and side faces.
+"""
+
+import numpy as np
+import ifcopenshell.util.placement
+
+from app.models.mesh_stats import MeshStats, classify_surface_areas
+from app.models.profiles import compute_profile_properties
+
+# Deepest clipping of an extrusion, in meters, that is ignored when measuring it
+CLIPPING_TOLERANCE = 0.001
+
+
+def _placement_matrix(placement, unit_scale):
+    """Get a 4x4 matrix of an optional IfcAxis2Placement with translation in meters."""
+    matrix = np.eye(4)
+    if placement is not None:
+        matrix = np.array(ifcopenshell.util.placement.get_axis2placement(placement), dtype=np.float64)
+        matrix[:3, 3] *= unit_scale
+    return matrix
+
+
+def object_placement_matrix(element, unit_scale):
+    """Get a 4x4 matrix of an element's object placement with translation in meters."""
+    matrix = np.eye(4)
+    if getattr(element, 'ObjectPlacement', None):
+        matrix = np.array(ifcopenshell.util.placement.get_local_placement(element.ObjectPlacement), dtype=np.float64)
+        matrix[:3, 3] *= unit_scale
+    return matrix
+
+
+def get_body_items(element):
+    """
+    Get the items of an element's Body representation.
+
+    Returns:
+        tuple: The representation items, or None if the element has no Body
+    """
+    representation = getattr(element, 'Representation', None)
+    if not representation:
+        return None
+    for shape_representation in representation.Representations:
+        if shape_representation.RepresentationIdentifier == 'Body':
+            return shape_representation.Items
+    return None
+
+
+def get_extruded_solid(element):
+    """
+    Get the IfcExtrudedAreaSolid making up an element's Body, if any.
+
+    Returns:
+        The solid, or None if the Body is not a single extruded area solid
+    """
+    items = get_body_items(element)
+    if items and len(items) == 1 and items[0].is_a('IfcExtrudedAreaSolid'):
+        return items[0]
+    return None
+
+
+def _measure_prism(solid, unit_scale, profile_cache=None):
+    """
+    Measure an extruded area solid in the coordinate system of its element.
+
+    Only extrusions perpendicular to the profile are measured, as the side
+    faces of oblique extrusions are parallelograms.
+
+    Returns:
+        tuple: (area, volume, corners, centroid, area_vectors) in meters, where
+        corners are the (n, 3) vertices of the prism around the profile outline
+        and area_vectors the outward face normals scaled by the face areas, or
+        None if the profile or extrusion is not supported
+    """
+    if profile_cache is not None:
+        profile = profile_cache.get(solid.SweptArea)
+    else:
+        profile = compute_profile_properties(solid.SweptArea)
+    if profile is None:
+        return None
+
+    direction = np.array(solid.ExtrudedDirection.DirectionRatios, dtype=np.float64)
+    direction /= np.linalg.norm(direction)
+    if abs(abs(direction[2]) - 1.0) > 1e-6:
+        return None
+
+    outline = profile.outline * unit_scale
+    depth = solid.Depth * unit_scale * np.sign(direction[2])
+    area = profile.area * unit_scale ** 2
+    perimeter = profile.perimeter * unit_scale
+    centroid = profile.centroid * unit_scale
+
+    transform = _placement_matrix(solid.Position, unit_scale)
+    count = len(outline)
+    local = np.zeros((count * 2, 3))
+    local[:count, :2] = outline
+    local[count:, :2] = outline
+    local[count:, 2] = depth
+    corners = local @ transform[:3, :3].T + transform[:3, 3]
+    prism_centroid = transform[:3, :3] @ np.array([centroid[0], centroid[1], depth / 2.0]) + transform[:3, 3]
+
+    # End caps, then one side face per outline edge with its outward normal
+    edges = np.roll(outline, -1, axis=0) - outline
+    following = np.roll(outline, -1, axis=0)
+    orientation = np.sign(np.sum(outline[:, 0] * following[:, 1] - following[:, 0] * outline[:, 1]))
+    side_vectors = np.zeros((count, 3))
+    side_vectors[:, 0] = edges[:, 1] * orientation * abs(depth)
+    side_vectors[:, 1] = -edges[:, 0] * orientation * abs(depth)
+
+    # Outlines of parametric profiles are their bounding polygons: boundaries
+    # they miss (flange inner faces, voids) are split between the profile's +Y
+    # and -Y faces, and rounded corners they square off shrink every side face
+    outline_perimeter = np.linalg.norm(edges, axis=1).sum()
+    excess = (perimeter - outline_perimeter) * abs(depth)
+    if excess < 0.0 and outline_perimeter > 0.0:
+        side_vectors *= perimeter / outline_perimeter
+    elif excess > 0.0:
+        profile_y = np.array([0.0, 1.0, 0.0])
+        position = getattr(solid.SweptArea, 'Position', None)
+        if position is not None:
+            profile_y[:2] = np.array(ifcopenshell.util.placement.get_axis2placement(position))[:2, 1]
+        side_vectors = np.vstack([side_vectors, profile_y * excess / 2.0, -profile_y * excess / 2.0])
+
+    cap = np.array([0.0, 0.0, area * np.sign(depth)])
+    area_vectors = np.vstack([cap, -cap, side_vectors]) @ transform[:3, :3].T
+
+    return 2.0 * area + perimeter * abs(depth), area * abs(depth), corners, prism_centroid, area_vectors
+
+
+def measure_extruded_solid(element, solid, unit_scale, profile_cache=None):
+    """
+    Measure an element's extruded area solid analytically.
+
+    Args:
+        element: The IFC element the solid belongs to
+        solid: The IfcExtrudedAreaSolid
+        unit_scale (float): Scale from file length units to meters
+        profile_cache (ProfileCache): Cache of profile properties, if any
+
+    Returns:
+        MeshStats: Volume, surface area, world bounding box and centroid, or
+        None if the profile or extrusion is not supported
+    """
+    prism = _measure_prism(solid, unit_scale, profile_cache)
+    if prism is None:
+        return None
+    area, volume, corners, centroid, area_vectors = prism
+
+    transform = object_placement_matrix(element, unit_scale)
+    world = corners @ transform[:3, :3].T + transform[:3, 3]
+    return MeshStats(
+        area,
+        volume,
+        world.min(axis=0),
+        world.max(axis=0),
+        transform[:3, :3] @ centroid + transform[:3, 3],
+        world,
+        surface_areas=classify_surface_areas(area_vectors @ transform[:3, :3].T)
+    )
+
+
+def _clipping_depth(half_space, corners, unit_scale):
+    """
+    Get how deep a clipping half space cuts into a prism.
+
+    Polygonal boundaries of the half space are ignored, so the depth is an
+    upper bound.
+
+    Args:
+        half_space: The IfcHalfSpaceSolid removed from the prism
+        corners (np.ndarray): (n, 3) prism vertices in meters
+        unit_scale (float): Scale from file length units to meters
+
+    Returns:
+        float: Largest distance of a prism vertex inside the half space, in
+        meters, or None if the half space is not bounded by a plane
+    """
+    surface = half_space.BaseSurface
+    if not surface.is_a('IfcPlane'):
+        return None
+    plane = _placement_matrix(surface.Position, unit_scale)
+    distances = (corners - plane[:3, 3]) @ plane[:3, 2]
+    # The half space lies on the side of the plane away from its normal when the flag is set
+    if half_space.AgreementFlag:
+        distances = -distances
+    return max(float(distances.max()), 0.0)
+
+
+def measure_extruded_body(element, unit_scale, profile_cache=None, clipping_tolerance=CLIPPING_TOLERANCE):
+    """
+    Measure an element whose Body consists only of extruded area solids.
+
+    Extrusions clipped by half spaces are measured without the clipping if
+    it removes no more than clipping_tolerance from any of their vertices.
+    Bodies whose extrusions overlap are not measured, as their volumes would
+    be counted twice, and neither are elements with openings.
+
+    Args:
+        element: The IFC element
+        unit_scale (float): Scale from file length units to meters
+        profile_cache (ProfileCache): Cache of profile properties, if any
+        clipping_tolerance (float): Deepest ignored clipping, in meters
+
+    Returns:
+        MeshStats: Volume, surface area, world bounding box and centroid, or
+        None if the Body is not made of supported extrusions
+    """
+    if getattr(element, 'HasOpenings', None):
+        return None
+    items = get_body_items(element)
+    if not items:
+        return None
+
+    area, volume = 0.0, 0.0
+    prisms = []
+    for item in items:
+        half_spaces = []
+        while item.is_a('IfcBooleanResult'):
+            if item.Operator != 'DIFFERENCE' or not item.SecondOperand.is_a('IfcHalfSpaceSolid'):
+                return None
+            half_spaces.append(item.SecondOperand)
+            item = item.FirstOperand
+        if not item.is_a('IfcExtrudedAreaSolid'):
+            return None
+
+        prism = _measure_prism(item, unit_scale, profile_cache)
+        if prism is None:
+            return None
+        item_area, item_volume, corners, centroid, area_vectors = prism
+        for half_space in half_spaces:
+            depth = _clipping_depth(half_space, corners, unit_scale)
+            if depth is None or depth > clipping_tolerance:
+                return None
+
+        area += item_area
+        volume += item_volume
+        prisms.append((item_volume, corners, centroid, area_vectors))
+
+    for index, (_, first, _, _) in enumerate(prisms):
+        for _, second, _, _ in prisms[index + 1:]:
+            overlap = np.minimum(first.max(axis=0), second.max(axis=0)) - np.maximum(first.min(axis=0), second.min(axis=0))
+            if (overlap > clipping_tolerance).all():
+                return None
+
+    if volume > 0.0:
+        centroid = sum(prism_volume * prism_centroid for prism_volume, _, prism_centroid, _ in prisms) / volume
+    else:
+        centroid = prisms[0][2]
+    transform = object_placement_matrix(element, unit_scale)
+    corners = np.vstack([prism_corners for _, prism_corners, _, _ in prisms])
+    area_vectors = np.vstack([prism_vectors for _, _, _, prism_vectors in prisms])
+    world = corners @ transform[:3, :3].T + transform[:3, 3]
+    return MeshStats(
+        area,
+        volume,
+        world.min(axis=0),
+        world.max(axis=0),
+        transform[:3, :3] @ centroid + transform[:3, 3],
+        world,
+        surface_areas=classify_surface_areas(area_vectors @ transform[:3, :3].T)
+    )
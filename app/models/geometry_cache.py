@@ -0,0 +1,211 @@
+"""
+Geometry caches for the material takeoff analyzer.
+
+Instanced elements (doors, bolts, standard columns, ...) reference a shared
+IfcRepresentationMap through an IfcMappedItem. The map is tessellated once,
+and every instance is measured by moving the cached mesh into place. Cached
+meshes are kept in compact float32/int32 arrays. With a type geometry library,
+maps measured in earlier analyses of any file are not tessellated at all.
+"""
+
+import logging
+
+import numpy as np
+import ifcopenshell.geom
+import ifcopenshell.util.placement
+import ifcopenshell.util.unit
+
+from app.models.compact_mesh import VERTEX_DTYPE, CompactMesh
+from app.models.mesh_stats import (
+    MeshStats, classify_surface_areas, compute_mesh_stats, mesh_arrays, triangle_area_vectors
+)
+from app.models.type_library import LibraryEntry, RepresentationHasher, merge_area_vectors
+
+
+class _CachedMesh:
+    """Measured mesh of a representation map at a given scale."""
+
+    __slots__ = ('area', 'volume', 'mesh', 'centroid', 'area_vectors')
+
+    def __init__(self, area, volume, mesh, centroid, area_vectors):
+        self.area = area
+        self.volume = volume
+        self.mesh = mesh
+        self.centroid = centroid
+        self.area_vectors = area_vectors
+
+
+class RepresentationMapCache:
+    """
+    Cache of measured IfcRepresentationMap geometry.
+
+    Entries are keyed by the representation map and the scale of the mapping
+    target, since scaling changes area and volume. The rigid remainder of the
+    transform (rotation, mirroring and translation) only moves the cached
+    vertices to compute the world bounding box, and rotates the cached face
+    normals to split the surface area by orientation.
+    """
+
+    def __init__(self, ifc_file, settings, logger=None, library=None):
+        """
+        Args:
+            ifc_file: The opened IFC file
+            settings: ifcopenshell.geom settings used for tessellation
+            logger: Logger for tessellation warnings
+            library (TypeGeometryLibrary): Library of maps measured in earlier
+                analyses, looked up before tessellating and extended after
+        """
+        self.settings = settings
+        self.logger = logger or logging.getLogger(__name__)
+        self.unit_scale = ifcopenshell.util.unit.calculate_unit_scale(ifc_file)
+        self.library = library
+        self.hasher = RepresentationHasher(self.unit_scale) if library is not None else None
+        self._meshes = {}
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def nbytes(self):
+        """Size of the cached meshes in bytes."""
+        size = sum(mesh.nbytes for mesh in self._meshes.values() if mesh is not None)
+        for entry in self._entries.values():
+            if entry is not None:
+                size += entry.mesh.nbytes + entry.area_vectors.nbytes
+        return size
+
+    @staticmethod
+    def get_mapped_item(product):
+        """
+        Get the single IfcMappedItem making up a product's Body, if any.
+
+        Products with openings are excluded because their instance geometry
+        differs from the shared map.
+
+        Returns:
+            The IfcMappedItem, or None if the product is not a plain instance
+        """
+        if not getattr(product, 'Representation', None) or not getattr(product, 'ObjectPlacement', None):
+            return None
+        if getattr(product, 'HasOpenings', None):
+            return None
+
+        for representation in product.Representation.Representations:
+            if representation.RepresentationIdentifier != 'Body':
+                continue
+            items = representation.Items
+            if len(items) == 1 and items[0].is_a('IfcMappedItem'):
+                target = items[0].MappingTarget
+                if target is not None and target.is_a('IfcCartesianTransformationOperator3D'):
+                    return items[0]
+            return None
+        return None
+
+    def measure(self, product):
+        """
+        Measure an instanced product from its cached representation map.
+
+        Args:
+            product: The IFC element
+
+        Returns:
+            MeshStats: Measured quantities in world coordinates, or None if the
+            product is not an instance or its map could not be tessellated
+        """
+        item = self.get_mapped_item(product)
+        if item is None:
+            return None
+
+        target = ifcopenshell.util.placement.get_cartesiantransformationoperator3d(item.MappingTarget)
+        target = np.asarray(target, dtype=np.float64)
+        scales = np.linalg.norm(target[:3, :3], axis=0)
+        if np.any(scales <= 0.0):
+            return None
+
+        entry = self._get_entry(item.MappingSource, scales)
+        if entry is None:
+            return None
+
+        # Rigid part of the mapping target followed by the object placement
+        rigid = np.eye(4)
+        rigid[:3, :3] = target[:3, :3] / scales
+        rigid[:3, 3] = target[:3, 3] * self.unit_scale
+        placement = np.array(ifcopenshell.util.placement.get_local_placement(product.ObjectPlacement), dtype=np.float64)
+        placement[:3, 3] *= self.unit_scale
+        transform = placement @ rigid
+
+        rotation = transform[:3, :3]
+        translation = transform[:3, 3]
+        world_verts = entry.mesh.local_vertices @ rotation.T + (rotation @ entry.mesh.origin + translation)
+        return MeshStats(
+            entry.area,
+            entry.volume,
+            world_verts.min(axis=0),
+            world_verts.max(axis=0),
+            rotation @ entry.centroid + translation,
+            CompactMesh(world_verts),
+            surface_areas=classify_surface_areas(entry.area_vectors.astype(np.float64) @ rotation.T)
+        )
+
+    def _get_entry(self, representation_map, scales):
+        """Get or build the cached mesh for a representation map at a scale."""
+        key = (representation_map.id(), tuple(np.round(scales, 6)))
+        if key in self._entries:
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        content_key = None
+        if self.library is not None:
+            try:
+                content_key = self.library.make_content_key(self.hasher.hash_map(representation_map), scales)
+                library_entry = self.library.get(content_key)
+            except Exception as e:
+                self.logger.warning(f"Error hashing representation map {representation_map.id()}: {str(e)}")
+                library_entry = None
+            if library_entry is not None:
+                # Instances are moved by their bounding box, not the tessellated vertices
+                entry = _CachedMesh(
+                    library_entry.area, library_entry.volume, CompactMesh(library_entry.corners),
+                    library_entry.centroid, library_entry.area_vectors
+                )
+                self._entries[key] = entry
+                return entry
+
+        entry = None
+        mesh = self._tessellate(representation_map)
+        if mesh is not None:
+            verts, faces = mesh.vertices, mesh.faces
+            origin = np.array(ifcopenshell.util.placement.get_axis2placement(representation_map.MappingOrigin), dtype=np.float64)
+            origin[:3, 3] *= self.unit_scale
+            # Place the map in its origin, then apply the target's scale
+            pre = np.diag(np.append(scales, 1.0)) @ origin
+            scaled = verts @ pre[:3, :3].T + pre[:3, 3]
+            stats = compute_mesh_stats(scaled, faces)
+            if stats is not None:
+                area_vectors = triangle_area_vectors(scaled, faces)
+                entry = _CachedMesh(
+                    stats.area, stats.volume, CompactMesh(scaled), stats.centroid,
+                    area_vectors.astype(VERTEX_DTYPE)
+                )
+                if content_key is not None:
+                    self.library.put(content_key, LibraryEntry(
+                        stats.area, stats.volume, stats.centroid, stats.bbox_min, stats.bbox_max,
+                        merge_area_vectors(area_vectors)
+                    ))
+
+        self._entries[key] = entry
+        return entry
+
+    def _tessellate(self, representation_map):
+        """Tessellate a representation map once, in its own coordinates."""
+        map_id = representation_map.id()
+        if map_id not in self._meshes:
+            try:
+                geometry = ifcopenshell.geom.create_shape(self.settings, representation_map.MappedRepresentation)
+                verts, faces = mesh_arrays(geometry)
+                self._meshes[map_id] = CompactMesh(verts, faces) if len(verts) else None
+            except Exception as e:
+                self.logger.warning(f"Error tessellating representation map {map_id}: {str(e)}")
+                self._meshes[map_id] = None
+        return self._meshes[map_id]
@@ -0,0 +1,161 @@
+"""
+Analytic quantities of layered elements.
+
+Walls and slabs with an IfcMaterialLayerSetUsage are measured from their
+reference area (axis length times height for walls, footprint for slabs)
+times the layer thicknesses, and their volume is split between the layer
+materials by thickness.
+"""
+
+import numpy as np
+import ifcopenshell.util.unit
+
+from app.models.extrusion import get_extruded_solid, measure_extruded_solid
+from app.models.mesh_stats import MeshStats
+from app.models.profiles import ProfileCache
+
+
+def get_layer_set(material):
+    """Get the IfcMaterialLayerSet of a layer set or layer set usage, if any."""
+    if material is None:
+        return None
+    if material.is_a('IfcMaterialLayerSetUsage'):
+        return material.ForLayerSet
+    if material.is_a('IfcMaterialLayerSet'):
+        return material
+    return None
+
+
+def _axis_length(element):
+    """Get the length of an element's 'Axis' polyline representation, in file units."""
+    for shape_representation in element.Representation.Representations:
+        if shape_representation.RepresentationIdentifier != 'Axis':
+            continue
+        length = 0.0
+        for item in shape_representation.Items:
+            if not item.is_a('IfcPolyline'):
+                return None
+            points = np.array([point.Coordinates[:2] for point in item.Points], dtype=np.float64)
+            length += np.linalg.norm(np.diff(points, axis=0), axis=1).sum()
+        return length or None
+    return None
+
+
+class LayerSetQuantities:
+    """
+    Layer thicknesses of the file's layer sets and quantities derived from them.
+
+    Thicknesses are read once per layer set, so the many walls sharing a
+    wall type only pay for a lookup.
+    """
+
+    def __init__(self, ifc_file):
+        """
+        Args:
+            ifc_file: The opened IFC file
+        """
+        self.unit_scale = ifcopenshell.util.unit.calculate_unit_scale(ifc_file)
+        self.profile_cache = ProfileCache()
+        self._layers = {}
+
+    def get_layers(self, layer_set):
+        """
+        Get the material and thickness of each layer of a layer set.
+
+        Returns:
+            list: (material name, thickness in meters) tuples; the name is None
+            for layers without a named material
+        """
+        layer_set_id = layer_set.id()
+        if layer_set_id not in self._layers:
+            layers = []
+            for layer in layer_set.MaterialLayers or ():
+                material = layer.Material
+                name = material.Name if material is not None and material.Name else None
+                layers.append((name, float(layer.LayerThickness or 0.0) * self.unit_scale))
+            self._layers[layer_set_id] = layers
+        return self._layers[layer_set_id]
+
+    def split_volume(self, material, volume):
+        """
+        Split an element volume between its layer materials by thickness.
+
+        Args:
+            material: The element's material definition
+            volume (float): The element volume
+
+        Returns:
+            dict: Volume of each named layer material, or None if the material
+            is not a layer set or has no thickness
+        """
+        layer_set = get_layer_set(material)
+        if layer_set is None:
+            return None
+        layers = self.get_layers(layer_set)
+        total_thickness = sum(thickness for _, thickness in layers)
+        if total_thickness <= 0.0:
+            return None
+
+        volumes = {}
+        for name, thickness in layers:
+            if name is not None:
+                volumes[name] = volumes.get(name, 0.0) + volume * thickness / total_thickness
+        return volumes
+
+    def measure(self, element, material):
+        """
+        Measure a layered wall or slab without tessellating it.
+
+        The volume is the reference area times the total layer thickness: the
+        axis length times the extrusion height for layers stacked along the
+        element's Y axis (walls), or the footprint area for layers stacked
+        along Z (slabs). Surface area and bounding box come from the extruded
+        body. Elements with openings are left to tessellation.
+
+        Args:
+            element: The IFC element
+            material: The element's material definition
+
+        Returns:
+            MeshStats: Measured quantities, or None if the element is not a
+            layered extrusion that can be measured analytically
+        """
+        if material is None or not material.is_a('IfcMaterialLayerSetUsage'):
+            return None
+        if getattr(element, 'HasOpenings', None):
+            return None
+
+        solid = get_extruded_solid(element)
+        if solid is None:
+            return None
+        body = measure_extruded_solid(element, solid, self.unit_scale, self.profile_cache)
+        if body is None:
+            return None
+
+        layers = self.get_layers(material.ForLayerSet)
+        total_thickness = sum(thickness for _, thickness in layers)
+        if total_thickness <= 0.0:
+            return None
+
+        height = solid.Depth * self.unit_scale
+        if material.LayerSetDirection == 'AXIS2':
+            axis_length = _axis_length(element)
+            if axis_length is not None:
+                reference_area = axis_length * self.unit_scale * height
+            else:
+                # Without an axis, the footprint is the axis length times the wall thickness
+                reference_area = body.volume / total_thickness
+        elif material.LayerSetDirection == 'AXIS3':
+            reference_area = body.volume / height if height > 0.0 else 0.0
+        else:
+            return None
+
+        return MeshStats(
+            body.area,
+            reference_area * total_thickness,
+            body.bbox_min,
+            body.bbox_max,
+            body.centroid,
+            body.points,
+            surface_areas=body.surface_areas
+        )
@@ -0,0 +1,56 @@
+"""
+Element to material definition index.
+
+Built in a single pass over IfcRelAssociatesMaterial so the analyzer does not
+have to walk each element's inverse relationships (and those of its type)
+to find its material.
+"""
+
+
+class MaterialIndex:
+    """
+    Material definition of every element, read from the material associations.
+
+    Follows ifcopenshell.util.element.get_material: a material associated
+    with the occurrence takes precedence over the material of its type.
+    """
+
+    def __init__(self, ifc_file):
+        """
+        Args:
+            ifc_file: The opened IFC file
+        """
+        self._materials = {}
+        self._build(ifc_file)
+
+    def __len__(self):
+        return len(self._materials)
+
+    def _build(self, ifc_file):
+        """Map element ids to their material definitions."""
+        for rel in ifc_file.by_type('IfcRelAssociatesMaterial'):
+            material = rel.RelatingMaterial
+            if material is None:
+                continue
+            for related in rel.RelatedObjects or ():
+                self._materials.setdefault(related.id(), material)
+
+        # Occurrences without their own material inherit the material of their type
+        for rel in ifc_file.by_type('IfcRelDefinesByType'):
+            relating_type = rel.RelatingType
+            if relating_type is None:
+                continue
+            material = self._materials.get(relating_type.id())
+            if material is None:
+                continue
+            for related in rel.RelatedObjects or ():
+                self._materials.setdefault(related.id(), material)
+
+    def get(self, element):
+        """
+        Get the material definition of an element.
+
+        Returns:
+            The material, material set or material set usage, or None
+        """
+        return self._materials.get(element.id())
@@ -12,17 +12,38 @@ import sys
 import logging
 import json
 import csv
+import argparse
+import multiprocessing
 from collections import defaultdict
+from types import MappingProxyType
 import ifcopenshell
 import ifcopenshell.geom
 import ifcopenshell.util.element
 import ifcopenshell.util.placement
 import ifcopenshell.util.shape
-import numpy as np
+import ifcopenshell.util.unit
 import pandas as pd
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from ifc_database import IFCDatabase
+from app.models.mesh_stats import mesh_stats_from_shape
+from app.models.geometry_cache import RepresentationMapCache
+from app.models.quantities import QuantityIndex, TypeBoundingBoxes, measure_bounding_box
+from app.models.mesh_cache import DEFAULT_MAX_BYTES, MeshStatsDiskCache
+from app.models.type_library import DEFAULT_LIBRARY_BYTES, TypeGeometryLibrary
+from app.models.revision_store import ElementHasher, RevisionStore
+from app.models.checkpoint import DEFAULT_CHECKPOINT_INTERVAL, AnalysisCheckpoint
+from app.models.step_census import scan_step_file
+from app.models.material_index import MaterialIndex
+from app.models.extrusion import measure_extruded_body
+from app.models.layer_quantities import LayerSetQuantities
+from app.models.profile_quantities import ProfileSetQuantities
+from app.models.element_filter import ElementFilter
+from app.models.oriented_boxes import ORIENTED_BOX_BATCH_SIZE, assign_oriented_extents
+from app.models.element_table import ElementTable
+from app.models.takeoff_results import TakeoffResults, freeze_element_material, new_element_material
+from app.models.sharding import SHARDS_PER_PROCESS, estimate_element_cost, plan_shards, run_shards
+from app.models.tessellation_worker import DEFAULT_TIME_LIMIT, TessellationWorker
 import logging.handlers
 import tempfile
 
@@ -48,21 +69,146 @@ logger.addHandler(logging.StreamHandler(sys.stdout))
 # Prevent duplicate logging
 logger.propagate = False
 
+# Supported ways of tessellating element geometry
+GEOMETRY_ENGINES = ('create_shape', 'iterator')
+
+# Where element quantities come from: 'geometry' always measures the mesh,
+# 'quantity_set' prefers exported IfcElementQuantity values and 'bounding_box'
+# prefers the element's or its type's Box representation, which is enough for
+# catalog dimensions and piece counts
+EXTRACTION_MODES = ('geometry', 'quantity_set', 'bounding_box')
+
+# Tessellation settings of each geometry profile, trading accuracy for speed:
+# mesher deflections (None keeps the ifcopenshell default) and whether
+# openings are subtracted from their host elements
+GEOMETRY_PROFILES = {
+    'precise': {'linear_deflection': None, 'angular_deflection': None, 'subtract_openings': True},
+    'balanced': {'linear_deflection': 0.01, 'angular_deflection': 0.5, 'subtract_openings': True},
+    'fast': {'linear_deflection': 0.05, 'angular_deflection': 1.0, 'subtract_openings': False},
+}
+
+
+def geometry_settings(geometry_profile, simplified=False):
+    """
+    Create ifcopenshell.geom settings for a geometry profile.
+    
+    Args:
+        geometry_profile (str): Tessellation profile from GEOMETRY_PROFILES
+        simplified (bool): Also skip openings and boolean operations, for
+            elements over the geometry budget
+        
+    Returns:
+        ifcopenshell.geom.settings: The tessellation settings
+    """
+    profile = GEOMETRY_PROFILES[geometry_profile]
+    settings = ifcopenshell.geom.settings()
+    settings.set(settings.USE_WORLD_COORDS, True)
+    if profile['linear_deflection'] is not None:
+        settings.set(settings.MESHER_LINEAR_DEFLECTION, profile['linear_deflection'])
+    if profile['angular_deflection'] is not None:
+        settings.set(settings.MESHER_ANGULAR_DEFLECTION, profile['angular_deflection'])
+    if simplified or not profile['subtract_openings']:
+        settings.set(settings.DISABLE_OPENING_SUBTRACTIONS, True)
+    if simplified:
+        settings.set(settings.DISABLE_BOOLEAN_RESULT, True)
+    return settings
+
+
 class MaterialTakeoffAnalyzer:
     """
     Analyzes IFC files to generate comprehensive material takeoff lists
     """
     
-    def __init__(self, ifc_file_path):
+    def __init__(self, ifc_file_path, geometry_engine='create_shape', num_workers=None,
+                 use_representation_cache=True, extraction_mode='geometry', num_processes=1,
+                 use_database=True, include_classes=None, exclude_classes=None, geometry_budget=None,
+                 geometry_profile='precise', mesh_cache_path=None, mesh_cache_size=DEFAULT_MAX_BYTES,
+                 use_analytic_quantities=True, type_library_path=None,
+                 type_library_size=DEFAULT_LIBRARY_BYTES, revision_store_path=None, checkpoint_path=None,
+                 checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL, geometry_time_limit=DEFAULT_TIME_LIMIT):
         """
         Initialize the analyzer with an IFC file path.
         
         Args:
             ifc_file_path (str): Path to the IFC file
+            geometry_engine (str): 'create_shape' to tessellate one element at a time,
+                or 'iterator' to stream shapes from a multi-core geometry iterator
+            num_workers (int): Worker threads for the 'iterator' engine (defaults to CPU count)
+            use_representation_cache (bool): Tessellate each IfcRepresentationMap once and
+                measure its mapped instances from the cached mesh
+            extraction_mode (str): 'geometry' to measure every element's mesh,
+                'quantity_set' to use Qto_* quantities and only tessellate elements lacking them,
+                or 'bounding_box' to measure elements from their own or their type's Box
+                representation (box volumes and areas) and only tessellate elements lacking one
+            num_processes (int): Worker processes for sharded analysis (1 analyzes in-process)
+            use_database (bool): Record the file in the IFC database
+            include_classes (list): IFC classes to analyze, with their subtypes
+                (defaults to all IfcElement classes)
+            exclude_classes (list): IFC classes to skip, with their subtypes
+                (defaults to openings, surface features and virtual elements)
+            geometry_budget (float): Highest estimated tessellation cost of an element
+                (see sharding.estimate_element_cost); costlier elements are measured
+                from quantity sets, their bounding box or simplified geometry instead.
+                None tessellates every element in full
+            geometry_profile (str): Tessellation profile from GEOMETRY_PROFILES,
+                'precise', 'balanced' or 'fast'
+            mesh_cache_path (str): SQLite database caching measured element geometry
+                across analyses of the same file, or None to disable the cache
+            mesh_cache_size (int): Size bound of the mesh cache in bytes
+            use_analytic_quantities (bool): Measure layered walls and slabs from their
+                reference area and layer thicknesses, members from their profile area
+                and length, and other bodies made of extrusions from their profiles
+                and depths, instead of tessellating them
+            type_library_path (str): SQLite database of representation map geometry
+                measured in any earlier analysis, keyed by content hash, or None to
+                disable the library
+            type_library_size (int): Size bound of the type geometry library in bytes
+            revision_store_path (str): SQLite database of the element results of each
+                project's last analyzed revision; elements unchanged since then are
+                taken from it instead of being measured. None analyzes every element
+            checkpoint_path (str): SQLite database the results of analyzed elements are
+                checkpointed to, so an interrupted analysis of the same file resumes
+                where it stopped, or None to disable checkpoints
+            checkpoint_interval (float): Seconds between checkpoints
+            geometry_time_limit (float): Seconds an element over the geometry budget
+                that no cheaper fallback measures may take to tessellate in full
+                before it is given up, or None for no limit
         """
+        if geometry_engine not in GEOMETRY_ENGINES:
+            raise ValueError(f"Unknown geometry engine: {geometry_engine}")
+        if extraction_mode not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode: {extraction_mode}")
+        if geometry_profile not in GEOMETRY_PROFILES:
+            raise ValueError(f"Unknown geometry profile: {geometry_profile}")
+        
         self.ifc_file_path = ifc_file_path
         self.logger = logger
+        self.geometry_engine = geometry_engine
+        self.num_workers = max(1, num_workers or multiprocessing.cpu_count())
+        self.extraction_mode = extraction_mode
+        self.quantity_index = None
+        self.type_boxes = None
+        self.material_index = None
+        self.num_processes = max(1, num_processes or 1)
+        self.geometry_budget = geometry_budget
+        self.geometry_time_limit = geometry_time_limit
+        self.tessellation_worker = None  # Started for the first over-budget element tessellated in full
+        self.geometry_profile = geometry_profile
+        self.mesh_cache_path = mesh_cache_path
+        self.mesh_cache_size = mesh_cache_size
+        self.use_analytic_quantities = use_analytic_quantities
+        self.type_library_path = type_library_path
+        self.type_library_size = type_library_size
+        self.revision_store_path = revision_store_path
+        self.element_hasher = None
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
         self.logged_material_ids = set()  # Track which material IDs we've already logged errors for
+        self.material_cache = {}  # Resolved materials by material definition entity id
+        self._pending_elements = []  # Measured elements waiting for their oriented bounding boxes
+        self.element_table = ElementTable()  # Recorded elements, aggregated into the results at the end
+        self._checkpoint_mark = self.element_table.mark()  # End of the element table at the last checkpoint
+        self._checkpoint_fallbacks = 0  # Geometry fallbacks recorded before the last checkpoint
         
         try:
             self.ifc_file = ifcopenshell.open(ifc_file_path)
@@ -70,299 +216,838 @@ class MaterialTakeoffAnalyzer:
             self.logger.info(f"IFC schema: {self.ifc_file.schema}")
             
             # Initialize database
-            self.db = IFCDatabase()
-            self.ifc_file_id = self.db.store_ifc_file(ifc_file_path, self.ifc_file.schema)
+            self.db = None
+            self.ifc_file_id = None
+            if use_database:
+                self.db = IFCDatabase()
+                self.ifc_file_id = self.db.store_ifc_file(ifc_file_path, self.ifc_file.schema)
         except Exception as e:
             self.logger.error(f"Failed to load IFC file: {e}")
             raise
         
+        # Scale from file length units to meters
+        self.unit_scale = ifcopenshell.util.unit.calculate_unit_scale(self.ifc_file)
+        
+        # Concrete classes to analyze, resolved once from the class hierarchy
+        self.element_filter = ElementFilter(self.ifc_file, include_classes, exclude_classes, self.logger)
+        
         # Initialize settings for geometry processing
-        self.settings = ifcopenshell.geom.settings()
-        self.settings.set(self.settings.USE_WORLD_COORDS, True)
+        self.settings = self.create_geometry_settings()
+        
+        # Cheaper settings for elements over the geometry budget
+        self.simplified_settings = self.create_geometry_settings(simplified=True)
+        
+        # Layer thicknesses for analytic quantities and per-layer volumes
+        self.layer_quantities = LayerSetQuantities(self.ifc_file)
+        
+        # Profile areas for analytic quantities of members and per-profile volumes
+        self.profile_quantities = ProfileSetQuantities(self.ifc_file)
+        
+        # Element geometry measured by earlier analyses of the same file
+        self.mesh_cache = None
+        if mesh_cache_path:
+            try:
+                settings_key = MeshStatsDiskCache.make_settings_key(
+                    profile=geometry_profile,
+                    ifcopenshell=ifcopenshell.version,
+                    **GEOMETRY_PROFILES[geometry_profile]
+                )
+                self.mesh_cache = MeshStatsDiskCache(
+                    mesh_cache_path, ifc_file_path, settings_key, mesh_cache_size, logger=self.logger
+                )
+                self.logger.info(f"Loaded {len(self.mesh_cache)} cached element meshes")
+            except Exception as e:
+                self.logger.warning(f"Mesh statistics cache disabled: {str(e)}")
+        
+        # Type geometry measured by earlier analyses of any file
+        self.type_library = None
+        if type_library_path and use_representation_cache:
+            try:
+                settings_key = TypeGeometryLibrary.make_settings_key(
+                    profile=geometry_profile,
+                    ifcopenshell=ifcopenshell.version,
+                    **GEOMETRY_PROFILES[geometry_profile]
+                )
+                self.type_library = TypeGeometryLibrary(
+                    type_library_path, settings_key, type_library_size, logger=self.logger
+                )
+            except Exception as e:
+                self.logger.warning(f"Type geometry library disabled: {str(e)}")
+        
+        # Element results of the last analyzed revision of the same project
+        self.revision_store = None
+        if revision_store_path:
+            try:
+                settings_key = RevisionStore.make_settings_key(
+                    profile=geometry_profile,
+                    ifcopenshell=ifcopenshell.version,
+                    geometry_engine=geometry_engine,
+                    extraction_mode=extraction_mode,
+                    geometry_budget=geometry_budget,
+                    geometry_time_limit=geometry_time_limit,
+                    use_analytic_quantities=use_analytic_quantities,
+                    **GEOMETRY_PROFILES[geometry_profile]
+                )
+                self.revision_store = RevisionStore(
+                    revision_store_path, RevisionStore.make_project_key(self.ifc_file, ifc_file_path),
+                    settings_key, logger=self.logger
+                )
+            except Exception as e:
+                self.logger.warning(f"Revision store disabled: {str(e)}")
+        
+        # Element results of an interrupted analysis of the same file
+        self.checkpoint = None
+        if checkpoint_path:
+            try:
+                settings_key = AnalysisCheckpoint.make_settings_key(
+                    profile=geometry_profile,
+                    ifcopenshell=ifcopenshell.version,
+                    geometry_engine=geometry_engine,
+                    extraction_mode=extraction_mode,
+                    geometry_budget=geometry_budget,
+                    geometry_time_limit=geometry_time_limit,
+                    use_analytic_quantities=use_analytic_quantities,
+                    **GEOMETRY_PROFILES[geometry_profile]
+                )
+                self.checkpoint = AnalysisCheckpoint(
+                    checkpoint_path, ifc_file_path, settings_key, checkpoint_interval, logger=self.logger
+                )
+            except Exception as e:
+                self.logger.warning(f"Checkpoints disabled: {str(e)}")
+        
+        # Shared geometry of instanced types (IfcMappedItem)
+        self.representation_cache = None
+        if use_representation_cache:
+            self.representation_cache = RepresentationMapCache(
+                self.ifc_file, self.settings, self.logger, library=self.type_library
+            )
         
         # Initialize material takeoff data structure
-        self.results = {
-            'element_types': defaultdict(lambda: {
-                'count': 0,
-                'total_volume': 0.0,
-                'total_area': 0.0,
-                'materials': defaultdict(lambda: {
-                    'count': 0,
-                    'volume': 0.0,
-                    'area': 0.0,
-                    'properties': defaultdict(str),
-                    'grades': [],
-                    'specifications': [],
-                    'material_type': '',
-                    'category': '',
-                    'description': '',
-                    'dimensions': []
-                }),
-                'dimensions': []
-            }),
-            'materials': defaultdict(lambda: {
-                'count': 0,
-                'total_volume': 0.0,
-                'total_area': 0.0,
-                'properties': defaultdict(str),
-                'grades': [],
-                'specifications': [],
-                'material_type': '',
-                'category': '',
-                'description': '',
-                'element_types': [],
-                'dimensions': []
-            })
-        }
+        self.results = TakeoffResults(geometry_profile)
     
-    def calculate_volume_and_area(self, shape):
-        """Calculate volume and area from shape geometry."""
-        try:
-            if not shape or not shape.geometry:
-                return 0.0, 0.0
-                
-            # Get vertices and faces
-            verts = shape.geometry.verts
-            faces = shape.geometry.faces
+    def create_geometry_settings(self, simplified=False):
+        """
+        Create ifcopenshell.geom settings for the analyzer's geometry profile.
+        
+        Args:
+            simplified (bool): Also skip openings and boolean operations, for
+                elements over the geometry budget
             
-            if not verts or not faces:
-                return 0.0, 0.0
-                
-            # Convert to numpy arrays
-            verts_array = np.array(verts).reshape(-1, 3)
-            faces_array = np.array(faces).reshape(-1, 3)
+        Returns:
+            ifcopenshell.geom.settings: The tessellation settings
+        """
+        return geometry_settings(self.geometry_profile, simplified)
+    
+    def calculate_mesh_stats(self, shape):
+        """
+        Measure a shape's mesh in a single pass.
+        
+        Args:
+            shape: Shape returned by ifcopenshell.geom.create_shape
             
-            # Calculate area using triangulated faces
-            area = 0.0
-            for face in faces_array:
-                v1 = verts_array[face[0]]
-                v2 = verts_array[face[1]]
-                v3 = verts_array[face[2]]
-                
-                # Calculate face normal
-                edge1 = v2 - v1
-                edge2 = v3 - v1
-                normal = np.cross(edge1, edge2)
-                face_area = np.linalg.norm(normal) / 2.0
-                area += face_area
+        Returns:
+            MeshStats: Area split by orientation, volume, bounding box and centroid, or None
+        """
+        try:
+            return mesh_stats_from_shape(shape)
+        except Exception as e:
+            self.logger.warning(f"Error calculating mesh statistics: {str(e)}")
+            return None
+
+    def analyze_all_elements(self):
+        """Analyze all elements in the IFC file."""
+        try:
+            # Only elements new or changed since the previous revision are analyzed
+            element_ids = None
+            if self.revision_store is not None:
+                element_ids = self._reuse_unchanged_elements()
+            
+            # Elements checkpointed by an interrupted analysis are not analyzed again
+            if self.checkpoint is not None:
+                element_ids = self._resume_from_checkpoint(element_ids)
             
-            # Estimate volume using bounding box
-            bbox = self.calculate_bounding_box(verts)
-            if bbox:
-                dims = bbox['bounding_box']['dimensions']
-                volume = dims[0] * dims[1] * dims[2]
+            if self.num_processes > 1:
+                self._analyze_sharded(element_ids)
             else:
-                volume = 0.0
+                self.analyze_elements(element_ids)
             
-            return volume, area
+            if self.checkpoint is not None:
+                self.checkpoint.clear()
+        except KeyboardInterrupt:
+            self.logger.warning("Analysis interrupted by user. Saving partial results...")
+            if self.checkpoint is not None and self.num_processes == 1:
+                self._save_checkpoint(include_unmeasured=False)
+
+            # Keep the elements recorded before the interruption
+            self._flush_pending_elements()
+            self.element_table.aggregate(self.results)
+            self._reset_element_table()
+
+        if self.representation_cache is not None:
+            self.logger.info(
+                f"Representation map cache: {self.representation_cache.hits} hits, "
+                f"{self.representation_cache.misses} misses, "
+                f"{self.representation_cache.nbytes / 1024:.1f} KiB of meshes"
+            )
+        
+        if self.type_library is not None:
+            library = self.results.type_library
+            lookups = library['hits'] + library['misses']
+            if lookups:
+                self.logger.info(
+                    f"Type geometry library: {library['hits']} hits, {library['misses']} misses "
+                    f"({library['hits'] / lookups * 100:.1f}% hit rate)"
+                )
+        
+        return self.results
+
+    def analyze_elements(self, element_ids=None):
+        """
+        Analyze elements and accumulate them into the results.
+        
+        Results of separate calls (e.g. from worker processes) can be merged
+        with TakeoffResults.merge.
+        
+        Args:
+            element_ids (list): IDs of the elements to analyze, or None for all selected elements
+        """
+        if element_ids is None:
+            products = self.select_elements()
+        else:
+            products = [self.ifc_file.by_id(element_id) for element_id in element_ids]
+        total_elements = len(products)
+        fallbacks_start = len(self.results.geometry_fallbacks)
+        
+        self.logger.info(f"Analyzing {total_elements} elements with the '{self.geometry_profile}' geometry profile")
+        
+        # Read all quantity sets up front so elements can skip tessellation
+        if self.extraction_mode == 'quantity_set' and self.quantity_index is None:
+            self.quantity_index = QuantityIndex(self.ifc_file)
+            self.logger.info(f"Read quantity sets for {len(self.quantity_index)} elements")
+        
+        # Type boxes are read as instances need them
+        if self.extraction_mode == 'bounding_box' and self.type_boxes is None:
+            self.type_boxes = TypeBoundingBoxes(self.ifc_file)
+        
+        self._index_materials()
+        
+        if self.geometry_engine == 'iterator':
+            self._analyze_with_iterator(products, total_elements)
+        else:
+            self._analyze_with_create_shape(products, total_elements)
+        self._flush_pending_elements()
+        
+        if self.tessellation_worker is not None:
+            self.tessellation_worker.close()
+            self.tessellation_worker = None
+        
+        # Keep the element results for later revisions of the project
+        if self.revision_store is not None:
+            self._store_element_records(products, self.results.geometry_fallbacks[fallbacks_start:])
+        
+        # Worker processes return their results only once all their shards are analyzed
+        if self.checkpoint is not None:
+            self._save_checkpoint()
+        
+        # Build element type, material and catalog totals from the recorded elements at once
+        self.element_table.aggregate(self.results)
+        self._reset_element_table()
+        
+        self.logger.info(f"Resolved {len(self.material_cache)} material definitions")
+        profile_cache = self.profile_quantities.profile_cache
+        if profile_cache.misses:
+            self.logger.info(f"Profile cache: {profile_cache.hits} hits, {profile_cache.misses} misses")
+        
+        if self.mesh_cache is not None:
+            self.mesh_cache.flush()
+            self.logger.info(f"Mesh cache: {self.mesh_cache.hits} hits, {self.mesh_cache.misses} misses")
+        
+        if self.type_library is not None:
+            self.type_library.flush()
+            self.results.type_library['hits'] += self.type_library.hits
+            self.results.type_library['misses'] += self.type_library.misses
+            self.type_library.hits = self.type_library.misses = 0
+
+    def select_elements(self):
+        """Get the elements of the classes selected by the element filter."""
+        return self.element_filter.select(self.ifc_file)
+
+    def _index_materials(self):
+        """Map elements to their materials in one pass over the associations."""
+        if self.material_index is None:
+            self.material_index = MaterialIndex(self.ifc_file)
+            self.logger.info(f"Indexed materials of {len(self.material_index)} elements")
+
+    def _get_element_hasher(self):
+        """Get the content hasher of elements, which shares the material index."""
+        if self.element_hasher is None:
+            self._index_materials()
+            self.element_hasher = ElementHasher(self.unit_scale, self.material_index)
+        return self.element_hasher
+
+    def _reuse_unchanged_elements(self):
+        """
+        Add elements unchanged since the project's previous revision from the revision store.
+        
+        Elements are compared by GlobalId and content hash, and the added,
+        changed and removed GlobalIds are recorded in the results' changes.
+        Removed elements are dropped from the store.
+        
+        Returns:
+            list: IDs of the new and changed elements, which must be analyzed
+        """
+        hasher = self._get_element_hasher()
+        previous = self.revision_store.global_ids()
+        current = set()
+        added, changed, element_ids = [], [], []
+        unchanged = 0
+        
+        for product in self.select_elements():
+            if not product.is_a('IfcElement'):
+                continue
+            global_id = product.GlobalId
+            current.add(global_id)
+            try:
+                stored, record = self.revision_store.get(global_id, hasher.hash_element(product))
+            except Exception as e:
+                self.logger.warning(f"Error comparing element {product.id()} with the previous revision: {str(e)}")
+                stored, record = global_id in previous, None
             
-        except Exception as e:
-            self.logger.warning(f"Error calculating volume and area: {str(e)}")
-            return 0.0, 0.0
+            if record is None:
+                (changed if stored else added).append(global_id)
+                element_ids.append(product.id())
+                continue
+            
+            self._replay_record(product, record)
+            unchanged += 1
+        
+        removed = sorted(previous - current)
+        self.revision_store.remove(removed)
+        self.element_table.aggregate(self.results)
+        self._reset_element_table()
+        
+        self.results.changes = {
+            'previous_elements': len(previous),
+            'unchanged': unchanged,
+            'added': added,
+            'changed': changed,
+            'removed': removed
+        }
+        self.logger.info(
+            f"Revision changes: {len(added)} added, {len(changed)} changed, {len(removed)} removed, "
+            f"{unchanged} unchanged elements reused"
+        )
+        return element_ids
 
-    def analyze_all_elements(self):
-        """Analyze all elements in the IFC file."""
-        total_elements = len(self.ifc_file.by_type('IfcProduct'))
-        processed_elements = 0
-        batch_size = 100  # Process elements in batches
+    def _resume_from_checkpoint(self, element_ids):
+        """
+        Add the elements checkpointed by an interrupted analysis of the file.
+        
+        Args:
+            element_ids (list): IDs of the elements to analyze, or None for all selected elements
+        
+        Returns:
+            list: IDs of the elements that are not checkpointed, or element_ids
+            unchanged if there is no checkpoint
+        """
+        records = self.checkpoint.load()
+        if not records:
+            return element_ids
         
-        self.logger.info(f"Analyzing {total_elements} elements")
+        if element_ids is None:
+            element_ids = [p.id() for p in self.select_elements() if p.is_a('IfcElement')]
         
-        # Create a structure to track unique elements by dimensions and material
-        # Using a regular dict instead of defaultdict for better type checking
-        element_catalog = {}
+        fallbacks_start = len(self.results.geometry_fallbacks)
+        remaining = []
+        resumed = []
+        for element_id in element_ids:
+            record = records.get(element_id)
+            if record is None:
+                remaining.append(element_id)
+                continue
+            product = self.ifc_file.by_id(element_id)
+            self._replay_record(product, record)
+            resumed.append(product)
         
-        try:
-            for product in self.ifc_file.by_type('IfcProduct'):
+        # Resumed elements were never stored for later revisions
+        if self.revision_store is not None:
+            self._store_element_records(resumed, self.results.geometry_fallbacks[fallbacks_start:])
+        
+        self.element_table.aggregate(self.results)
+        self._reset_element_table()
+        self.logger.info(
+            f"Resumed {len(resumed)} elements from the checkpoint, {len(remaining)} elements left to analyze"
+        )
+        return remaining
+
+    def _replay_record(self, product, record):
+        """Add an element from a stored record instead of analyzing it."""
+        name = product.Name if hasattr(product, 'Name') else ''
+        self.element_table.add_record(product.id(), name, record)
+        if 'fallback' in record:
+            self.results.geometry_fallbacks.append({
+                'id': product.id(),
+                'name': name,
+                'element_type': product.is_a(),
+                'source': record['fallback']
+            })
+
+    def _reset_element_table(self):
+        """Start a new element table once the recorded elements are aggregated."""
+        self.element_table = ElementTable()
+        self._checkpoint_mark = self.element_table.mark()
+        self._checkpoint_fallbacks = len(self.results.geometry_fallbacks)
+
+    def _save_checkpoint(self, include_unmeasured=True):
+        """
+        Checkpoint the elements recorded since the last checkpoint.
+        
+        Args:
+            include_unmeasured (bool): Also checkpoint counted elements without
+                measurements. Only safe when every counted element is finished, which
+                is not the case while the geometry iterator runs, as it counts all
+                elements up front
+        """
+        self._flush_pending_elements()
+        counted_start, row_start, material_start = self._checkpoint_mark
+        if not include_unmeasured:
+            counted_start = len(self.element_table.counted_ids)
+        records = self.element_table.records((counted_start, row_start, material_start))
+        
+        fallbacks = self.results.geometry_fallbacks[self._checkpoint_fallbacks:]
+        for fallback in fallbacks:
+            if fallback['id'] in records:
+                records[fallback['id']]['fallback'] = fallback['source']
+        
+        self.checkpoint.write(records)
+        end = self.element_table.mark()
+        self._checkpoint_mark = (end[0] if include_unmeasured else self._checkpoint_mark[0], end[1], end[2])
+        self._checkpoint_fallbacks += len(fallbacks)
+
+    def _store_element_records(self, products, fallbacks):
+        """
+        Store the recorded results of analyzed elements in the revision store.
+        
+        Args:
+            products (list): The analyzed elements
+            fallbacks (list): Geometry fallbacks recorded while analyzing them
+        """
+        hasher = self._get_element_hasher()
+        records = self.element_table.records()
+        fallback_sources = {fallback['id']: fallback['source'] for fallback in fallbacks}
+        for product in products:
+            record = records.get(product.id())
+            if record is None:
+                continue
+            if product.id() in fallback_sources:
+                record['fallback'] = fallback_sources[product.id()]
+            try:
+                self.revision_store.put(product.GlobalId, hasher.hash_element(product), record)
+            except Exception as e:
+                self.logger.warning(f"Error storing element {product.id()} for later revisions: {str(e)}")
+        self.revision_store.flush()
+
+    def _analyze_sharded(self, element_ids=None):
+        """
+        Analyze elements in worker processes and merge their partial results.
+        
+        Args:
+            element_ids (list): IDs of the elements to analyze, or None for all selected elements
+        """
+        if element_ids is None:
+            elements = [p for p in self.select_elements() if p.is_a('IfcElement')]
+        else:
+            elements = [self.ifc_file.by_id(element_id) for element_id in element_ids]
+        total_elements = len(elements)
+        if not elements:
+            return
+        
+        shards = plan_shards(elements, self.num_processes * SHARDS_PER_PROCESS)
+        self.logger.info(
+            f"Analyzing {total_elements} elements in {len(shards)} shards "
+            f"on {self.num_processes} processes"
+        )
+        
+        # Each process already gets its own core, so iterators run single-threaded
+        analyzer_options = {
+            'geometry_engine': self.geometry_engine,
+            'num_workers': 1,
+            'use_representation_cache': self.representation_cache is not None,
+            'extraction_mode': self.extraction_mode,
+            'geometry_budget': self.geometry_budget,
+            'geometry_time_limit': self.geometry_time_limit,
+            'geometry_profile': self.geometry_profile,
+            'mesh_cache_path': self.mesh_cache_path,
+            'mesh_cache_size': self.mesh_cache_size,
+            'use_analytic_quantities': self.use_analytic_quantities,
+            'type_library_path': self.type_library_path,
+            'type_library_size': self.type_library_size,
+            'revision_store_path': self.revision_store_path,
+            'checkpoint_path': self.checkpoint_path,
+            'checkpoint_interval': self.checkpoint_interval
+        }
+        
+        processed_elements = 0
+        for partial in run_shards(self.ifc_file_path, shards, self.num_processes, analyzer_options):
+            self.results.merge(partial)
+            processed_elements += partial.element_count
+            self.logger.info(f"Processed {processed_elements}/{total_elements} elements ({(processed_elements/total_elements)*100:.1f}%)")
+
+    def _analyze_with_create_shape(self, products, total_elements):
+        """Tessellate and record elements one at a time with create_shape."""
+        processed_elements = 0
+        batch_size = 100  # Process elements in batches
+        
+        for product in products:
+            # Every element before this one is finished
+            if self.checkpoint is not None and self.checkpoint.due():
+                self._save_checkpoint()
+            
+            try:
+                processed_elements += 1
+                if processed_elements % batch_size == 0:
+                    self.logger.info(f"Processed {processed_elements}/{total_elements} elements ({(processed_elements/total_elements)*100:.1f}%)")
+                
+                # Skip non-physical elements
+                if not product.is_a('IfcElement'):
+                    continue
+                
+                element_type = product.is_a()
+                self.element_table.count(product.id(), element_type)
+                
+                # Get materials
+                materials = self.get_materials_with_properties(product)
+                
+                # Try to get geometry
                 try:
-                    processed_elements += 1
-                    if processed_elements % batch_size == 0:
-                        self.logger.info(f"Processed {processed_elements}/{total_elements} elements ({(processed_elements/total_elements)*100:.1f}%)")
-                    
-                    # Skip non-physical elements
-                    if not product.is_a('IfcElement'):
-                        continue
-                    
-                    element_type = product.is_a()
-                    self.results['element_types'][element_type]['count'] += 1
-                    
-                    # Get materials
-                    materials = self.get_materials_with_properties(product)
-                    
-                    # Try to get geometry
-                    try:
-                        shape = ifcopenshell.geom.create_shape(self.settings, product)
-                        if shape:
-                            # Calculate volume and area using our custom method
-                            volume, area = self.calculate_volume_and_area(shape)
-                            
-                            # Calculate bounding box
-                            bbox = self.calculate_bounding_box(shape.geometry.verts)
-                            if not bbox:
-                                continue
-                                
-                            # Normalize dimensions (sort them by size)
-                            dimensions = sorted(bbox['bounding_box']['dimensions'])
-                            length, width, height = dimensions[2], dimensions[1], dimensions[0]
-                            
-                            # Round dimensions to nearest millimeter (3 decimal places in meters)
-                            length = round(length, 3)
-                            width = round(width, 3)
-                            height = round(height, 3)
-                            
-                            # Update element type totals
-                            self.results['element_types'][element_type]['total_volume'] += volume
-                            self.results['element_types'][element_type]['total_area'] += area
-                            self.results['element_types'][element_type]['dimensions'].append(bbox)
-                            
-                            # For each material, add this element to the catalog
-                            for material_name, material_data in materials.items():
-                                # Generate a unique key for this element type + dimension + material
-                                dim_key = f"{element_type}|{material_name}|{length}x{width}x{height}"
-                                
-                                # Initialize the catalog entry if it doesn't exist yet
-                                if dim_key not in element_catalog:
-                                    element_catalog[dim_key] = {
-                                        'count': 0,
-                                        'volume': 0.0,
-                                        'area': 0.0,
-                                        'elements': [],
-                                        'dimensions': None,
-                                        'material_data': None
-                                    }
-                                
-                                # Add to catalog of unique elements
-                                element_catalog[dim_key]['count'] += 1
-                                element_catalog[dim_key]['volume'] += volume
-                                element_catalog[dim_key]['area'] += area
-                                
-                                if element_catalog[dim_key]['dimensions'] is None:
-                                    element_catalog[dim_key]['dimensions'] = {
-                                        'length': length,
-                                        'width': width,
-                                        'height': height
-                                    }
-                                
-                                if element_catalog[dim_key]['material_data'] is None:
-                                    element_catalog[dim_key]['material_data'] = material_data
-                                
-                                # Add element to the list
-                                element_catalog[dim_key]['elements'].append({
-                                    'id': product.id(),
-                                    'name': product.Name if hasattr(product, 'Name') else '',
-                                    'volume': volume,
-                                    'area': area,
-                                    'length': length,
-                                    'width': width,
-                                    'height': height
-                                })
-                                
-                                # Update element type material data
-                                if material_name not in self.results['element_types'][element_type]['materials']:
-                                    self.results['element_types'][element_type]['materials'][material_name] = {
-                                        'count': 0,
-                                        'volume': 0.0,
-                                        'area': 0.0,
-                                        'properties': defaultdict(str),
-                                        'grades': [],
-                                        'specifications': [],
-                                        'material_type': '',
-                                        'category': '',
-                                        'description': '',
-                                        'dimensions': []
-                                    }
-                                
-                                # Now perform the updates with proper initialization
-                                self.results['element_types'][element_type]['materials'][material_name]['count'] += 1
-                                self.results['element_types'][element_type]['materials'][material_name]['volume'] += volume
-                                self.results['element_types'][element_type]['materials'][material_name]['area'] += area
-                                self.results['element_types'][element_type]['materials'][material_name]['properties'].update(material_data['properties'])
-                                
-                                # Safe extension of lists
-                                if isinstance(material_data.get('grades'), list):
-                                    self.results['element_types'][element_type]['materials'][material_name]['grades'].extend(material_data['grades'])
-                                if isinstance(material_data.get('specifications'), list):
-                                    self.results['element_types'][element_type]['materials'][material_name]['specifications'].extend(material_data['specifications'])
-                                    
-                                self.results['element_types'][element_type]['materials'][material_name]['material_type'] = material_data['material_type']
-                                self.results['element_types'][element_type]['materials'][material_name]['category'] = material_data['category']
-                                self.results['element_types'][element_type]['materials'][material_name]['description'] = material_data['description']
-                                if bbox:
-                                    self.results['element_types'][element_type]['materials'][material_name]['dimensions'].append(bbox)
-                                
-                                # Update global material data
-                                # Initialize first if it doesn't exist
-                                if material_name not in self.results['materials']:
-                                    self.results['materials'][material_name] = {
-                                        'count': 0,
-                                        'total_volume': 0.0,
-                                        'total_area': 0.0,
-                                        'properties': defaultdict(str),
-                                        'grades': [],
-                                        'specifications': [],
-                                        'material_type': '',
-                                        'category': '',
-                                        'description': '',
-                                        'element_types': [],
-                                        'dimensions': []
-                                    }
-                                    
-                                self.results['materials'][material_name]['count'] += 1
-                                self.results['materials'][material_name]['total_volume'] += volume
-                                self.results['materials'][material_name]['total_area'] += area
-                                self.results['materials'][material_name]['properties'].update(material_data['properties'])
-                                
-                                # Safely extend lists
-                                if isinstance(material_data.get('grades'), list):
-                                    self.results['materials'][material_name]['grades'].extend(material_data['grades'])
-                                if isinstance(material_data.get('specifications'), list):
-                                    self.results['materials'][material_name]['specifications'].extend(material_data['specifications'])
-                                    
-                                self.results['materials'][material_name]['material_type'] = material_data['material_type']
-                                self.results['materials'][material_name]['category'] = material_data['category']
-                                self.results['materials'][material_name]['description'] = material_data['description']
-                                
-                                # Safely append to element_types list
-                                if isinstance(self.results['materials'][material_name]['element_types'], list):
-                                    self.results['materials'][material_name]['element_types'].append(element_type)
-                                
-                                # Safely append to dimensions list
-                                if bbox and isinstance(self.results['materials'][material_name]['dimensions'], list):
-                                    self.results['materials'][material_name]['dimensions'].append(bbox)
-                    except Exception as e:
-                        self.logger.warning(f"Error processing geometry for element {product.id()}: {str(e)}")
+                    # Quantity sets and cached instance meshes avoid tessellation
+                    stats, source = self._measure_without_tessellation(product)
+                    cache = False
+                    if stats is None and self._exceeds_geometry_budget(product):
+                        # Over-budget elements are never tessellated in full below
+                        stats, source = self._measure_over_budget(product)
+                        if stats is None:
+                            continue
+                        cache = source == 'geometry'
+                    if stats is not None:
+                        self._record_element(product, element_type, materials, stats, source, cache=cache)
                         continue
                     
+                    shape = ifcopenshell.geom.create_shape(self.settings, product)
+                    if shape:
+                        # Measure volume, area and bounding box in one pass over the mesh
+                        stats = self.calculate_mesh_stats(shape)
+                        if stats is None:
+                            continue
+                        self._record_element(product, element_type, materials, stats, cache=True)
                 except Exception as e:
-                    self.logger.warning(f"Error processing element {product.id()}: {str(e)}")
+                    self.logger.warning(f"Error processing geometry for element {product.id()}: {str(e)}")
                     continue
                 
-        except KeyboardInterrupt:
-            self.logger.warning("Analysis interrupted by user. Saving partial results...")
+            except Exception as e:
+                self.logger.warning(f"Error processing element {product.id()}: {str(e)}")
+                continue
+
+    def _analyze_with_iterator(self, products, total_elements):
+        """
+        Tessellate elements on multiple cores with ifcopenshell.geom.iterator.
+        
+        Shapes are recorded as the iterator yields them; elements without any
+        geometry are still counted under their element type.
+        """
+        elements = [p for p in products if p.is_a('IfcElement')]
+        for product in elements:
+            self.element_table.count(product.id(), product.is_a())
         
-        # Store the element catalog in the results
-        self.results['element_catalog'] = dict(element_catalog)
+        batch_size = 100
+        processed_elements = total_elements - len(elements)
         
-        # Calculate summary statistics and store the updated results
-        self.results = self.calculate_summary_statistics(self.results)
+        # Elements measurable from quantity sets or cached instance meshes are
+        # recorded first, everything else is left to the iterator
+        to_tessellate = []
+        for product in elements:
+            try:
+                stats, source = self._measure_without_tessellation(product)
+                cache = False
+                if stats is None and self._exceeds_geometry_budget(product):
+                    # Over-budget elements are never left to the iterator
+                    stats, source = self._measure_over_budget(product)
+                    cache = source == 'geometry'
+                elif stats is None:
+                    to_tessellate.append(product)
+                    continue
+                processed_elements += 1
+                if stats is None:
+                    continue
+                materials = self.get_materials_with_properties(product)
+                self._record_element(product, product.is_a(), materials, stats, source, cache=cache)
+            except Exception as e:
+                self.logger.warning(f"Error processing element {product.id()}: {str(e)}")
+        elements = to_tessellate
         
-        return self.results
-    
+        if not elements:
+            return
+        
+        self.logger.info(f"Tessellating {len(elements)} elements with {self.num_workers} worker(s)")
+        iterator = ifcopenshell.geom.iterator(
+            self.settings, self.ifc_file, self.num_workers, include=elements
+        )
+        if not iterator.initialize():
+            self.logger.warning("Geometry iterator produced no shapes")
+            return
+        
+        while True:
+            if self.checkpoint is not None and self.checkpoint.due():
+                self._save_checkpoint(include_unmeasured=False)
+            
+            shape = iterator.get()
+            processed_elements += 1
+            if processed_elements % batch_size == 0:
+                self.logger.info(f"Processed {processed_elements}/{total_elements} elements ({(processed_elements/total_elements)*100:.1f}%)")
+            
+            product = None
+            try:
+                product = self.ifc_file.by_id(shape.id)
+                materials = self.get_materials_with_properties(product)
+                stats = self.calculate_mesh_stats(shape)
+                if stats is not None:
+                    self._record_element(product, product.is_a(), materials, stats, cache=True)
+            except Exception as e:
+                element_id = product.id() if product is not None else shape.id
+                self.logger.warning(f"Error processing element {element_id}: {str(e)}")
+            
+            if not iterator.next():
+                break
+
+    def _measure_without_tessellation(self, product):
+        """
+        Measure an element without building its own geometry.
+        
+        Tries the element's quantity sets (in 'quantity_set' mode), its own or
+        its type's bounding box (in 'bounding_box' mode), analytic quantities of
+        layered elements, profiled members and bodies made of extrusions, the
+        representation map cache for mapped instances and then the mesh cache
+        of earlier analyses of the file.
+        
+        Returns:
+            tuple: (MeshStats, source) where source is 'quantity_set', 'bounding_box',
+            'analytic' or 'geometry', or (None, None) if the element must be tessellated
+        """
+        if self.extraction_mode == 'quantity_set' and self.quantity_index is not None:
+            stats = self._measure_quantity_set(product)
+            if stats is not None:
+                return stats, 'quantity_set'
+        
+        if self.extraction_mode == 'bounding_box' and self.type_boxes is not None:
+            stats = measure_bounding_box(product, self.unit_scale)
+            if stats is None:
+                stats = self.type_boxes.measure(product)
+            if stats is not None:
+                return stats, 'bounding_box'
+        
+        if self.use_analytic_quantities and self.material_index is not None:
+            material = self.material_index.get(product)
+            stats = self.layer_quantities.measure(product, material)
+            if stats is None:
+                stats = self.profile_quantities.measure(product, material)
+            if stats is None:
+                stats = measure_extruded_body(product, self.unit_scale, self.profile_quantities.profile_cache)
+            if stats is not None:
+                return stats, 'analytic'
+        
+        if self.representation_cache is not None:
+            stats = self.representation_cache.measure(product)
+            if stats is not None:
+                return stats, 'geometry'
+        
+        if self.mesh_cache is not None:
+            stats = self.mesh_cache.get(getattr(product, 'GlobalId', None))
+            if stats is not None:
+                return stats, 'geometry'
+        
+        return None, None
+
+    def _measure_quantity_set(self, product):
+        """Measure an element from its quantity sets, with the cross-section of its profile set if it has one."""
+        cross_section = None
+        if self.material_index is not None:
+            cross_section = self.profile_quantities.cross_section(self.material_index.get(product))
+        return self.quantity_index.measure(product, cross_section)
+
+    def _cache_mesh_stats(self, product, stats):
+        """Store an element's tessellated mesh statistics in the mesh cache."""
+        if self.mesh_cache is not None:
+            self.mesh_cache.put(getattr(product, 'GlobalId', None), stats)
+
+    def _exceeds_geometry_budget(self, product):
+        """Check whether an element is too expensive to tessellate in full."""
+        if self.geometry_budget is None:
+            return False
+        return estimate_element_cost(product) > self.geometry_budget
+
+    def _measure_over_budget(self, product):
+        """
+        Measure an element whose full geometry is over the geometry budget.
+        
+        Falls back, in order, to the element's quantity sets, its bounding box
+        representation and tessellation without openings and boolean operations
+        if that is within budget. If none of them can measure the element, it
+        is tessellated in full in the tessellation worker, which gives up after
+        geometry_time_limit seconds. The element and the fallback used
+        ('geometry' for full tessellation, 'timed_out' if it was given up) are
+        recorded in the results' geometry_fallbacks.
+        
+        Returns:
+            tuple: (MeshStats, source), with None stats if the element could
+            not be measured
+        """
+        if self.quantity_index is None:
+            self.quantity_index = QuantityIndex(self.ifc_file)
+        stats, source = self._measure_quantity_set(product), 'quantity_set'
+        
+        if stats is None:
+            stats, source = measure_bounding_box(product, self.unit_scale), 'bounding_box'
+        
+        if stats is None and estimate_element_cost(product, booleans=False) <= self.geometry_budget:
+            try:
+                shape = ifcopenshell.geom.create_shape(self.simplified_settings, product)
+                stats, source = self.calculate_mesh_stats(shape), 'simplified_geometry'
+            except Exception as e:
+                self.logger.warning(f"Error processing simplified geometry for element {product.id()}: {str(e)}")
+        
+        if stats is None:
+            stats, source = self._tessellate_over_budget(product)
+        
+        self.results.geometry_fallbacks.append({
+            'id': product.id(),
+            'name': product.Name if hasattr(product, 'Name') else '',
+            'element_type': product.is_a(),
+            'source': source
+        })
+        return stats, source
+
+    def _tessellate_over_budget(self, product):
+        """
+        Tessellate an element over the geometry budget in full, within the time limit.
+        
+        Returns:
+            tuple: (MeshStats, 'geometry'), or (None, 'timed_out') if the
+            element took longer than geometry_time_limit seconds
+        """
+        self.logger.warning(
+            f"Element {product.id()} is over the geometry budget and has no cheaper geometry, tessellating it in full"
+        )
+        if self.geometry_time_limit is None:
+            shape = ifcopenshell.geom.create_shape(self.settings, product)
+            return self.calculate_mesh_stats(shape), 'geometry'
+        
+        if self.tessellation_worker is None:
+            self.tessellation_worker = TessellationWorker(
+                self.ifc_file_path, self.geometry_profile, self.geometry_time_limit
+            )
+        try:
+            return self.tessellation_worker.tessellate(product.id()), 'geometry'
+        except TimeoutError:
+            self.logger.warning(
+                f"Gave up tessellating element {product.id()} after {self.geometry_time_limit} seconds"
+            )
+            return None, 'timed_out'
+
+    def _record_element(self, product, element_type, materials, stats, source='geometry', cache=False):
+        """
+        Queue a measured element to be added to the takeoff results.
+        
+        Elements are added in batches of ORIENTED_BOX_BATCH_SIZE so the oriented
+        bounding boxes giving their catalog dimensions are computed together.
+        
+        Args:
+            product: The IFC element
+            element_type (str): IFC class of the element
+            materials (dict): Materials from get_materials_with_properties
+            stats (MeshStats): Measured geometry of the element
+            source (str): Where the quantities came from, e.g. 'geometry', 'analytic' or 'quantity_set'
+            cache (bool): Store the statistics in the mesh cache once the oriented box is known
+        """
+        self._pending_elements.append((product, element_type, materials, stats, source, cache))
+        if len(self._pending_elements) >= ORIENTED_BOX_BATCH_SIZE:
+            self._flush_pending_elements()
+
+    def _flush_pending_elements(self):
+        """Compute the oriented bounding boxes of queued elements and add them to the element table."""
+        pending, self._pending_elements = self._pending_elements, []
+        if not pending:
+            return
+        
+        try:
+            assign_oriented_extents([(product, stats) for product, _, _, stats, _, _ in pending])
+        except Exception as e:
+            # Fall back to the axis-aligned boxes
+            self.logger.warning(f"Error calculating oriented bounding boxes: {str(e)}")
+            for _, _, _, stats, _, _ in pending:
+                stats.points = None
+        
+        for product, element_type, materials, stats, source, cache in pending:
+            try:
+                if cache:
+                    self._cache_mesh_stats(product, stats)
+                self._add_element(product, element_type, materials, stats, source)
+            except Exception as e:
+                self.logger.warning(f"Error recording element {product.id()}: {str(e)}")
+
+    def _add_element(self, product, element_type, materials, stats, source='geometry'):
+        """
+        Add a measured element and its materials to the element table.
+        
+        Args:
+            product: The IFC element
+            element_type (str): IFC class of the element
+            materials (dict): Materials from get_materials_with_properties
+            stats (MeshStats): Measured geometry of the element
+            source (str): Where the quantities came from, e.g. 'geometry', 'analytic' or 'quantity_set'
+        """
+        volume = stats.volume
+        
+        # Layered and profiled elements split their volume between the layer or profile
+        # materials; other entries, like the layer set usage itself, get no volume
+        material_volumes = None
+        if self.material_index is not None:
+            material = self.material_index.get(product)
+            material_volumes = self.layer_quantities.split_volume(material, volume)
+            if material_volumes is None:
+                material_volumes = self.profile_quantities.split_volume(material, volume)
+        
+        # Normalize dimensions of the oriented bounding box (sort them by size)
+        # and round them to the nearest millimeter for the catalog key
+        height, width, length = sorted(stats.oriented_dimensions.tolist())
+        
+        self.element_table.add(
+            product.id(),
+            product.Name if hasattr(product, 'Name') else '',
+            element_type,
+            source,
+            volume,
+            stats.area,
+            stats.surface_areas,
+            stats.dimensions,
+            (round(length, 3), round(width, 3), round(height, 3)),
+            [
+                (material_name, material_data,
+                 material_volumes.get(material_name, 0.0) if material_volumes is not None else volume)
+                for material_name, material_data in materials.items()
+            ]
+        )
+
     def get_materials_with_properties(self, element):
         """Extract material information with properties from an element."""
-        materials = defaultdict(lambda: {
-            'properties': defaultdict(str),
-            'grades': [],
-            'specifications': [],
-            'material_type': '',
-            'category': '',
-            'description': ''
-        })
+        materials = defaultdict(new_element_material)
         
         try:
-            # Use ifcopenshell's utility function to get material, with better error handling
+            # Use the material index when built, otherwise ifcopenshell's utility function
             try:
-                material_data = ifcopenshell.util.element.get_material(element)
+                if self.material_index is not None:
+                    material_data = self.material_index.get(element)
+                else:
+                    material_data = ifcopenshell.util.element.get_material(element)
             except AttributeError as ae:
                 # Handle possible attribute errors from ifcopenshell
                 self.logger.warning(f"AttributeError getting material for element {element.id()}: {str(ae)}")
@@ -377,7 +1062,8 @@ class MaterialTakeoffAnalyzer:
                 # Handle material lists
                 for mat in material_data:
                     if isinstance(mat, str):
-                        # Handle string materials
+                        # Handle string materials, in a new entry as resolved ones are shared
+                        materials[mat] = new_element_material()
                         materials[mat]['material_type'] = 'String Material'
                         materials[mat]['description'] = 'String material from IFC'
                         # Set properties directly for string materials
@@ -387,7 +1073,7 @@ class MaterialTakeoffAnalyzer:
                         })
                     else:
                         try:
-                            self._process_material(mat, materials)
+                            materials.update(self._resolve_material(mat))
                         except AttributeError as ae:
                             self.logger.warning(f"AttributeError processing material in element {element.id()}: {str(ae)}")
                             # Skip this material and continue
@@ -404,12 +1090,13 @@ class MaterialTakeoffAnalyzer:
             elif hasattr(material_data, 'is_a'):
                 # Handle single material
                 try:
-                    self._process_material(material_data, materials)
+                    materials.update(self._resolve_material(material_data))
                 except AttributeError as ae:
                     self.logger.warning(f"AttributeError processing material in element {element.id()}: {str(ae)}")
                     # Try with a fallback approach
                     if hasattr(material_data, 'Name'):
                         mat_name = material_data.Name
+                        materials[mat_name] = new_element_material()
                         materials[mat_name]['material_type'] = 'Material'
                         materials[mat_name]['description'] = 'Fallback material'
                         # Set properties directly for fallback materials
@@ -423,6 +1110,33 @@ class MaterialTakeoffAnalyzer:
             self.logger.warning(f"Error getting materials for element {element_id}: {str(e)}")
         
         return materials
+    
+    def _resolve_material(self, material):
+        """
+        Resolve a material definition into material dicts, once per analysis.
+        
+        IfcMaterial, IfcMaterialLayerSetUsage, IfcMaterialProfileSetUsage, etc.
+        are shared by many elements, so the resolved material data is cached
+        by the definition's entity id and shared by every element using it.
+        It is frozen, so no element can modify the data of the others.
+        
+        Args:
+            material: The material definition entity
+            
+        Returns:
+            dict: Read-only material data by material name
+        """
+        material_id = material.id()
+        resolved = self.material_cache.get(material_id)
+        if resolved is None:
+            materials = defaultdict(new_element_material)
+            self._process_material(material, materials)
+            resolved = MappingProxyType({
+                material_name: freeze_element_material(material_data)
+                for material_name, material_data in materials.items()
+            })
+            self.material_cache[material_id] = resolved
+        return resolved
         
     def _process_material(self, material, materials_dict):
         """Process a single material and extract its properties."""
@@ -657,121 +1371,6 @@ class MaterialTakeoffAnalyzer:
                 self.logger.warning(f"Error processing material {material_id}: {str(e)}")
                 self.logged_material_ids.add(material_id)
     
-    def calculate_bounding_box(self, vertices):
-        """
-        Calculate bounding box from vertex data.
-        
-        Args:
-            vertices (list): List of vertex coordinates
-            
-        Returns:
-            dict: Bounding box information
-        """
-        try:
-            if not vertices:
-                return None
-            
-            # Convert to numpy array
-            verts_array = np.array(vertices).reshape(-1, 3)
-            
-            # Calculate min and max coordinates
-            min_coords = verts_array.min(axis=0)
-            max_coords = verts_array.max(axis=0)
-            
-            # Calculate dimensions
-            dimensions = max_coords - min_coords
-            
-            return {
-                'bounding_box': {
-                    'min': min_coords.tolist(),
-                    'max': max_coords.tolist(),
-                    'dimensions': dimensions.tolist()
-                }
-            }
-        except Exception as e:
-            self.logger.warning(f"Error calculating bounding box: {e}")
-            return None
-    
-    def calculate_summary_statistics(self, results):
-        """
-        Calculate summary statistics for each element type.
-        
-        Args:
-            results (dict): The results dictionary to update with statistics
-            
-        Returns:
-            dict: The updated results dictionary with statistics
-        """
-        # Safety check for None or invalid results
-        if not isinstance(results, dict) or 'element_types' not in results:
-            self.logger.warning("Invalid results dictionary passed to calculate_summary_statistics")
-            return results
-        
-        for element_type, data in results['element_types'].items():
-            if not isinstance(data, dict) or data.get('count', 0) <= 0:
-                continue
-            
-            # Calculate average dimensions from bounding boxes
-            if isinstance(data.get('dimensions'), list) and data['dimensions']:
-                # Extract dimensions from all bounding boxes
-                lengths = []
-                widths = []
-                heights = []
-                
-                for bbox in data['dimensions']:
-                    if isinstance(bbox, dict) and 'bounding_box' in bbox:
-                        dims = bbox['bounding_box'].get('dimensions', [0, 0, 0])
-                        if len(dims) >= 3:  # Make sure we have 3 dimensions
-                            lengths.append(dims[0])
-                            widths.append(dims[1])
-                            heights.append(dims[2])
-                
-                # Calculate averages
-                if lengths:
-                    data['avg_length'] = sum(lengths) / len(lengths)
-                if widths:
-                    data['avg_width'] = sum(widths) / len(widths)
-                if heights:
-                    data['avg_height'] = sum(heights) / len(heights)
-            
-            # Calculate total quantities
-            data['total_quantity'] = {
-                'volume': data.get('total_volume', 0),
-                'area': data.get('total_area', 0),
-                'count': data.get('count', 0)
-            }
-            
-            # Calculate material statistics
-            if isinstance(data.get('materials'), dict):
-                for material_name, material_data in data['materials'].items():
-                    if not isinstance(material_data, dict):
-                        continue
-                        
-                    if isinstance(material_data.get('dimensions'), list) and material_data['dimensions']:
-                        # Extract dimensions from all bounding boxes
-                        lengths = []
-                        widths = []
-                        heights = []
-                        
-                        for bbox in material_data['dimensions']:
-                            if isinstance(bbox, dict) and 'bounding_box' in bbox:
-                                dims = bbox['bounding_box'].get('dimensions', [0, 0, 0])
-                                if len(dims) >= 3:  # Make sure we have 3 dimensions
-                                    lengths.append(dims[0])
-                                    widths.append(dims[1])
-                                    heights.append(dims[2])
-                        
-                        # Calculate averages
-                        if lengths:
-                            material_data['avg_length'] = sum(lengths) / len(lengths)
-                        if widths:
-                            material_data['avg_width'] = sum(widths) / len(widths)
-                        if heights:
-                            material_data['avg_height'] = sum(heights) / len(heights)
-        
-        # Return the modified results
-        return results
-    
     def save_results(self, output_format='all'):
         """
         Save material takeoff results to file.
@@ -785,7 +1384,7 @@ class MaterialTakeoffAnalyzer:
             try:
                 output_path = f"{base_filename}_material_takeoff.json"
                 with open(output_path, 'w') as f:
-                    json.dump(self.results, f, indent=4)
+                    json.dump(self.results.to_json(), f, indent=4)
                 self.logger.info(f"Material takeoff saved to {output_path}")
             except Exception as e:
                 self.logger.error(f"Error saving JSON file: {str(e)}")
@@ -804,13 +1403,13 @@ class MaterialTakeoffAnalyzer:
                     writer.writerow(['Element Type', 'Count', 'Total Volume (m³)', 
                                    'Total Area (m²)', 'Materials'])
                     
-                    for element_type, data in self.results['element_types'].items():
+                    for element_type, data in self.results.element_types.items():
                         writer.writerow([
                             element_type,
-                            data['count'],
-                            f"{data['total_volume']:.2f}",
-                            f"{data['total_area']:.2f}",
-                            ', '.join(data['materials'].keys())
+                            data.count,
+                            f"{data.volume:.2f}",
+                            f"{data.area:.2f}",
+                            ', '.join(data.materials.keys())
                         ])
                 
                 self.logger.info(f"Material takeoff summary saved to {summary_path}")
@@ -823,19 +1422,21 @@ class MaterialTakeoffAnalyzer:
                                    'Area (m²)', 'Length (m)', 'Width (m)', 'Height (m)',
                                    'Materials', 'Material Properties'])
                     
-                    for element_type, data in self.results['element_types'].items():
-                        for element in data.get('elements', []):
+                    for key, data in self.results.element_catalog.items():
+                        element_type, material_name, _ = key.split('|', 2)
+                        properties = json.dumps(data.material_data['properties'])
+                        for element in data.elements():
                             writer.writerow([
                                 element_type,
-                                element.get('id'),
-                                element.get('name'),
-                                f"{element.get('volume', 0):.2f}",
-                                f"{element.get('area', 0):.2f}",
-                                f"{element.get('length', 0):.2f}",
-                                f"{element.get('width', 0):.2f}",
-                                f"{element.get('height', 0):.2f}",
-                                ', '.join(element.get('materials', {}).keys()),
-                                json.dumps(element.get('properties', {}))
+                                element['id'],
+                                element['name'],
+                                f"{element['volume']:.2f}",
+                                f"{element['area']:.2f}",
+                                f"{element['length']:.2f}",
+                                f"{element['width']:.2f}",
+                                f"{element['height']:.2f}",
+                                material_name,
+                                properties
                             ])
                 
                 self.logger.info(f"Material takeoff details saved to {details_path}")
@@ -843,7 +1444,8 @@ class MaterialTakeoffAnalyzer:
                 self.logger.error(f"Error saving CSV file: {str(e)}")
         
         # Close database connection
-        self.db.close()
+        if self.db is not None:
+            self.db.close()
 
     def save_to_excel(self, output_file):
         """Save results to an Excel file."""
@@ -890,29 +1492,16 @@ class MaterialTakeoffAnalyzer:
     def _save_minimal_excel(self, output_file):
         """Save a minimal version of the results to Excel in case the full version fails."""
         try:
-            # Don't rely on calculate_summary_statistics, use self.results directly
-            # This avoids NoneType is not subscriptable errors
-            
             # Create a list to hold material data
             materials_list = []
             
             # Iterate through materials in self.results if it exists
-            if isinstance(self.results, dict) and 'materials' in self.results:
-                for mat_name, mat_data in self.results['materials'].items():
-                    # Get volume and count with safe defaults
-                    volume = 0
-                    count = 0
-                    
-                    # Safely get values using get() with defaults
-                    if isinstance(mat_data, dict):
-                        volume = mat_data.get('total_volume', 0)
-                        count = mat_data.get('count', 0)
-                    
-                    # Add to our materials list
+            if self.results is not None:
+                for mat_name, mat_data in self.results.materials.items():
                     materials_list.append({
                         'Material': mat_name,
-                        'Volume (m³)': volume,
-                        'Count': count
+                        'Volume (m³)': mat_data.volume,
+                        'Count': mat_data.count
                     })
             
             # If we have no materials, add a placeholder row
@@ -969,18 +1558,18 @@ class MaterialTakeoffAnalyzer:
         
         # Add data to Element Type Summary sheet
         row = 2
-        for element_type, data in self.results['element_types'].items():
-            if data['count'] > 0:
+        for element_type, data in self.results.element_types.items():
+            if data.count > 0:
                 # Calculate total weight (using default density of steel)
-                total_weight = data['total_volume'] * 7850  # Default to steel density
+                total_weight = data.volume * 7850  # Default to steel density
                 
                 # Write data to separate cells
                 element_sheet.cell(row=row, column=1, value=element_type)
-                element_sheet.cell(row=row, column=2, value=data['count'])
-                element_sheet.cell(row=row, column=3, value=round(data['total_volume'], 3))
-                element_sheet.cell(row=row, column=4, value=round(data['total_area'], 3))
+                element_sheet.cell(row=row, column=2, value=data.count)
+                element_sheet.cell(row=row, column=3, value=round(data.volume, 3))
+                element_sheet.cell(row=row, column=4, value=round(data.area, 3))
                 element_sheet.cell(row=row, column=5, value=round(total_weight, 1))
-                element_sheet.cell(row=row, column=6, value=', '.join(data['materials'].keys()))
+                element_sheet.cell(row=row, column=6, value=', '.join(data.materials.keys()))
                 
                 # Add border to all cells in the row
                 for col in range(1, len(headers) + 1):
@@ -1021,10 +1610,10 @@ class MaterialTakeoffAnalyzer:
         
         # Add data to Material Summary sheet
         row = 2
-        for material_name, data in self.results['materials'].items():
+        for material_name, data in self.results.materials.items():
             # Calculate density for weight calculation (default to 7850 kg/m³ for steel if not specified)
             density = 7850  # Default density (steel)
-            for prop_name, prop_value in data['properties'].items():
+            for prop_name, prop_value in data.properties.items():
                 if 'density' in prop_name.lower() and prop_value:
                     try:
                         density = float(prop_value)
@@ -1033,19 +1622,19 @@ class MaterialTakeoffAnalyzer:
                         pass
             
             # Calculate total weight
-            total_weight = data['total_volume'] * density
+            total_weight = data.volume * density
             
             # Write data to separate cells
             summary_sheet.cell(row=row, column=1, value=material_name)
-            summary_sheet.cell(row=row, column=2, value=data['count'])
-            summary_sheet.cell(row=row, column=3, value=round(data['total_volume'], 3))
-            summary_sheet.cell(row=row, column=4, value=round(data['total_area'], 3))
+            summary_sheet.cell(row=row, column=2, value=data.count)
+            summary_sheet.cell(row=row, column=3, value=round(data.volume, 3))
+            summary_sheet.cell(row=row, column=4, value=round(data.area, 3))
             summary_sheet.cell(row=row, column=5, value=round(total_weight, 1))
-            summary_sheet.cell(row=row, column=6, value=', '.join(sorted(data['grades'])))
-            summary_sheet.cell(row=row, column=7, value=', '.join(sorted(data['specifications'])))
-            summary_sheet.cell(row=row, column=8, value=data['material_type'])
-            summary_sheet.cell(row=row, column=9, value=data['category'])
-            summary_sheet.cell(row=row, column=10, value=data['description'])
+            summary_sheet.cell(row=row, column=6, value=', '.join(sorted(data.grades)))
+            summary_sheet.cell(row=row, column=7, value=', '.join(sorted(data.specifications)))
+            summary_sheet.cell(row=row, column=8, value=data.material_type)
+            summary_sheet.cell(row=row, column=9, value=data.category)
+            summary_sheet.cell(row=row, column=10, value=data.description)
             
             # Add border to all cells in the row
             for col in range(1, len(headers) + 1):
@@ -1091,7 +1680,7 @@ class MaterialTakeoffAnalyzer:
             )
         
         # Check if we have element catalog data
-        if 'element_catalog' not in self.results:
+        if not self.results.element_catalog:
             takeoff_sheet.cell(row=2, column=1, value="No detailed element data available")
             return
             
@@ -1101,18 +1690,18 @@ class MaterialTakeoffAnalyzer:
         
         # First sort the catalog by element type, then by material
         try:
-            sorted_keys = sorted(self.results['element_catalog'].keys(), 
+            sorted_keys = sorted(self.results.element_catalog.keys(), 
                               key=lambda x: (x.split('|')[0], x.split('|')[1]))
         except (KeyError, ValueError):
             # Fallback if the key format is unexpected
-            sorted_keys = list(self.results['element_catalog'].keys())
+            sorted_keys = list(self.results.element_catalog.keys())
         
         for key in sorted_keys:
             try:
                 element_type, material_name, _ = key.split('|', 2)
-                data = self.results['element_catalog'][key]
-                material_data = data['material_data']
-                dimensions = data['dimensions']
+                data = self.results.element_catalog[key]
+                material_data = data.material_data
+                length, width, height = data.dimensions
                 
                 # Create element type headers (groups)
                 if current_element_type != element_type:
@@ -1136,9 +1725,9 @@ class MaterialTakeoffAnalyzer:
                             pass
                 
                 # Calculate weight
-                volume_each = data['volume'] / data['count'] if data['count'] > 0 else 0
+                volume_each = data.volume / data.count if data.count > 0 else 0
                 weight_each = volume_each * density
-                total_weight = data['volume'] * density
+                total_weight = data.volume * density
                 
                 # Prepare comments (can include material type, category, etc.)
                 comments = material_data['description']
@@ -1148,13 +1737,13 @@ class MaterialTakeoffAnalyzer:
                 takeoff_sheet.cell(row=row, column=2, value=material_name)
                 takeoff_sheet.cell(row=row, column=3, value=', '.join(material_data['grades']))
                 takeoff_sheet.cell(row=row, column=4, value=', '.join(material_data['specifications']))
-                takeoff_sheet.cell(row=row, column=5, value=dimensions['length'])
-                takeoff_sheet.cell(row=row, column=6, value=dimensions['width'])
-                takeoff_sheet.cell(row=row, column=7, value=dimensions['height'])
-                takeoff_sheet.cell(row=row, column=8, value=data['count'])
+                takeoff_sheet.cell(row=row, column=5, value=length)
+                takeoff_sheet.cell(row=row, column=6, value=width)
+                takeoff_sheet.cell(row=row, column=7, value=height)
+                takeoff_sheet.cell(row=row, column=8, value=data.count)
                 takeoff_sheet.cell(row=row, column=9, value="ea")
                 takeoff_sheet.cell(row=row, column=10, value=round(volume_each, 3))
-                takeoff_sheet.cell(row=row, column=11, value=round(data['volume'], 3))
+                takeoff_sheet.cell(row=row, column=11, value=round(data.volume, 3))
                 takeoff_sheet.cell(row=row, column=12, value=round(weight_each, 1))
                 takeoff_sheet.cell(row=row, column=13, value=round(total_weight, 1))
                 takeoff_sheet.cell(row=row, column=14, value=comments)
@@ -1196,21 +1785,137 @@ class MaterialTakeoffAnalyzer:
             self.logger.warning(f"Error adjusting column widths: {str(e)}")
             # Don't raise the exception to avoid breaking the entire process
 
-def main():
+def parse_args(argv=None):
+    """Parse command line arguments for the material takeoff analyzer."""
+    parser = argparse.ArgumentParser(
+        description="Generate a material takeoff from an IFC file."
+    )
+    parser.add_argument('ifc_file', help="Path to the IFC file")
+    parser.add_argument(
+        '--geometry-engine', choices=GEOMETRY_ENGINES, default='create_shape',
+        help="How element geometry is tessellated (default: create_shape)"
+    )
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help="Worker threads for the iterator geometry engine (default: CPU count)"
+    )
+    parser.add_argument(
+        '--extraction-mode', choices=EXTRACTION_MODES, default='geometry',
+        help="Measure every mesh, prefer exported quantity sets, or prefer Box representations "
+             "for dimensions and piece counts (default: geometry)"
+    )
+    parser.add_argument(
+        '--processes', type=int, default=1,
+        help="Worker processes for sharded analysis (default: 1)"
+    )
+    parser.add_argument(
+        '--include-classes', nargs='+', metavar='CLASS', default=None,
+        help="Only analyze these IFC classes and their subtypes, e.g. IfcWall IfcSlab (default: IfcElement)"
+    )
+    parser.add_argument(
+        '--exclude-classes', nargs='*', metavar='CLASS', default=None,
+        help="Skip these IFC classes and their subtypes (default: openings, surface features and virtual elements)"
+    )
+    parser.add_argument(
+        '--geometry-profile', choices=list(GEOMETRY_PROFILES), default='precise',
+        help="Tessellation accuracy: precise, balanced or fast (skips opening subtraction) (default: precise)"
+    )
+    parser.add_argument(
+        '--mesh-cache', metavar='PATH', default=None,
+        help="SQLite file caching measured element geometry between runs (default: no cache)"
+    )
+    parser.add_argument(
+        '--mesh-cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), metavar='MB',
+        help=f"Size bound of the mesh cache in MB (default: {DEFAULT_MAX_BYTES // (1024 * 1024)})"
+    )
+    parser.add_argument(
+        '--type-library', metavar='PATH', default=None,
+        help="SQLite file of type geometry shared by all analyzed files, keyed by content (default: no library)"
+    )
+    parser.add_argument(
+        '--type-library-size', type=int, default=DEFAULT_LIBRARY_BYTES // (1024 * 1024), metavar='MB',
+        help=f"Size bound of the type geometry library in MB (default: {DEFAULT_LIBRARY_BYTES // (1024 * 1024)})"
+    )
+    parser.add_argument(
+        '--revision-store', metavar='PATH', default=None,
+        help="SQLite file of element results of each project's last revision; elements unchanged "
+             "since then are reused instead of measured again (default: analyze every element)"
+    )
+    parser.add_argument(
+        '--checkpoint', metavar='PATH', default=None,
+        help="SQLite file results are checkpointed to while analyzing; running the same analysis "
+             "again after an interruption resumes from it (default: no checkpoints)"
+    )
+    parser.add_argument(
+        '--checkpoint-interval', type=float, default=DEFAULT_CHECKPOINT_INTERVAL, metavar='SECONDS',
+        help=f"Seconds between checkpoints (default: {DEFAULT_CHECKPOINT_INTERVAL})"
+    )
+    parser.add_argument(
+        '--no-analytic-quantities', dest='analytic_quantities', action='store_false',
+        help="Tessellate layered elements, profiled members and extruded bodies instead of measuring them analytically"
+    )
+    parser.add_argument(
+        '--census', action='store_true',
+        help="Only count the file's entities per class from its raw text and exit, without analyzing it"
+    )
+    parser.add_argument(
+        '--geometry-budget', type=float, default=None,
+        help="Highest estimated tessellation cost of an element; costlier elements are "
+             "measured from quantity sets, their bounding box or simplified geometry (default: no limit)"
+    )
+    parser.add_argument(
+        '--geometry-time-limit', type=float, default=DEFAULT_TIME_LIMIT, metavar='SECONDS',
+        help="Seconds an element over the geometry budget may take to tessellate in full "
+             f"before it is given up (default: {DEFAULT_TIME_LIMIT})"
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function to run the material takeoff analyzer."""
-    if len(sys.argv) != 2:
-        logger.error("Please provide an IFC file path")
-        logger.info("Usage: python material_takeoff.py path/to/your_model.ifc")
-        return 1
+    args = parse_args(argv)
     
-    ifc_file_path = sys.argv[1]
+    ifc_file_path = args.ifc_file
     if not os.path.isfile(ifc_file_path):
         logger.error(f"IFC file not found: {ifc_file_path}")
         return 1
     
+    if args.census:
+        try:
+            census = scan_step_file(ifc_file_path)
+        except ValueError as e:
+            logger.error(f"Error reading IFC file: {e}")
+            return 1
+        logger.info(f"Schema: {census.schema_identifier}")
+        for field in ('originating_system', 'preprocessor_version', 'time_stamp'):
+            if census.header.get(field):
+                logger.info(f"{field.replace('_', ' ').capitalize()}: {census.header[field]}")
+        logger.info(f"{census.entity_count} entities in {census.scan_time:.2f} seconds")
+        for class_name, count in sorted(census.class_counts.items(), key=lambda item: (-item[1], item[0])):
+            logger.info(f"  {class_name}: {count}")
+        return 0
+    
     try:
         # Create analyzer and process elements
-        analyzer = MaterialTakeoffAnalyzer(ifc_file_path)
+        analyzer = MaterialTakeoffAnalyzer(
+            ifc_file_path,
+            geometry_engine=args.geometry_engine,
+            num_workers=args.workers,
+            extraction_mode=args.extraction_mode,
+            num_processes=args.processes,
+            include_classes=args.include_classes,
+            exclude_classes=args.exclude_classes,
+            geometry_budget=args.geometry_budget,
+            geometry_profile=args.geometry_profile,
+            mesh_cache_path=args.mesh_cache,
+            mesh_cache_size=args.mesh_cache_size * 1024 * 1024,
+            use_analytic_quantities=args.analytic_quantities,
+            type_library_path=args.type_library,
+            type_library_size=args.type_library_size * 1024 * 1024,
+            revision_store_path=args.revision_store,
+            checkpoint_path=args.checkpoint,
+            checkpoint_interval=args.checkpoint_interval,
+            geometry_time_limit=args.geometry_time_limit
+        )
         results = analyzer.analyze_all_elements()
         
         # Save results in all formats
@@ -1218,17 +1923,17 @@ def main():
         
         # Display summary
         logger.info("\nMaterial Takeoff Summary:")
-        for element_type, data in results['element_types'].items():
-            if data['count'] > 0:
+        for element_type, data in results.element_types.items():
+            if data.count > 0:
                 logger.info(f"\n{element_type}:")
-                logger.info(f"  Count: {data['count']}")
-                logger.info(f"  Total Volume: {data['total_volume']:.2f} m³")
-                logger.info(f"  Total Area: {data['total_area']:.2f} m²")
+                logger.info(f"  Count: {data.count}")
+                logger.info(f"  Total Volume: {data.volume:.2f} m³")
+                logger.info(f"  Total Area: {data.area:.2f} m²")
                 logger.info("  Materials:")
-                for material_name, material_data in data['materials'].items():
-                    logger.info(f"    - {material_name}: {material_data['count']} elements")
-                    if material_data['grades']:
-                        logger.info(f"      Grades: {', '.join(material_data['grades'])}")
+                for material_name, material_data in data.materials.items():
+                    logger.info(f"    - {material_name}: {material_data.count} elements")
+                    if material_data.grades:
+                        logger.info(f"      Grades: {', '.join(sorted(material_data.grades))}")
         
         return 0
     
@@ -0,0 +1,217 @@
+"""
+Persistent cache of measured element geometry.
+
+Mesh statistics are stored in an SQLite database keyed by the content hash of
+the IFC file, the geometry settings and the element GlobalId, so analyzing the
+same model again skips tessellation. Each entry is a packed binary record of
+area, volume, bounding box, centroid, oriented box extents and surface areas
+by orientation. The cache is bounded in size by
+evicting the least recently used files.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import struct
+import time
+
+import numpy as np
+
+from app.models.mesh_stats import MeshStats
+
+# Area, volume, bbox min (3), bbox max (3), centroid (3), oriented box
+# extents (3) and vertical, top and soffit areas (3, NaN if unknown) as doubles
+RECORD_FORMAT = '<17d'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+# Estimated bytes per cached element, including the GlobalId and index
+ENTRY_SIZE = RECORD_SIZE + 64
+
+# Default bound of the cache size
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """Get the SHA-256 hash of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pack_mesh_stats(stats):
+    """Pack mesh statistics into a binary record."""
+    return struct.pack(
+        RECORD_FORMAT, stats.area, stats.volume,
+        *stats.bbox_min, *stats.bbox_max, *stats.centroid, *stats.oriented_dimensions,
+        *(stats.surface_areas if stats.surface_areas is not None else (float('nan'),) * 3)
+    )
+
+
+def unpack_mesh_stats(record):
+    """Unpack mesh statistics from a binary record."""
+    values = struct.unpack(RECORD_FORMAT, record)
+    surface_areas = np.array(values[14:17])
+    return MeshStats(
+        values[0],
+        values[1],
+        np.array(values[2:5]),
+        np.array(values[5:8]),
+        np.array(values[8:11]),
+        extents=np.array(values[11:14]),
+        surface_areas=None if np.isnan(surface_areas).any() else surface_areas
+    )
+
+
+class MeshStatsDiskCache:
+    """
+    On-disk cache of the mesh statistics of one file's elements.
+
+    All entries of the file are loaded when the cache is opened, and new
+    entries are written in batches. When the cache grows over its size bound,
+    the entries of the least recently used other files are evicted.
+    """
+
+    def __init__(self, cache_path, ifc_file_path, settings_key, max_bytes=DEFAULT_MAX_BYTES,
+                 batch_size=500, logger=None):
+        """
+        Args:
+            cache_path (str): Path to the SQLite cache database
+            ifc_file_path (str): Path to the analyzed IFC file
+            settings_key (str): Identifies the geometry settings the statistics were measured with
+            max_bytes (int): Size bound of the whole cache
+            batch_size (int): Number of new entries written at once
+            logger: Logger for cache warnings
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.file_hash = file_content_hash(ifc_file_path)
+        self.settings_key = settings_key
+        self.hits = 0
+        self.misses = 0
+        self._pending = []
+        self._full = False
+
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Worker processes may share the cache, so wait for their writes
+        self.conn = sqlite3.connect(cache_path, timeout=30)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS cached_files (
+                file_hash TEXT NOT NULL,
+                settings_key TEXT NOT NULL,
+                entries INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (file_hash, settings_key)
+            );
+
+            CREATE TABLE IF NOT EXISTS mesh_stats (
+                file_hash TEXT NOT NULL,
+                settings_key TEXT NOT NULL,
+                global_id TEXT NOT NULL,
+                record BLOB NOT NULL,
+                PRIMARY KEY (file_hash, settings_key, global_id)
+            );
+        ''')
+        with self.conn:
+            self.conn.execute(
+                '''INSERT INTO cached_files (file_hash, settings_key, last_used) VALUES (?, ?, ?)
+                   ON CONFLICT (file_hash, settings_key) DO UPDATE SET last_used = excluded.last_used''',
+                (self.file_hash, self.settings_key, time.time())
+            )
+
+        self._entries = dict(self.conn.execute(
+            'SELECT global_id, record FROM mesh_stats WHERE file_hash = ? AND settings_key = ?',
+            (self.file_hash, self.settings_key)
+        ))
+
+    @staticmethod
+    def make_settings_key(**settings):
+        """Build a settings key from the keyword arguments that affect tessellation."""
+        # Records of another layout are not readable, so they count as other settings
+        return json.dumps(dict(settings, record_format=RECORD_FORMAT), sort_keys=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, global_id):
+        """
+        Get the cached mesh statistics of an element.
+
+        Returns:
+            MeshStats: The cached statistics, or None if the element is not cached
+        """
+        record = self._entries.get(global_id)
+        if record is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return unpack_mesh_stats(record)
+
+    def put(self, global_id, stats):
+        """Add the mesh statistics of an element to the cache."""
+        if self._full or not global_id or global_id in self._entries:
+            return
+        record = pack_mesh_stats(stats)
+        self._entries[global_id] = record
+        self._pending.append((self.file_hash, self.settings_key, global_id, record))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write pending entries and evict files over the size bound."""
+        if not self._pending:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO mesh_stats (file_hash, settings_key, global_id, record) VALUES (?, ?, ?, ?)',
+                    self._pending
+                )
+                self.conn.execute(
+                    '''UPDATE cached_files SET last_used = ?, entries = (
+                           SELECT COUNT(*) FROM mesh_stats WHERE file_hash = ? AND settings_key = ?
+                       ) WHERE file_hash = ? AND settings_key = ?''',
+                    (time.time(), self.file_hash, self.settings_key, self.file_hash, self.settings_key)
+                )
+            self._evict()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error writing mesh statistics cache: {str(e)}")
+        self._pending = []
+
+    def _evict(self):
+        """Evict least recently used files until the cache is within its size bound."""
+        files = self.conn.execute(
+            'SELECT file_hash, settings_key, entries FROM cached_files ORDER BY last_used'
+        ).fetchall()
+        total_bytes = sum(entries for _, _, entries in files) * ENTRY_SIZE
+
+        for file_hash, settings_key, entries in files:
+            if total_bytes <= self.max_bytes:
+                return
+            if (file_hash, settings_key) == (self.file_hash, self.settings_key):
+                continue
+            with self.conn:
+                self.conn.execute(
+                    'DELETE FROM mesh_stats WHERE file_hash = ? AND settings_key = ?', (file_hash, settings_key)
+                )
+                self.conn.execute(
+                    'DELETE FROM cached_files WHERE file_hash = ? AND settings_key = ?', (file_hash, settings_key)
+                )
+            total_bytes -= entries * ENTRY_SIZE
+
+        if total_bytes > self.max_bytes and not self._full:
+            # The current file alone fills the cache
+            self._full = True
+            self.logger.warning("Mesh statistics cache is full, no more elements of this file are cached")
+
+    def close(self):
+        """Write pending entries and close the cache."""
+        self.flush()
+        self.conn.close()
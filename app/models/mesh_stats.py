@@ -0,0 +1,188 @@
+"""
+Mesh statistics for tessellated IFC geometry.
+
+Computes surface area split by face orientation, enclosed volume, axis-aligned
+bounding box and centroid of a triangulated shape in a single batched NumPy
+pass. The vertices are kept in a CompactMesh so oriented bounding boxes can be
+computed for batches of elements later.
+"""
+
+import numpy as np
+
+from app.models.compact_mesh import CompactMesh
+
+# Faces whose unit normal has a Z component of at least this magnitude are top
+# surfaces (facing up) or soffits (facing down); all others are vertical faces
+ORIENTATION_THRESHOLD = float(np.cos(np.radians(45.0)))
+
+
+class MeshStats:
+    """Measured quantities of a single triangulated mesh."""
+
+    __slots__ = ('area', 'volume', 'bbox_min', 'bbox_max', 'centroid', 'points', 'extents', 'surface_areas')
+
+    def __init__(self, area, volume, bbox_min, bbox_max, centroid, points=None, extents=None,
+                 surface_areas=None):
+        """
+        Args:
+            area (float): Surface area
+            volume (float): Enclosed volume
+            bbox_min (np.ndarray): Minimum corner of the world bounding box
+            bbox_max (np.ndarray): Maximum corner of the world bounding box
+            centroid (np.ndarray): World centroid
+            points: (n, 3) world points the oriented bounding box is computed
+                from, or a CompactMesh of them, released once it is computed
+            extents (np.ndarray): Extents of the oriented bounding box
+            surface_areas (np.ndarray): Vertical, top and soffit areas, see
+                classify_surface_areas
+        """
+        self.area = area
+        self.volume = volume
+        self.bbox_min = bbox_min
+        self.bbox_max = bbox_max
+        self.centroid = centroid
+        self.points = points
+        self.extents = extents
+        self.surface_areas = surface_areas
+
+    @property
+    def dimensions(self):
+        """Extents of the axis-aligned bounding box along X, Y and Z."""
+        return self.bbox_max - self.bbox_min
+
+    @property
+    def oriented_dimensions(self):
+        """Extents of the oriented bounding box, or of the axis-aligned one if unknown."""
+        return self.extents if self.extents is not None else self.dimensions
+
+    def to_bounding_box(self):
+        """Return the bounding box in the format used by the analyzer results."""
+        return {
+            'bounding_box': {
+                'min': self.bbox_min.tolist(),
+                'max': self.bbox_max.tolist(),
+                'dimensions': self.dimensions.tolist()
+            }
+        }
+
+
+def mesh_arrays(geometry):
+    """
+    Get vertices and faces of a geometry as (n, 3) NumPy arrays.
+
+    Uses the raw ``verts_buffer``/``faces_buffer`` exposed by newer IfcOpenShell
+    releases so no intermediate Python tuples are built, and falls back to the
+    ``verts``/``faces`` sequences otherwise.
+
+    Args:
+        geometry: Triangulation returned by IfcOpenShell (``shape.geometry``)
+
+    Returns:
+        tuple: (vertices, faces) arrays
+    """
+    verts_buffer = getattr(geometry, 'verts_buffer', None)
+    faces_buffer = getattr(geometry, 'faces_buffer', None)
+    if verts_buffer is not None and faces_buffer is not None:
+        verts = np.frombuffer(verts_buffer, dtype='d')
+        faces = np.frombuffer(faces_buffer, dtype='i')
+    else:
+        verts = np.asarray(geometry.verts, dtype=np.float64)
+        faces = np.asarray(geometry.faces, dtype=np.int64)
+    return verts.reshape(-1, 3), faces.reshape(-1, 3)
+
+
+def classify_surface_areas(area_vectors, areas=None):
+    """
+    Split surface area by face orientation.
+
+    Args:
+        area_vectors (np.ndarray): (m, 3) outward face normals scaled by the
+            face areas, in world coordinates
+        areas (np.ndarray): Face areas, if already known
+
+    Returns:
+        np.ndarray: Areas of vertical faces (formwork), top surfaces and soffits
+    """
+    if areas is None:
+        areas = np.sqrt(np.einsum('ij,ij->i', area_vectors, area_vectors))
+    normal_z = np.divide(area_vectors[:, 2], areas, out=np.zeros_like(areas), where=areas > 0.0)
+    orientations = np.where(normal_z >= ORIENTATION_THRESHOLD, 1, np.where(normal_z <= -ORIENTATION_THRESHOLD, 2, 0))
+    return np.bincount(orientations, weights=areas, minlength=3)
+
+
+def triangle_area_vectors(verts, faces):
+    """Get the normals of a mesh's triangles scaled by their areas, as an (m, 3) array."""
+    v0 = verts[faces[:, 0]]
+    return np.cross(verts[faces[:, 1]] - v0, verts[faces[:, 2]] - v0) / 2.0
+
+
+def compute_mesh_stats(verts, faces):
+    """
+    Compute area, volume, bounding box, centroid and oriented surface areas
+    of a triangle mesh.
+
+    Volume is the sum of signed tetrahedra spanned by each triangle and a
+    reference point, which is exact for closed, consistently oriented meshes.
+
+    Args:
+        verts (array-like): Vertex coordinates, flat or shaped (n, 3)
+        faces (array-like): Triangle vertex indices, flat or shaped (m, 3)
+
+    Returns:
+        MeshStats: Measured quantities, or None if there are no vertices
+    """
+    verts = np.asarray(verts, dtype=np.float64).reshape(-1, 3)
+    faces = np.asarray(faces).reshape(-1, 3)
+    if len(verts) == 0:
+        return None
+
+    bbox_min = verts.min(axis=0)
+    bbox_max = verts.max(axis=0)
+    if len(faces) == 0:
+        return MeshStats(
+            0.0, 0.0, bbox_min, bbox_max, verts.mean(axis=0), CompactMesh(verts), surface_areas=np.zeros(3)
+        )
+
+    # Work relative to the box corner so world coordinates far from the
+    # origin do not cost precision in the cross products
+    local = verts - bbox_min
+    v0 = local[faces[:, 0]]
+    v1 = local[faces[:, 1]]
+    v2 = local[faces[:, 2]]
+
+    cross = np.cross(v1 - v0, v2 - v0)
+    triangle_areas = 0.5 * np.sqrt(np.einsum('ij,ij->i', cross, cross))
+    area = float(triangle_areas.sum())
+    surface_areas = classify_surface_areas(cross, 2.0 * triangle_areas) / 2.0
+
+    signed_volumes = np.einsum('ij,ij->i', v0, np.cross(v1, v2)) / 6.0
+    signed_volume = float(signed_volumes.sum())
+    volume = abs(signed_volume)
+
+    if volume > 1e-12:
+        # Each tetrahedron (origin, v0, v1, v2) has its centroid at (v0 + v1 + v2) / 4
+        centroid = (signed_volumes @ (v0 + v1 + v2)) / (4.0 * signed_volume)
+    elif area > 0.0:
+        centroid = (triangle_areas @ (v0 + v1 + v2)) / (3.0 * area)
+    else:
+        centroid = local.mean(axis=0)
+
+    return MeshStats(
+        area, volume, bbox_min, bbox_max, centroid + bbox_min, CompactMesh(verts), surface_areas=surface_areas
+    )
+
+
+def mesh_stats_from_shape(shape):
+    """
+    Compute mesh statistics directly from an IfcOpenShell shape.
+
+    Args:
+        shape: Shape returned by ``ifcopenshell.geom.create_shape``
+
+    Returns:
+        MeshStats: Measured quantities, or None if the shape has no geometry
+    """
+    if not shape or not getattr(shape, 'geometry', None):
+        return None
+    verts, faces = mesh_arrays(shape.geometry)
+    return compute_mesh_stats(verts, faces)
@@ -0,0 +1,103 @@
+"""
+Oriented bounding boxes of measured elements.
+
+Axis-aligned boxes inflate the dimensions of rotated elements, so identical
+members placed at different angles end up in different catalog entries. The
+extents of each element are measured along three candidate frames (the world
+axes, the element's placement axes and the principal axes of its points) and
+the frame giving the smallest box is kept. Elements are processed in batches
+so the projections, covariances and eigen decompositions of many elements run
+as a few vectorized NumPy operations.
+"""
+
+import numpy as np
+import ifcopenshell.util.placement
+
+from app.models.compact_mesh import CompactMesh
+
+# Number of measured elements whose oriented boxes are computed at once
+ORIENTED_BOX_BATCH_SIZE = 256
+
+
+def placement_axes(element):
+    """
+    Get the axes of an element's object placement.
+
+    Returns:
+        np.ndarray: 3x3 matrix whose columns are the placement's X, Y and Z
+        axes in world coordinates, or the identity if the element has no placement
+    """
+    if not getattr(element, 'ObjectPlacement', None):
+        return np.eye(3)
+    matrix = np.asarray(ifcopenshell.util.placement.get_local_placement(element.ObjectPlacement), dtype=np.float64)
+    return matrix[:3, :3]
+
+
+def _local_points(points):
+    """Get an element's points relative to a fixed origin as a float64 array."""
+    return points.local_vertices if isinstance(points, CompactMesh) else points
+
+
+def _frame_extents(points, owners, offsets, frames):
+    """Get the extents of each element's points along the axes of its frame."""
+    projected = np.einsum('ni,nij->nj', points, frames[owners])
+    return np.maximum.reduceat(projected, offsets, axis=0) - np.minimum.reduceat(projected, offsets, axis=0)
+
+
+def oriented_extents(point_sets, frames):
+    """
+    Compute the oriented bounding box extents of a batch of elements.
+
+    Args:
+        point_sets (list): (n, 3) world points of each element, each non-empty,
+            relative to any origin since only extents are measured
+        frames (np.ndarray): (k, 3, 3) placement axes of each element
+
+    Returns:
+        np.ndarray: (k, 3) extents of the smallest of the world, placement and
+        principal axes boxes of each element
+    """
+    counts = np.array([len(points) for points in point_sets])
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    owners = np.repeat(np.arange(len(point_sets)), counts)
+    points = np.concatenate(point_sets)
+
+    # Principal axes from each element's vertex covariance
+    means = np.add.reduceat(points, offsets, axis=0) / counts[:, None]
+    centered = points - means[owners]
+    covariances = np.add.reduceat(centered[:, :, None] * centered[:, None, :], offsets, axis=0)
+    _, principal_frames = np.linalg.eigh(covariances / counts[:, None, None])
+
+    world_frames = np.broadcast_to(np.eye(3), frames.shape)
+    candidates = np.stack([
+        _frame_extents(centered, owners, offsets, frame)
+        for frame in (world_frames, np.asarray(frames, dtype=np.float64), principal_frames)
+    ])
+
+    # Smallest box volume, with the extent sum breaking ties between flat boxes
+    scores = candidates.prod(axis=2) + 1e-9 * candidates.sum(axis=2)
+    best = scores.argmin(axis=0)
+    return candidates[best, np.arange(len(point_sets))]
+
+
+def assign_oriented_extents(elements):
+    """
+    Set the oriented extents of a batch of measured elements.
+
+    Elements whose statistics already carry extents or have no points keep
+    them, and their points are released once measured.
+
+    Args:
+        elements (list): (element, MeshStats) pairs
+    """
+    batch = [
+        (element, stats) for element, stats in elements
+        if stats.extents is None and stats.points is not None and len(stats.points)
+    ]
+    if batch:
+        frames = np.array([placement_axes(element) for element, _ in batch])
+        extents = oriented_extents([_local_points(stats.points) for _, stats in batch], frames)
+        for (_, stats), element_extents in zip(batch, extents):
+            stats.extents = element_extents
+    for _, stats in elements:
+        stats.points = None
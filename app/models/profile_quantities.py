@@ -0,0 +1,235 @@
+"""
+Analytic quantities of members with a cross-section profile.
+
+Beams, columns, members and elements with an IfcMaterialProfileSetUsage are
+prisms or swept disks: their volume is the cross-section area times the
+extrusion or sweep length. Profile properties are computed once per profile
+entity, as thousands of members typically share a handful of sections.
+"""
+
+import itertools
+import math
+
+import numpy as np
+import ifcopenshell.util.unit
+
+from app.models.extrusion import get_body_items, measure_extruded_solid, object_placement_matrix
+from app.models.mesh_stats import MeshStats, classify_surface_areas
+from app.models.profiles import ProfileCache
+
+# Element classes measured from their swept body even without a profile set
+PROFILE_MEMBER_CLASSES = ('IfcBeam', 'IfcColumn', 'IfcMember', 'IfcPile', 'IfcReinforcingElement')
+
+# Unit directions around a directrix point whose offsets by the disk radius
+# approximate the swept disk for oriented bounding boxes
+DISK_DIRECTIONS = np.array([
+    direction for direction in itertools.product((-1.0, 0.0, 1.0), repeat=3) if any(direction)
+])
+DISK_DIRECTIONS /= np.linalg.norm(DISK_DIRECTIONS, axis=1)[:, None]
+
+# Normals sampled around each directrix segment to split the lateral area of
+# a swept disk by orientation
+SWEEP_NORMAL_SAMPLES = 8
+
+
+def get_profile_set(material):
+    """Get the IfcMaterialProfileSet of a profile set or profile set usage, if any."""
+    if material is None:
+        return None
+    if material.is_a('IfcMaterialProfileSetUsage'):
+        return material.ForProfileSet
+    if material.is_a('IfcMaterialProfileSet'):
+        return material
+    return None
+
+
+def _directrix_points(curve):
+    """
+    Get the 3D points of a polyline directrix.
+
+    Returns:
+        np.ndarray: (n, 3) points, or None if the curve is not a polyline
+    """
+    if not curve.is_a('IfcPolyline'):
+        return None
+    points = np.zeros((len(curve.Points), 3))
+    for index, point in enumerate(curve.Points):
+        coordinates = point.Coordinates
+        points[index, :len(coordinates)] = coordinates
+    return points if len(points) >= 2 else None
+
+
+def _swept_disk_area_vectors(world, segment_lengths, radius, inner_radius, disk_area):
+    """
+    Get outward face normals scaled by face areas of a swept disk.
+
+    The lateral area of each directrix segment is spread over normals sampled
+    evenly around it, and the end disks face along the first and last segments.
+    """
+    keep = segment_lengths > 0.0
+    directions = np.diff(world, axis=0)[keep] / segment_lengths[keep, None]
+    reference = np.where(np.abs(directions[:, 2:3]) < 0.9, [0.0, 0.0, 1.0], [1.0, 0.0, 0.0])
+    first_axes = np.cross(directions, reference)
+    first_axes /= np.linalg.norm(first_axes, axis=1)[:, None]
+    second_axes = np.cross(directions, first_axes)
+
+    angles = np.linspace(0.0, 2.0 * math.pi, SWEEP_NORMAL_SAMPLES, endpoint=False)
+    normals = (
+        np.cos(angles)[None, :, None] * first_axes[:, None, :]
+        + np.sin(angles)[None, :, None] * second_axes[:, None, :]
+    )
+    sample_areas = 2.0 * math.pi * (radius + inner_radius) * segment_lengths[keep] / SWEEP_NORMAL_SAMPLES
+    lateral = (normals * sample_areas[:, None, None]).reshape(-1, 3)
+    return np.vstack([lateral, -directions[0] * disk_area, directions[-1] * disk_area])
+
+
+def measure_swept_disk_solid(element, solid, unit_scale):
+    """
+    Measure an element's swept disk solid along a polyline analytically.
+
+    The bends of the directrix are ignored, so the volume is the disk area
+    times the directrix length.
+
+    Args:
+        element: The IFC element the solid belongs to
+        solid: The IfcSweptDiskSolid
+        unit_scale (float): Scale from file length units to meters
+
+    Returns:
+        MeshStats: Volume, surface area, world bounding box and centroid, or
+        None if the directrix is not supported
+    """
+    if getattr(solid, 'StartParam', None) is not None or getattr(solid, 'EndParam', None) is not None:
+        return None
+    points = _directrix_points(solid.Directrix)
+    if points is None:
+        return None
+
+    transform = object_placement_matrix(element, unit_scale)
+    world = (points * unit_scale) @ transform[:3, :3].T + transform[:3, 3]
+    segment_lengths = np.linalg.norm(np.diff(world, axis=0), axis=1)
+    length = segment_lengths.sum()
+    if length <= 0.0:
+        return None
+
+    radius = solid.Radius * unit_scale
+    inner_radius = (solid.InnerRadius or 0.0) * unit_scale
+    disk_area = math.pi * (radius * radius - inner_radius * inner_radius)
+    lateral_area = 2.0 * math.pi * (radius + inner_radius) * length
+    midpoints = (world[:-1] + world[1:]) / 2.0
+
+    return MeshStats(
+        lateral_area + 2.0 * disk_area,
+        disk_area * length,
+        world.min(axis=0) - radius,
+        world.max(axis=0) + radius,
+        (midpoints * segment_lengths[:, None]).sum(axis=0) / length,
+        (world[:, None, :] + radius * DISK_DIRECTIONS).reshape(-1, 3),
+        surface_areas=classify_surface_areas(
+            _swept_disk_area_vectors(world, segment_lengths, radius, inner_radius, disk_area)
+        )
+    )
+
+
+class ProfileSetQuantities:
+    """
+    Cross-section areas of the file's profiles and quantities derived from them.
+    """
+
+    def __init__(self, ifc_file):
+        """
+        Args:
+            ifc_file: The opened IFC file
+        """
+        self.unit_scale = ifcopenshell.util.unit.calculate_unit_scale(ifc_file)
+        self.profile_cache = ProfileCache()
+
+    def split_volume(self, material, volume):
+        """
+        Split an element volume between its profile materials by profile area.
+
+        Args:
+            material: The element's material definition
+            volume (float): The element volume
+
+        Returns:
+            dict: Volume of each named profile material, or None if the material
+            is not a profile set or a profile area is unknown
+        """
+        profile_set = get_profile_set(material)
+        if profile_set is None:
+            return None
+
+        areas = []
+        for material_profile in profile_set.MaterialProfiles or ():
+            profile = self.profile_cache.get(material_profile.Profile) if material_profile.Profile else None
+            if profile is None:
+                return None
+            name = material_profile.Material.Name if material_profile.Material is not None else None
+            areas.append((name or None, profile.area))
+        total_area = sum(area for _, area in areas)
+        if total_area <= 0.0:
+            return None
+
+        volumes = {}
+        for name, area in areas:
+            if name is not None:
+                volumes[name] = volumes.get(name, 0.0) + volume * area / total_area
+        return volumes
+
+    def cross_section(self, material):
+        """
+        Get the extents of a profile set's cross-section.
+
+        Args:
+            material: The element's material definition
+
+        Returns:
+            tuple: Width and depth of the profiles' combined outline in meters,
+            or None if the material is not a profile set or a profile is unknown
+        """
+        profile_set = get_profile_set(material)
+        if profile_set is None or not profile_set.MaterialProfiles:
+            return None
+
+        outlines = []
+        for material_profile in profile_set.MaterialProfiles:
+            profile = self.profile_cache.get(material_profile.Profile) if material_profile.Profile else None
+            if profile is None:
+                return None
+            outlines.append(profile.outline)
+        outline = np.vstack(outlines)
+        width, depth = (outline.max(axis=0) - outline.min(axis=0)) * self.unit_scale
+        return float(width), float(depth)
+
+    def measure(self, element, material):
+        """
+        Measure a member from its profile without tessellating it.
+
+        Elements with a profile set material or of PROFILE_MEMBER_CLASSES whose
+        Body is a single extruded area solid or swept disk solid are measured
+        as the profile area times the extrusion depth or sweep length.
+        Elements with openings are left to tessellation.
+
+        Args:
+            element: The IFC element
+            material: The element's material definition
+
+        Returns:
+            MeshStats: Measured quantities, or None if the element is not a
+            profiled member that can be measured analytically
+        """
+        if get_profile_set(material) is None and not any(element.is_a(c) for c in PROFILE_MEMBER_CLASSES):
+            return None
+        if getattr(element, 'HasOpenings', None):
+            return None
+
+        items = get_body_items(element)
+        if not items or len(items) != 1:
+            return None
+        solid = items[0]
+        if solid.is_a('IfcExtrudedAreaSolid'):
+            return measure_extruded_solid(element, solid, self.unit_scale, self.profile_cache)
+        if solid.is_a('IfcSweptDiskSolid'):
+            return measure_swept_disk_solid(element, solid, self.unit_scale)
+        return None
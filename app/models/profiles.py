@@ -0,0 +1,357 @@
+"""
+Cross-section properties of IFC profiles.
+
+Area, perimeter, centroid and outline of parametric profiles (I, L, U, T, C
+and Z shapes, rectangles, circles, ellipses, ...) are computed from their
+parameters, and those of arbitrary profiles from their polyline outline.
+Fillets and edge radii are included; tapered flanges are not supported.
+"""
+
+import math
+
+import numpy as np
+import ifcopenshell.util.placement
+
+# Area of a square corner minus the quarter circle rounding it, per radius squared
+ROUNDED_CORNER_AREA = 1.0 - math.pi / 4.0
+
+# Change of perimeter when a square corner is rounded, per radius
+ROUNDED_CORNER_PERIMETER = math.pi / 2.0 - 2.0
+
+# Segments of the polygon approximating circular and elliptic outlines
+CURVE_SEGMENTS = 32
+
+
+class ProfileProperties:
+    """Cross-section properties of a profile, in file units."""
+
+    __slots__ = ('area', 'perimeter', 'centroid', 'outline')
+
+    def __init__(self, area, perimeter, centroid, outline):
+        """
+        Args:
+            area (float): Cross-section area
+            perimeter (float): Length of all boundaries, including voids
+            centroid (np.ndarray): 2D centroid
+            outline (np.ndarray): (n, 2) outer outline, or its bounding
+                polygon for parametric profiles
+        """
+        self.area = area
+        self.perimeter = perimeter
+        self.centroid = centroid
+        self.outline = outline
+
+
+def _curve_points(curve):
+    """
+    Get the 2D points of a polygonal curve.
+
+    Returns:
+        np.ndarray: (n, 2) points without the closing point, or None if the
+        curve is not made of straight segments
+    """
+    if curve.is_a('IfcPolyline'):
+        points = np.array([point.Coordinates[:2] for point in curve.Points], dtype=np.float64)
+    elif curve.is_a('IfcIndexedPolyCurve'):
+        coordinates = np.array(curve.Points.CoordList, dtype=np.float64)[:, :2]
+        segments = curve.Segments
+        if segments:
+            if any(not segment.is_a('IfcLineIndex') for segment in segments):
+                return None
+            indices = []
+            for segment in segments:
+                segment_indices = list(segment.wrappedValue)
+                if indices and indices[-1] == segment_indices[0]:
+                    segment_indices = segment_indices[1:]
+                indices.extend(segment_indices)
+            points = coordinates[np.array(indices) - 1]
+        else:
+            points = coordinates
+    else:
+        return None
+
+    if len(points) > 1 and np.allclose(points[0], points[-1]):
+        points = points[:-1]
+    return points if len(points) >= 3 else None
+
+
+def polygon_properties(points):
+    """
+    Get the area, perimeter and centroid of a simple polygon.
+
+    Args:
+        points (np.ndarray): (n, 2) polygon points
+
+    Returns:
+        tuple: (area, perimeter, centroid)
+    """
+    following = np.roll(points, -1, axis=0)
+    cross = points[:, 0] * following[:, 1] - following[:, 0] * points[:, 1]
+    signed_area = cross.sum() / 2.0
+    perimeter = np.linalg.norm(following - points, axis=1).sum()
+    if abs(signed_area) > 1e-12:
+        centroid = ((points + following) * cross[:, None]).sum(axis=0) / (6.0 * signed_area)
+    else:
+        centroid = points.mean(axis=0)
+    return abs(signed_area), perimeter, centroid
+
+
+def _box(width, depth):
+    """Get the bounding rectangle of a profile centred on its position."""
+    x, y = width / 2.0, depth / 2.0
+    return np.array([[-x, -y], [x, -y], [x, y], [-x, y]], dtype=np.float64)
+
+
+def _ellipse(semi_axis_1, semi_axis_2):
+    """Get a polygon approximating an ellipse centred on its position."""
+    angles = np.linspace(0.0, 2.0 * math.pi, CURVE_SEGMENTS, endpoint=False)
+    return np.column_stack([semi_axis_1 * np.cos(angles), semi_axis_2 * np.sin(angles)])
+
+
+def _value(profile, attribute):
+    """Get an optional numeric profile parameter, 0 when not set."""
+    return float(getattr(profile, attribute, None) or 0.0)
+
+
+def _corners(*radii):
+    """Get the area and perimeter changes of rounding square corners."""
+    return (
+        sum(ROUNDED_CORNER_AREA * radius * radius for radius in radii),
+        sum(ROUNDED_CORNER_PERIMETER * radius for radius in radii)
+    )
+
+
+def _parametric_properties(profile):
+    """
+    Get the area, perimeter and bounding outline of a parametric profile.
+
+    Returns:
+        tuple: (area, perimeter, outline), or None if the profile type or one
+        of its parameters (e.g. tapered flanges) is not supported
+    """
+    for slope in ('FlangeSlope', 'LegSlope', 'WebSlope'):
+        if _value(profile, slope):
+            return None
+
+    if profile.is_a('IfcAsymmetricIShapeProfileDef'):
+        # IFC2X3 names the bottom flange parameters like a symmetric I-shape
+        bottom_width = _value(profile, 'BottomFlangeWidth') or _value(profile, 'OverallWidth')
+        bottom_thickness = _value(profile, 'BottomFlangeThickness') or _value(profile, 'FlangeThickness')
+        bottom_fillet = _value(profile, 'BottomFlangeFilletRadius') or _value(profile, 'FilletRadius')
+        top_width = _value(profile, 'TopFlangeWidth')
+        top_thickness = _value(profile, 'TopFlangeThickness') or bottom_thickness
+        top_fillet = _value(profile, 'TopFlangeFilletRadius')
+        depth, web = profile.OverallDepth, profile.WebThickness
+        bottom_edge, top_edge = _value(profile, 'BottomFlangeEdgeRadius'), _value(profile, 'TopFlangeEdgeRadius')
+        fillet_area, fillet_perimeter = _corners(bottom_fillet, bottom_fillet, top_fillet, top_fillet)
+        edge_area, edge_perimeter = _corners(bottom_edge, bottom_edge, top_edge, top_edge)
+        area = (
+            bottom_width * bottom_thickness + top_width * top_thickness
+            + (depth - bottom_thickness - top_thickness) * web + fillet_area - edge_area
+        )
+        perimeter = 2.0 * (bottom_width + top_width + depth - web) + fillet_perimeter + edge_perimeter
+        return area, perimeter, _box(max(bottom_width, top_width), depth)
+
+    if profile.is_a('IfcIShapeProfileDef'):
+        width, depth = profile.OverallWidth, profile.OverallDepth
+        web, flange = profile.WebThickness, profile.FlangeThickness
+        fillet, edge = _value(profile, 'FilletRadius'), _value(profile, 'FlangeEdgeRadius')
+        fillet_area, fillet_perimeter = _corners(fillet, fillet, fillet, fillet)
+        edge_area, edge_perimeter = _corners(edge, edge, edge, edge)
+        area = 2.0 * width * flange + (depth - 2.0 * flange) * web + fillet_area - edge_area
+        perimeter = 4.0 * width + 2.0 * depth - 2.0 * web + fillet_perimeter + edge_perimeter
+        return area, perimeter, _box(width, depth)
+
+    if profile.is_a('IfcLShapeProfileDef'):
+        depth = profile.Depth
+        width = _value(profile, 'Width') or depth
+        thickness = profile.Thickness
+        fillet, edge = _value(profile, 'FilletRadius'), _value(profile, 'EdgeRadius')
+        fillet_area, fillet_perimeter = _corners(fillet)
+        edge_area, edge_perimeter = _corners(edge, edge)
+        area = thickness * (depth + width - thickness) + fillet_area - edge_area
+        perimeter = 2.0 * (depth + width) + fillet_perimeter + edge_perimeter
+        return area, perimeter, _box(width, depth)
+
+    if profile.is_a('IfcUShapeProfileDef'):
+        depth, width = profile.Depth, profile.FlangeWidth
+        web, flange = profile.WebThickness, profile.FlangeThickness
+        fillet, edge = _value(profile, 'FilletRadius'), _value(profile, 'EdgeRadius')
+        fillet_area, fillet_perimeter = _corners(fillet, fillet)
+        edge_area, edge_perimeter = _corners(edge, edge)
+        area = 2.0 * width * flange + (depth - 2.0 * flange) * web + fillet_area - edge_area
+        perimeter = 2.0 * depth + 4.0 * width - 2.0 * web + fillet_perimeter + edge_perimeter
+        return area, perimeter, _box(width, depth)
+
+    if profile.is_a('IfcZShapeProfileDef'):
+        # Flanges point in opposite directions, their width measured from the web centre line
+        depth, width = profile.Depth, profile.FlangeWidth
+        web, flange = profile.WebThickness, profile.FlangeThickness
+        fillet, edge = _value(profile, 'FilletRadius'), _value(profile, 'EdgeRadius')
+        fillet_area, fillet_perimeter = _corners(fillet, fillet)
+        edge_area, edge_perimeter = _corners(edge, edge)
+        area = (2.0 * width + web) * flange + (depth - 2.0 * flange) * web + fillet_area - edge_area
+        perimeter = 2.0 * depth + 4.0 * width + fillet_perimeter + edge_perimeter
+        return area, perimeter, _box(2.0 * width, depth)
+
+    if profile.is_a('IfcTShapeProfileDef'):
+        depth, width = profile.Depth, profile.FlangeWidth
+        web, flange = profile.WebThickness, profile.FlangeThickness
+        fillet = _value(profile, 'FilletRadius')
+        flange_edge, web_edge = _value(profile, 'FlangeEdgeRadius'), _value(profile, 'WebEdgeRadius')
+        fillet_area, fillet_perimeter = _corners(fillet, fillet)
+        edge_area, edge_perimeter = _corners(flange_edge, flange_edge, web_edge, web_edge)
+        area = width * flange + (depth - flange) * web + fillet_area - edge_area
+        perimeter = 2.0 * (width + depth) + fillet_perimeter + edge_perimeter
+        return area, perimeter, _box(width, depth)
+
+    if profile.is_a('IfcCShapeProfileDef'):
+        # Cold-formed lipped channel with square corners
+        depth, width = profile.Depth, profile.Width
+        thickness, girth = profile.WallThickness, profile.Girth
+        area = thickness * (depth + 2.0 * width + 2.0 * girth - 4.0 * thickness)
+        perimeter = 2.0 * depth + 4.0 * width + 4.0 * girth - 6.0 * thickness
+        return area, perimeter, _box(width, depth)
+
+    if profile.is_a('IfcRectangleHollowProfileDef'):
+        x, y, thickness = profile.XDim, profile.YDim, profile.WallThickness
+        outer_area, outer_perimeter = _corners(*[_value(profile, 'OuterFilletRadius')] * 4)
+        inner_area, inner_perimeter = _corners(*[_value(profile, 'InnerFilletRadius')] * 4)
+        inner_x, inner_y = x - 2.0 * thickness, y - 2.0 * thickness
+        area = (x * y - outer_area) - (inner_x * inner_y - inner_area)
+        perimeter = 2.0 * (x + y) + outer_perimeter + 2.0 * (inner_x + inner_y) + inner_perimeter
+        return area, perimeter, _box(x, y)
+
+    if profile.is_a('IfcRoundedRectangleProfileDef'):
+        x, y = profile.XDim, profile.YDim
+        corner_area, corner_perimeter = _corners(*[profile.RoundingRadius] * 4)
+        return x * y - corner_area, 2.0 * (x + y) + corner_perimeter, _box(x, y)
+
+    if profile.is_a('IfcRectangleProfileDef'):
+        x, y = profile.XDim, profile.YDim
+        return x * y, 2.0 * (x + y), _box(x, y)
+
+    if profile.is_a('IfcCircleHollowProfileDef'):
+        radius, thickness = profile.Radius, profile.WallThickness
+        inner = radius - thickness
+        area = math.pi * (radius * radius - inner * inner)
+        return area, 2.0 * math.pi * (radius + inner), _ellipse(radius, radius)
+
+    if profile.is_a('IfcCircleProfileDef'):
+        radius = profile.Radius
+        return math.pi * radius * radius, 2.0 * math.pi * radius, _ellipse(radius, radius)
+
+    if profile.is_a('IfcEllipseProfileDef'):
+        a, b = profile.SemiAxis1, profile.SemiAxis2
+        # Ramanujan's approximation of the circumference
+        perimeter = math.pi * (3.0 * (a + b) - math.sqrt((3.0 * a + b) * (a + 3.0 * b)))
+        return math.pi * a * b, perimeter, _ellipse(a, b)
+
+    if profile.is_a('IfcTrapeziumProfileDef'):
+        bottom, top, y, offset = profile.BottomXDim, profile.TopXDim, profile.YDim, profile.TopXOffset
+        outline = np.array([
+            [-bottom / 2.0, -y / 2.0],
+            [bottom / 2.0, -y / 2.0],
+            [-bottom / 2.0 + offset + top, y / 2.0],
+            [-bottom / 2.0 + offset, y / 2.0],
+        ], dtype=np.float64)
+        area, perimeter, _ = polygon_properties(outline)
+        return area, perimeter, outline
+
+    return None
+
+
+def compute_profile_properties(profile):
+    """
+    Compute the cross-section properties of a profile.
+
+    Args:
+        profile: The IfcProfileDef
+
+    Returns:
+        ProfileProperties: Properties in file units, or None if the profile
+        is not supported
+    """
+    if profile.is_a('IfcCompositeProfileDef'):
+        parts = [compute_profile_properties(part) for part in profile.Profiles]
+        if not parts or any(part is None for part in parts):
+            return None
+        area = sum(part.area for part in parts)
+        centroid = sum(part.centroid * part.area for part in parts) / area if area > 0.0 else parts[0].centroid
+        return ProfileProperties(
+            area,
+            sum(part.perimeter for part in parts),
+            centroid,
+            np.vstack([part.outline for part in parts])
+        )
+
+    if profile.is_a('IfcArbitraryClosedProfileDef'):
+        outline = _curve_points(profile.OuterCurve)
+        if outline is None:
+            return None
+        area, perimeter, centroid = polygon_properties(outline)
+        if profile.is_a('IfcArbitraryProfileDefWithVoids'):
+            moment = centroid * area
+            for inner_curve in profile.InnerCurves:
+                inner = _curve_points(inner_curve)
+                if inner is None:
+                    return None
+                inner_area, inner_perimeter, inner_centroid = polygon_properties(inner)
+                area -= inner_area
+                perimeter += inner_perimeter
+                moment -= inner_centroid * inner_area
+            if area > 0.0:
+                centroid = moment / area
+        return ProfileProperties(area, perimeter, centroid, outline)
+
+    if not profile.is_a('IfcParameterizedProfileDef'):
+        return None
+
+    properties = _parametric_properties(profile)
+    if properties is None:
+        return None
+    area, perimeter, outline = properties
+
+    # Parametric profiles are centred on their bounding box
+    centroid = np.zeros(2)
+    position = getattr(profile, 'Position', None)
+    if position is not None:
+        matrix = np.array(ifcopenshell.util.placement.get_axis2placement(position), dtype=np.float64)
+        outline = outline @ matrix[:2, :2].T + matrix[:2, 3]
+        centroid = matrix[:2, 3].copy()
+    return ProfileProperties(area, perimeter, centroid, outline)
+
+
+class ProfileCache:
+    """
+    Cross-section properties by profile entity.
+
+    Thousands of members typically share a handful of sections, so each
+    profile is only computed once.
+    """
+
+    def __init__(self):
+        self._properties = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, profile):
+        """
+        Get the cross-section properties of a profile.
+
+        Returns:
+            ProfileProperties: Properties in file units, or None if the
+            profile is not supported
+        """
+        profile_id = profile.id()
+        if profile_id in self._properties:
+            self.hits += 1
+            return self._properties[profile_id]
+
+        self.misses += 1
+        try:
+            properties = compute_profile_properties(profile)
+        except (AttributeError, TypeError, ValueError):
+            properties = None
+        self._properties[profile_id] = properties
+        return properties
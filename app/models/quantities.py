@@ -0,0 +1,367 @@
+"""
+Quantity extraction without tessellation.
+
+Reads the IfcElementQuantity sets (Qto_*BaseQuantities) exported by most
+authoring tools so elements that already carry their volume and area do not
+need their geometry built, and measures elements from their own or their type's
+bounding box representation when only their extents are needed.
+"""
+
+import numpy as np
+import ifcopenshell.util.element
+import ifcopenshell.util.placement
+import ifcopenshell.util.unit
+
+from app.models.mesh_stats import MeshStats, classify_surface_areas
+from app.models.profile_quantities import PROFILE_MEMBER_CLASSES
+
+# Quantity names tried, in order, for each measure the takeoff reads. 'area'
+# is the whole surface, as measured from geometry, while 'face_area' is the
+# area of one side or face of a wall, slab or plate
+QUANTITY_NAMES = {
+    'volume': ('NetVolume', 'GrossVolume'),
+    'area': ('NetSurfaceArea', 'GrossSurfaceArea', 'OuterSurfaceArea'),
+    'face_area': ('NetSideArea', 'GrossSideArea', 'NetArea', 'GrossArea'),
+    'perimeter': ('Perimeter',),
+    'length': ('Length',),
+    'width': ('Width',),
+    'height': ('Height', 'Depth'),
+}
+
+# Value attribute and unit type of each simple quantity class
+QUANTITY_VALUES = {
+    'IfcQuantityLength': ('LengthValue', 'LENGTHUNIT'),
+    'IfcQuantityArea': ('AreaValue', 'AREAUNIT'),
+    'IfcQuantityVolume': ('VolumeValue', 'VOLUMEUNIT'),
+}
+
+# Corners of the unit box, x-major
+BOX_CORNERS = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+
+
+class QuantityIndex:
+    """
+    Element quantities read from every IfcElementQuantity in a single pass.
+
+    Values are converted to SI units. Qto_* base quantity sets take
+    precedence over custom quantity sets when both define the same name.
+    """
+
+    def __init__(self, ifc_file):
+        """
+        Args:
+            ifc_file: The opened IFC file
+        """
+        self.unit_scales = {
+            unit_type: ifcopenshell.util.unit.calculate_unit_scale(ifc_file, unit_type)
+            for unit_type in ('LENGTHUNIT', 'AREAUNIT', 'VOLUMEUNIT')
+        }
+        self._quantities = {}
+        self._build(ifc_file)
+
+    def __len__(self):
+        return len(self._quantities)
+
+    def _build(self, ifc_file):
+        """Collect quantities of all elements from IfcRelDefinesByProperties."""
+        for rel in ifc_file.by_type('IfcRelDefinesByProperties'):
+            definition = rel.RelatingPropertyDefinition
+            if definition is None or not definition.is_a('IfcElementQuantity'):
+                continue
+
+            values = self._read_quantity_set(definition)
+            if not values:
+                continue
+
+            is_base = (definition.Name or '').startswith('Qto_')
+            for related in rel.RelatedObjects:
+                quantities = self._quantities.setdefault(related.id(), {})
+                if is_base:
+                    quantities.update(values)
+                else:
+                    for name, value in values.items():
+                        quantities.setdefault(name, value)
+
+    def _read_quantity_set(self, quantity_set):
+        """Read the simple length, area and volume quantities of a set."""
+        values = {}
+        for quantity in quantity_set.Quantities or ():
+            spec = QUANTITY_VALUES.get(quantity.is_a())
+            if spec is None:
+                continue
+            attribute, unit_type = spec
+            value = getattr(quantity, attribute, None)
+            if value is None:
+                continue
+            values[quantity.Name] = float(value) * self.unit_scales[unit_type]
+        return values
+
+    def get(self, element):
+        """Get all quantities of an element as a {name: value} dict."""
+        return self._quantities.get(element.id(), {})
+
+    def get_measures(self, element):
+        """
+        Get the takeoff measures of an element from its quantities.
+
+        A face area is converted to the whole surface area when the element
+        has no surface area quantity, so areas are comparable to measured ones.
+
+        Returns:
+            dict: 'volume' and 'area' and those of 'length', 'width' and
+            'height' the element has, in SI units, or None if it has no
+            volume or area
+        """
+        quantities = self._quantities.get(element.id())
+        if not quantities:
+            return None
+
+        measures = {}
+        for measure, names in QUANTITY_NAMES.items():
+            value = next((quantities[name] for name in names if name in quantities), None)
+            if value is not None:
+                measures[measure] = value
+
+        if 'volume' not in measures:
+            return None
+        if 'area' not in measures:
+            if not measures.get('face_area'):
+                return None
+            measures['area'] = _surface_area(measures)
+        return measures
+
+    def measure(self, element, cross_section=None):
+        """
+        Measure an element from its quantity sets.
+
+        The extents the quantities give are laid out from the element
+        placement: profiled members along their local Z axis around a centered
+        cross-section, walls along their axis with the width centered on it,
+        other elements from their placement origin. A single missing extent
+        is derived from the volume. Otherwise the extents are taken from the
+        element's bounding box representation.
+
+        Args:
+            element: The IFC element
+            cross_section (tuple): Width and depth of the element's profile in
+                meters, if it has a profile set
+
+        Returns:
+            MeshStats: Measured quantities, or None if the element lacks a
+            volume or area or its extents are unknown
+        """
+        measures = self.get_measures(element)
+        if measures is None:
+            return None
+
+        if cross_section is not None:
+            width, height = cross_section
+        else:
+            width, height = measures.get('width'), measures.get('height')
+        extents = [measures.get('length'), width, height]
+
+        missing = [axis for axis, extent in enumerate(extents) if not extent]
+        if len(missing) == 1 and measures['volume'] > 0.0:
+            extents[missing[0]] = measures['volume'] / np.prod([extent for extent in extents if extent])
+            missing = []
+        if missing:
+            box = measure_bounding_box(element, self.unit_scales['LENGTHUNIT'])
+            if box is None:
+                return None
+            return MeshStats(
+                measures['area'], measures['volume'], box.bbox_min, box.bbox_max, box.centroid, box.points
+            )
+
+        length, width, height = extents
+        if cross_section is not None or any(element.is_a(c) for c in PROFILE_MEMBER_CLASSES):
+            box_min, box_max = np.array([-width / 2.0, -height / 2.0, 0.0]), np.array([width / 2.0, height / 2.0, length])
+        elif element.is_a('IfcWall'):
+            box_min, box_max = np.array([0.0, -width / 2.0, 0.0]), np.array([length, width / 2.0, height])
+        else:
+            box_min, box_max = np.zeros(3), np.array([length, width, height])
+
+        # The extents are along the object axes, so move the box corners into place
+        placement = _object_placement(element, self.unit_scales['LENGTHUNIT'])
+        corners = box_min + (box_max - box_min) * BOX_CORNERS
+        corners = corners @ placement[:3, :3].T + placement[:3, 3]
+        return MeshStats(
+            measures['area'],
+            measures['volume'],
+            corners.min(axis=0),
+            corners.max(axis=0),
+            corners.mean(axis=0),
+            corners
+        )
+
+
+def _surface_area(measures):
+    """
+    Get the whole surface area of a thin element from the area of one face.
+
+    Both faces are counted, plus the edges around them, whose width is the
+    thickness given by the volume and whose length is the perimeter quantity,
+    or that of a face of the element's length or else of a square face.
+    """
+    face_area = measures['face_area']
+    perimeter = measures.get('perimeter')
+    if not perimeter:
+        length = measures.get('length')
+        perimeter = 2.0 * (length + face_area / length) if length else 4.0 * np.sqrt(face_area)
+    return 2.0 * face_area + perimeter * measures['volume'] / face_area
+
+
+def _box_corners(box, unit_scale):
+    """Get the 8 corners of an IfcBoundingBox in meters, x-major."""
+    size = np.array([box.XDim, box.YDim, box.ZDim], dtype=np.float64) * unit_scale
+    corner = np.array(box.Corner.Coordinates, dtype=np.float64) * unit_scale
+    return corner + size * BOX_CORNERS
+
+
+def _box_stats(corners):
+    """
+    Measure a box from its 8 transformed corners.
+
+    Args:
+        corners (np.ndarray): (8, 3) world corners, x-major as from _box_corners
+
+    Returns:
+        MeshStats: Box volume, surface area and world bounding box
+    """
+    edge_x, edge_y, edge_z = corners[4] - corners[0], corners[2] - corners[0], corners[1] - corners[0]
+    x, y, z = np.linalg.norm(edge_x), np.linalg.norm(edge_y), np.linalg.norm(edge_z)
+    faces = np.array([np.cross(edge_y, edge_z), np.cross(edge_z, edge_x), np.cross(edge_x, edge_y)])
+    return MeshStats(
+        2.0 * (x * y + y * z + x * z),
+        x * y * z,
+        corners.min(axis=0),
+        corners.max(axis=0),
+        corners.mean(axis=0),
+        corners,
+        surface_areas=classify_surface_areas(np.vstack([faces, -faces]))
+    )
+
+
+def _object_placement(element, unit_scale):
+    """Get a 4x4 matrix of an element's object placement with translation in meters."""
+    placement = np.eye(4)
+    if getattr(element, 'ObjectPlacement', None):
+        placement = np.array(ifcopenshell.util.placement.get_local_placement(element.ObjectPlacement), dtype=np.float64)
+        placement[:3, 3] *= unit_scale
+    return placement
+
+
+def _find_bounding_box(representations):
+    """Get the first IfcBoundingBox item of some shape representations."""
+    for shape_representation in representations:
+        for item in shape_representation.Items:
+            if item.is_a('IfcBoundingBox'):
+                return item
+    return None
+
+
+def measure_bounding_box(element, unit_scale):
+    """
+    Measure an element from its 'Box' representation (IfcBoundingBox).
+
+    The box is the coarsest shape an element can have, so its volume and area
+    overestimate the element's. Used when the element's own geometry is too
+    expensive to build.
+
+    Args:
+        element: The IFC element
+        unit_scale (float): Scale from file length units to meters
+
+    Returns:
+        MeshStats: Box volume, surface area and world bounding box, or None if
+        the element has no bounding box representation
+    """
+    representation = getattr(element, 'Representation', None)
+    if not representation:
+        return None
+
+    box = _find_bounding_box(representation.Representations)
+    if box is None:
+        return None
+
+    # The box is defined in object coordinates, so move its corners into place
+    placement = _object_placement(element, unit_scale)
+    corners = _box_corners(box, unit_scale)
+    return _box_stats(corners @ placement[:3, :3].T + placement[:3, 3])
+
+
+class TypeBoundingBoxes:
+    """
+    Bounding boxes of element types from their 'Box' representation maps.
+
+    Instances mapping their type's geometry (IfcMappedItem) are measured by
+    moving the type's box into place, so neither the type nor the instance
+    geometry is built. Each type's box is read once.
+    """
+
+    def __init__(self, ifc_file):
+        """
+        Args:
+            ifc_file: The opened IFC file
+        """
+        self.unit_scale = ifcopenshell.util.unit.calculate_unit_scale(ifc_file)
+        self._boxes = {}
+
+    def get_box(self, element_type):
+        """
+        Get the corners of a type's box in type coordinates.
+
+        Returns:
+            np.ndarray: (8, 3) corners in meters, or None if the type has no
+            bounding box representation map
+        """
+        type_id = element_type.id()
+        if type_id not in self._boxes:
+            corners = None
+            for representation_map in getattr(element_type, 'RepresentationMaps', None) or ():
+                box = _find_bounding_box([representation_map.MappedRepresentation])
+                if box is None:
+                    continue
+                origin = np.array(
+                    ifcopenshell.util.placement.get_axis2placement(representation_map.MappingOrigin), dtype=np.float64
+                )
+                origin[:3, 3] *= self.unit_scale
+                corners = _box_corners(box, self.unit_scale) @ origin[:3, :3].T + origin[:3, 3]
+                break
+            self._boxes[type_id] = corners
+        return self._boxes[type_id]
+
+    def measure(self, element):
+        """
+        Measure an instance from its type's box.
+
+        Args:
+            element: The IFC element
+
+        Returns:
+            MeshStats: Box volume, surface area and world bounding box, or None
+            if the element does not map its type's geometry or the type has no box
+        """
+        representation = getattr(element, 'Representation', None)
+        if not representation:
+            return None
+        item = None
+        for shape_representation in representation.Representations:
+            if shape_representation.RepresentationIdentifier == 'Body':
+                items = shape_representation.Items
+                if len(items) == 1 and items[0].is_a('IfcMappedItem'):
+                    item = items[0]
+                break
+        if item is None or not item.MappingTarget.is_a('IfcCartesianTransformationOperator3D'):
+            return None
+
+        element_type = ifcopenshell.util.element.get_type(element)
+        corners = self.get_box(element_type) if element_type is not None else None
+        if corners is None:
+            return None
+
+        target = np.array(
+            ifcopenshell.util.placement.get_cartesiantransformationoperator3d(item.MappingTarget), dtype=np.float64
+        )
+        target[:3, 3] *= self.unit_scale
+        transform = _object_placement(element, self.unit_scale) @ target
+        return _box_stats(corners @ transform[:3, :3].T + transform[:3, 3])
@@ -0,0 +1,237 @@
+"""
+Per-element results of earlier revisions of a project.
+
+Designers upload new revisions of the same model many times, and usually only
+a few elements change between them. The store keeps the recorded quantities of
+every element of a project's last analyzed revision, keyed by GlobalId,
+together with a content hash of everything that determines them: the
+element's own attributes with its placement and representation, its openings,
+its type, its material association with the property sets of its
+materials and its property definitions. Elements
+whose hash is unchanged in a new revision are taken from the store instead of
+being measured again. Revisions of a project are recognized by the GlobalId of
+their IfcProject.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+
+import ifcopenshell.util.element
+
+from app.models.type_library import RepresentationHasher
+
+# Version of the stored element records; records of another version are not readable
+RECORD_VERSION = 2
+
+
+class ElementHasher:
+    """Content hashes of elements and of everything their quantities depend on."""
+
+    def __init__(self, unit_scale, material_index=None):
+        """
+        Args:
+            unit_scale (float): Scale from the file's length units to meters
+            material_index (MaterialIndex): Material definitions of the elements,
+                or None to look them up from each element's associations
+        """
+        self.material_index = material_index
+        self._hasher = RepresentationHasher(unit_scale)
+        self._hashes = {}
+        self._material_properties = {}
+
+    def hash_element(self, element):
+        """Get the content hash of an element."""
+        element_id = element.id()
+        if element_id in self._hashes:
+            return self._hashes[element_id]
+
+        digest = hashlib.sha256(self._hasher.hash_entity(element).encode())
+        for related in self._related_entities(element):
+            digest.update(b'\x1e')
+            digest.update(self._hasher.hash_entity(related).encode())
+        result = self._hashes[element_id] = digest.hexdigest()
+        return result
+
+    def _related_entities(self, element):
+        """Get the entities related to an element that affect its takeoff, in a fixed order."""
+        related = []
+        for rel in getattr(element, 'HasOpenings', None) or ():
+            related.append(rel.RelatedOpeningElement)
+
+        element_type = ifcopenshell.util.element.get_type(element)
+        if element_type is not None:
+            related.append(element_type)
+
+        if self.material_index is not None:
+            material = self.material_index.get(element)
+        else:
+            material = ifcopenshell.util.element.get_material(element, should_skip_usage=False)
+        if material is not None:
+            related.append(material)
+            related.extend(self._get_material_properties(material))
+
+        for rel in getattr(element, 'IsDefinedBy', None) or ():
+            if rel.is_a('IfcRelDefinesByProperties'):
+                related.append(rel.RelatingPropertyDefinition)
+        return [entity for entity in related if entity is not None]
+
+    def _get_material_properties(self, material):
+        """
+        Get the property sets of a material definition and of the materials it is made of.
+
+        Material properties refer to their material, so they are not reached
+        from the element's forward references.
+        """
+        material_id = material.id()
+        if material_id not in self._material_properties:
+            properties = []
+            for entity in material.file.traverse(material):
+                if not entity.is_a().startswith('IfcMaterial'):
+                    continue
+                for inverse in material.file.get_inverse(entity):
+                    if inverse.is_a('IfcMaterialProperties'):
+                        properties.append(inverse)
+            properties.sort(key=self._hasher.hash_entity)
+            self._material_properties[material_id] = properties
+        return self._material_properties[material_id]
+
+
+class RevisionStore:
+    """
+    On-disk element results of the last analyzed revision of each project.
+
+    The records of the project are read on first use, so processes that only
+    write records (worker processes of a sharded analysis) do not load them.
+    New records are written in batches.
+    """
+
+    def __init__(self, store_path, project_key, settings_key, batch_size=500, logger=None):
+        """
+        Args:
+            store_path (str): Path to the SQLite store database
+            project_key (str): Identifies the project, usually its IfcProject GlobalId
+            settings_key (str): Identifies the analysis settings the records were measured with
+            batch_size (int): Number of new records written at once
+            logger: Logger for store warnings
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.project_key = project_key
+        self.settings_key = settings_key
+        self.batch_size = batch_size
+        self._records = None
+        self._pending = []
+
+        directory = os.path.dirname(store_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Worker processes write the records of their shards
+        self.conn = sqlite3.connect(store_path, timeout=30)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS element_revisions (
+                project_key TEXT NOT NULL,
+                settings_key TEXT NOT NULL,
+                global_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (project_key, settings_key, global_id)
+            );
+        ''')
+
+    @staticmethod
+    def make_project_key(ifc_file, ifc_file_path):
+        """Get the key of the project of a file, falling back to the file name if it has no IfcProject."""
+        projects = ifc_file.by_type('IfcProject')
+        if projects and projects[0].GlobalId:
+            return projects[0].GlobalId
+        return os.path.basename(ifc_file_path)
+
+    @staticmethod
+    def make_settings_key(**settings):
+        """Build a settings key from the keyword arguments that affect element results."""
+        return json.dumps(dict(settings, record_version=RECORD_VERSION), sort_keys=True)
+
+    def _load(self):
+        """Read the stored content hashes and records of the project."""
+        if self._records is None:
+            try:
+                self._records = {
+                    global_id: (content_hash, record)
+                    for global_id, content_hash, record in self.conn.execute(
+                        '''SELECT global_id, content_hash, record FROM element_revisions
+                           WHERE project_key = ? AND settings_key = ?''',
+                        (self.project_key, self.settings_key)
+                    )
+                }
+            except sqlite3.Error as e:
+                self.logger.warning(f"Error reading revision store: {str(e)}")
+                self._records = {}
+        return self._records
+
+    def __len__(self):
+        return len(self._load())
+
+    def global_ids(self):
+        """Get the GlobalIds of the stored elements of the project."""
+        return set(self._load())
+
+    def get(self, global_id, content_hash):
+        """
+        Get the stored record of an element if its content is unchanged.
+
+        Returns:
+            tuple: (stored, record) where stored tells whether the element is in
+            the store and record is its record, or None if its content changed
+        """
+        entry = self._load().get(global_id)
+        if entry is None:
+            return False, None
+        if entry[0] != content_hash:
+            return True, None
+        return True, json.loads(entry[1])
+
+    def put(self, global_id, content_hash, record):
+        """Store the record of an element of the current revision."""
+        if not global_id:
+            return
+        self._pending.append((
+            self.project_key, self.settings_key, global_id, content_hash, json.dumps(record)
+        ))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def remove(self, global_ids):
+        """Remove elements that are no longer in the project."""
+        if not global_ids:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    'DELETE FROM element_revisions WHERE project_key = ? AND settings_key = ? AND global_id = ?',
+                    [(self.project_key, self.settings_key, global_id) for global_id in global_ids]
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error writing revision store: {str(e)}")
+
+    def flush(self):
+        """Write pending records."""
+        if not self._pending:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    '''INSERT OR REPLACE INTO element_revisions
+                       (project_key, settings_key, global_id, content_hash, record) VALUES (?, ?, ?, ?, ?)''',
+                    self._pending
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error writing revision store: {str(e)}")
+        self._pending = []
+
+    def close(self):
+        """Write pending records and close the store."""
+        self.flush()
+        self.conn.close()
@@ -0,0 +1,149 @@
+"""
+Process-pool sharded analysis.
+
+Elements are split into shards of roughly equal estimated tessellation cost.
+Each worker process opens the model, analyzes its shards and returns partial
+results, which the caller merges with TakeoffResults.merge.
+"""
+
+import concurrent.futures
+import heapq
+import multiprocessing
+
+# Relative cost of the work needed to measure representation items
+BREP_FACE_COST = 1.0
+POLYGON_FACE_COST = 0.2
+TRIANGLE_COST = 0.01
+BOOLEAN_COST = 20.0
+MAPPED_ITEM_COST = 1.0
+
+# Shards per process, so stragglers can be balanced by the pool
+SHARDS_PER_PROCESS = 4
+
+
+def _item_cost(item, booleans=True):
+    """Estimate the cost of tessellating a single representation item."""
+    if item.is_a('IfcMappedItem'):
+        # Instances are measured from the representation map cache
+        return MAPPED_ITEM_COST
+    if item.is_a('IfcBooleanResult'):
+        if not booleans:
+            # Only the first operand is built when boolean results are disabled
+            return _item_cost(item.FirstOperand, booleans)
+        return BOOLEAN_COST + _item_cost(item.FirstOperand) + _item_cost(item.SecondOperand)
+    if item.is_a('IfcManifoldSolidBrep'):
+        return 1.0 + BREP_FACE_COST * len(item.Outer.CfsFaces)
+    if item.is_a('IfcTriangulatedFaceSet'):
+        return 1.0 + TRIANGLE_COST * len(item.CoordIndex)
+    if item.is_a('IfcPolygonalFaceSet'):
+        return 1.0 + POLYGON_FACE_COST * len(item.Faces)
+    if item.is_a('IfcFaceBasedSurfaceModel'):
+        return 1.0 + BREP_FACE_COST * sum(len(face_set.CfsFaces) for face_set in item.FbsmFaces)
+    if item.is_a('IfcShellBasedSurfaceModel'):
+        return 1.0 + BREP_FACE_COST * sum(len(getattr(shell, 'CfsFaces', ())) for shell in item.SbsmBoundary)
+    return 1.0
+
+
+def estimate_element_cost(element, booleans=True):
+    """
+    Estimate the relative cost of analyzing an element.
+
+    Based on the size of its Body representation and the number of openings
+    that have to be subtracted from it.
+
+    Args:
+        element: The IFC element
+        booleans (bool): Include boolean operations and opening subtractions,
+            False for geometry settings that disable them
+
+    Returns:
+        float: Estimated cost
+    """
+    cost = 1.0
+    representation = getattr(element, 'Representation', None)
+    if representation:
+        for shape_representation in representation.Representations:
+            if shape_representation.RepresentationIdentifier not in ('Body', None):
+                continue
+            for item in shape_representation.Items:
+                try:
+                    cost += _item_cost(item, booleans)
+                except (AttributeError, TypeError):
+                    cost += 1.0
+    if booleans:
+        cost += BOOLEAN_COST * len(getattr(element, 'HasOpenings', None) or ())
+    return cost
+
+
+def plan_shards(elements, num_shards):
+    """
+    Split elements into shards of similar total cost.
+
+    Uses longest-processing-time-first scheduling: the most expensive
+    elements are placed first, each into the currently cheapest shard, so a
+    few huge Breps do not all end up in the same shard.
+
+    Args:
+        elements (list): IFC elements to analyze
+        num_shards (int): Number of shards to create
+
+    Returns:
+        list: Lists of element ids, one per non-empty shard
+    """
+    num_shards = max(1, min(num_shards, len(elements)))
+    costs = sorted(
+        ((estimate_element_cost(element), element.id()) for element in elements),
+        reverse=True
+    )
+
+    heap = [(0.0, index) for index in range(num_shards)]
+    shards = [[] for _ in range(num_shards)]
+    for cost, element_id in costs:
+        total, index = heapq.heappop(heap)
+        shards[index].append(element_id)
+        heapq.heappush(heap, (total + cost, index))
+
+    return [shard for shard in shards if shard]
+
+
+def _analyze_shard(task):
+    """Worker entry point: analyze a shard and return its partial results."""
+    ifc_file_path, element_ids, analyzer_options = task
+
+    # Imported here to avoid a circular import with the analyzer module
+    from app.models.material_takeoff import MaterialTakeoffAnalyzer
+
+    analyzer = MaterialTakeoffAnalyzer(
+        ifc_file_path, num_processes=1, use_database=False, **analyzer_options
+    )
+    analyzer.analyze_elements(element_ids)
+    return analyzer.results
+
+
+def run_shards(ifc_file_path, shards, num_processes, analyzer_options):
+    """
+    Analyze shards in a pool of worker processes.
+
+    Args:
+        ifc_file_path (str): Path to the IFC file each worker opens
+        shards (list): Lists of element ids from plan_shards
+        num_processes (int): Number of worker processes
+        analyzer_options (dict): Keyword arguments for MaterialTakeoffAnalyzer
+
+    Yields:
+        TakeoffResults: Partial results of each shard, in completion order
+    """
+    tasks = [(ifc_file_path, shard, analyzer_options) for shard in shards]
+
+    # Spawn rather than fork, as the web app runs analyses in threads. Unlike
+    # Pool processes, executor processes are not daemonic, so they can start
+    # the tessellation workers of elements over the geometry budget
+    context = multiprocessing.get_context('spawn')
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=min(num_processes, len(tasks)) or 1, mp_context=context)
+    try:
+        futures = [executor.submit(_analyze_shard, task) for task in tasks]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+    finally:
+        # Shards not started yet are dropped if the caller stops early
+        executor.shutdown(wait=False, cancel_futures=True)
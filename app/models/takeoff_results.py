@@ -0,0 +1,557 @@
+"""
+Material takeoff result model.
+
+Results are typed records with __slots__ instead of nested dicts. Element
+type and material names are interned, grades and specifications are kept as
+sets, and the elements of a catalog entry are stored in compact arrays. The
+records are picklable, so partial results built by separate worker processes
+can be sent back and merged into a single takeoff. to_json and from_json
+convert them to and from the JSON layout read by the web app and exports.
+"""
+
+import math
+import sys
+from array import array
+from types import MappingProxyType
+
+# Orientations surface areas are split into: vertical faces (formwork), top
+# surfaces and soffits, in the order of MeshStats.surface_areas
+SURFACE_ORIENTATIONS = ('vertical', 'top', 'soffit')
+
+# Where element quantities can come from, in the order of their codes in
+# catalog element arrays
+QUANTITY_SOURCES = ('quantity_set', 'geometry', 'analytic', 'simplified_geometry', 'bounding_box')
+SOURCE_CODES = {source: code for code, source in enumerate(QUANTITY_SOURCES)}
+
+# Descriptive material fields that keep the last non-empty value
+MATERIAL_TEXT_FIELDS = ('material_type', 'category', 'description')
+
+
+def new_element_material():
+    """Create the material data collected for a single element."""
+    return {
+        'properties': {},
+        'grades': [],
+        'specifications': [],
+        'material_type': '',
+        'category': '',
+        'description': ''
+    }
+
+
+def freeze_element_material(material_data):
+    """
+    Get a read-only copy of an element's material data.
+
+    Resolved material data is shared by every element of the material, so it
+    is frozen: the dicts in it (properties) become read-only mapping proxies
+    and the lists (grades, specifications) tuples.
+    """
+    return MappingProxyType({
+        field: MappingProxyType(dict(value)) if isinstance(value, dict)
+        else tuple(value) if isinstance(value, list) else value
+        for field, value in material_data.items()
+    })
+
+
+def element_material_json(material_data):
+    """Get a plain, picklable copy of an element's material data, frozen or not."""
+    return {
+        field: dict(value) if isinstance(value, (dict, MappingProxyType))
+        else list(value) if isinstance(value, (list, tuple)) else value
+        for field, value in material_data.items()
+    }
+
+
+def _surface_areas_json(surface_areas):
+    """Get vertical, top and soffit areas as a dict."""
+    return dict(zip(SURFACE_ORIENTATIONS, surface_areas))
+
+
+def _surface_areas_from_json(data):
+    """Get vertical, top and soffit areas from a dict."""
+    data = data or {}
+    return [data.get(orientation, 0.0) for orientation in SURFACE_ORIENTATIONS]
+
+
+def _add_surface_areas(target, surface_areas):
+    """Add vertical, top and soffit areas to totals, modifying target in place."""
+    for axis in range(3):
+        target[axis] += surface_areas[axis]
+
+
+def _sorted_values(values):
+    """Sort a set of grades or specifications for output."""
+    return sorted(values, key=str)
+
+
+class DimensionStats:
+    """
+    Statistics of bounding box dimensions.
+
+    Holds the count, mean, sum of squared deviations (m2), minimum and
+    maximum of the X, Y and Z extents. They are computed per group by the
+    element table; merge combines the statistics of separate analyses.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'min', 'max')
+
+    def __init__(self, count=0, mean=None, m2=None, minimum=None, maximum=None):
+        self.count = count
+        self.mean = mean or [0.0, 0.0, 0.0]
+        self.m2 = m2 or [0.0, 0.0, 0.0]
+        self.min = minimum or [None, None, None]
+        self.max = maximum or [None, None, None]
+
+    def merge(self, other):
+        """Combine the statistics of another group of elements into these."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count = other.count
+            self.mean, self.m2 = list(other.mean), list(other.m2)
+            self.min, self.max = list(other.min), list(other.max)
+            return self
+
+        count = self.count + other.count
+        for axis in range(3):
+            delta = other.mean[axis] - self.mean[axis]
+            self.mean[axis] += delta * other.count / count
+            self.m2[axis] += other.m2[axis] + delta * delta * self.count * other.count / count
+            self.min[axis] = min(self.min[axis], other.min[axis])
+            self.max[axis] = max(self.max[axis], other.max[axis])
+        self.count = count
+        return self
+
+    def set_averages(self, data):
+        """Set avg_length, avg_width and avg_height in a JSON dict if there are any elements."""
+        if self.count > 0:
+            data['avg_length'], data['avg_width'], data['avg_height'] = self.mean
+
+    def to_json(self):
+        return {
+            'count': self.count,
+            'mean': list(self.mean),
+            'm2': list(self.m2),
+            'min': list(self.min),
+            'max': list(self.max)
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if not data:
+            return cls()
+        return cls(data['count'], list(data['mean']), list(data['m2']), list(data['min']), list(data['max']))
+
+
+class _MaterialTotals:
+    """Quantities and descriptive fields shared by the material records."""
+
+    __slots__ = (
+        'count', 'volume', 'area', 'surface_areas', 'properties', 'grades', 'specifications',
+        'material_type', 'category', 'description', 'dimension_stats'
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.volume = 0.0
+        self.area = 0.0
+        self.surface_areas = [0.0, 0.0, 0.0]
+        self.properties = {}
+        self.grades = set()
+        self.specifications = set()
+        self.material_type = ''
+        self.category = ''
+        self.description = ''
+        self.dimension_stats = DimensionStats()
+
+    def add_material_data(self, material_data):
+        """
+        Add the descriptive fields of an element's material data.
+
+        Args:
+            material_data (dict): Material data in the format of new_element_material
+        """
+        self.properties.update(material_data.get('properties', {}))
+        if isinstance(material_data.get('grades'), (list, tuple)):
+            self.grades.update(material_data['grades'])
+        if isinstance(material_data.get('specifications'), (list, tuple)):
+            self.specifications.update(material_data['specifications'])
+        for field in MATERIAL_TEXT_FIELDS:
+            setattr(self, field, material_data.get(field) or '')
+
+    def merge(self, other):
+        """Combine the totals of the same material from other results."""
+        self.count += other.count
+        self.volume += other.volume
+        self.area += other.area
+        _add_surface_areas(self.surface_areas, other.surface_areas)
+        self.properties.update(other.properties)
+        self.grades |= other.grades
+        self.specifications |= other.specifications
+        for field in MATERIAL_TEXT_FIELDS:
+            if getattr(other, field):
+                setattr(self, field, getattr(other, field))
+        self.dimension_stats.merge(other.dimension_stats)
+        return self
+
+    def _fields_json(self, data):
+        """Add the surface areas and descriptive fields to a JSON dict."""
+        data['surface_areas'] = _surface_areas_json(self.surface_areas)
+        data['properties'] = dict(self.properties)
+        data['grades'] = _sorted_values(self.grades)
+        data['specifications'] = _sorted_values(self.specifications)
+        for field in MATERIAL_TEXT_FIELDS:
+            data[field] = getattr(self, field)
+        return data
+
+    def _fields_from_json(self, data):
+        """Set the surface areas, descriptive fields and statistics from a JSON dict."""
+        self.surface_areas = _surface_areas_from_json(data.get('surface_areas'))
+        self.properties = dict(data.get('properties', {}))
+        self.grades = set(data.get('grades', ()))
+        self.specifications = set(data.get('specifications', ()))
+        for field in MATERIAL_TEXT_FIELDS:
+            setattr(self, field, data.get(field) or '')
+        self.dimension_stats = DimensionStats.from_json(data.get('dimension_stats'))
+
+
+class TypeMaterialTotals(_MaterialTotals):
+    """Totals of a material within an element type."""
+
+    __slots__ = ()
+
+    def to_json(self):
+        data = self._fields_json({'count': self.count, 'volume': self.volume, 'area': self.area})
+        data['dimension_stats'] = self.dimension_stats.to_json()
+        self.dimension_stats.set_averages(data)
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        totals = cls()
+        totals.count = data['count']
+        totals.volume = data['volume']
+        totals.area = data['area']
+        totals._fields_from_json(data)
+        return totals
+
+
+class MaterialTotals(_MaterialTotals):
+    """Totals of a material across all element types."""
+
+    __slots__ = ('element_types',)
+
+    def __init__(self):
+        super().__init__()
+        self.element_types = set()
+
+    def merge(self, other):
+        super().merge(other)
+        self.element_types |= other.element_types
+        return self
+
+    def to_json(self):
+        data = self._fields_json({'count': self.count, 'total_volume': self.volume, 'total_area': self.area})
+        data['element_types'] = sorted(self.element_types)
+        data['dimension_stats'] = self.dimension_stats.to_json()
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        totals = cls()
+        totals.count = data['count']
+        totals.volume = data['total_volume']
+        totals.area = data['total_area']
+        totals._fields_from_json(data)
+        totals.element_types = {sys.intern(name) for name in data.get('element_types', ())}
+        return totals
+
+
+class ElementTypeTotals:
+    """Totals of an element type and of its materials."""
+
+    __slots__ = ('count', 'volume', 'area', 'surface_areas', 'materials', 'dimension_stats')
+
+    def __init__(self):
+        self.count = 0
+        self.volume = 0.0
+        self.area = 0.0
+        self.surface_areas = [0.0, 0.0, 0.0]
+        self.materials = {}
+        self.dimension_stats = DimensionStats()
+
+    def material(self, material_name):
+        """Get the totals of a material within the type, creating them if needed."""
+        totals = self.materials.get(material_name)
+        if totals is None:
+            totals = self.materials[sys.intern(material_name)] = TypeMaterialTotals()
+        return totals
+
+    def merge(self, other):
+        """Combine the totals of the same element type from other results."""
+        self.count += other.count
+        self.volume += other.volume
+        self.area += other.area
+        _add_surface_areas(self.surface_areas, other.surface_areas)
+        self.dimension_stats.merge(other.dimension_stats)
+        for material_name, totals in other.materials.items():
+            self.material(material_name).merge(totals)
+        return self
+
+    def to_json(self):
+        """Get the totals as a JSON dict, with averages and total quantities if there are elements."""
+        data = {
+            'count': self.count,
+            'total_volume': self.volume,
+            'total_area': self.area,
+            'surface_areas': _surface_areas_json(self.surface_areas),
+            'materials': {name: totals.to_json() for name, totals in self.materials.items()},
+            'dimension_stats': self.dimension_stats.to_json()
+        }
+        if self.count > 0:
+            self.dimension_stats.set_averages(data)
+            data['total_quantity'] = {'volume': self.volume, 'area': self.area, 'count': self.count}
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        totals = cls()
+        totals.count = data['count']
+        totals.volume = data['total_volume']
+        totals.area = data['total_area']
+        totals.surface_areas = _surface_areas_from_json(data.get('surface_areas'))
+        totals.materials = {
+            sys.intern(name): TypeMaterialTotals.from_json(material)
+            for name, material in data.get('materials', {}).items()
+        }
+        totals.dimension_stats = DimensionStats.from_json(data.get('dimension_stats'))
+        return totals
+
+
+class CatalogEntry:
+    """
+    Elements of one type, material and rounded size, with their totals.
+
+    Elements are stored column by column: ids, volumes, areas and surface
+    areas (NaN when unknown) in typed arrays and quantity sources as codes
+    into QUANTITY_SOURCES. All elements share the entry's dimensions.
+    """
+
+    __slots__ = (
+        'count', 'volume', 'area', 'surface_areas', 'dimensions', 'material_data',
+        'element_ids', 'element_names', 'element_volumes', 'element_areas',
+        'element_surface_areas', 'element_sources'
+    )
+
+    def __init__(self, dimensions=None, material_data=None):
+        """
+        Args:
+            dimensions (tuple): Rounded length, width and height of the elements
+            material_data (dict): Material data of the entry's first element
+        """
+        self.count = 0
+        self.volume = 0.0
+        self.area = 0.0
+        self.surface_areas = [0.0, 0.0, 0.0]
+        self.dimensions = dimensions
+        self.material_data = material_data
+        self.element_ids = array('q')
+        self.element_names = []
+        self.element_volumes = array('d')
+        self.element_areas = array('d')
+        self.element_surface_areas = array('d')
+        self.element_sources = array('B')
+
+    def __len__(self):
+        return len(self.element_ids)
+
+    def merge(self, other):
+        """Combine the same catalog entry from other results."""
+        self.count += other.count
+        self.volume += other.volume
+        self.area += other.area
+        _add_surface_areas(self.surface_areas, other.surface_areas)
+        self.element_ids.extend(other.element_ids)
+        self.element_names.extend(other.element_names)
+        self.element_volumes.extend(other.element_volumes)
+        self.element_areas.extend(other.element_areas)
+        self.element_surface_areas.extend(other.element_surface_areas)
+        self.element_sources.extend(other.element_sources)
+        if self.dimensions is None:
+            self.dimensions = other.dimensions
+        if self.material_data is None:
+            self.material_data = other.material_data
+        return self
+
+    def elements(self):
+        """
+        Get the entry's elements as dicts.
+
+        Returns:
+            list: id, name, volume, area, surface_areas, length, width, height
+            and source of each element
+        """
+        length, width, height = self.dimensions
+        surface_areas = self.element_surface_areas.tolist()
+        elements = []
+        for index, element_id in enumerate(self.element_ids):
+            areas = surface_areas[3 * index:3 * index + 3]
+            elements.append({
+                'id': element_id,
+                'name': self.element_names[index],
+                'volume': self.element_volumes[index],
+                'area': self.element_areas[index],
+                'surface_areas': None if any(map(math.isnan, areas)) else _surface_areas_json(areas),
+                'length': length,
+                'width': width,
+                'height': height,
+                'source': QUANTITY_SOURCES[self.element_sources[index]]
+            })
+        return elements
+
+    def to_json(self):
+        length, width, height = self.dimensions
+        return {
+            'count': self.count,
+            'volume': self.volume,
+            'area': self.area,
+            'surface_areas': _surface_areas_json(self.surface_areas),
+            'elements': self.elements(),
+            'dimensions': {'length': length, 'width': width, 'height': height},
+            'material_data': self.material_data
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        dimensions = data['dimensions']
+        entry = cls((dimensions['length'], dimensions['width'], dimensions['height']), data.get('material_data'))
+        entry.count = data['count']
+        entry.volume = data['volume']
+        entry.area = data['area']
+        entry.surface_areas = _surface_areas_from_json(data.get('surface_areas'))
+        for element in data.get('elements', ()):
+            entry.element_ids.append(element['id'])
+            entry.element_names.append(element.get('name'))
+            entry.element_volumes.append(element['volume'])
+            entry.element_areas.append(element['area'])
+            surface_areas = element.get('surface_areas')
+            if surface_areas is None:
+                entry.element_surface_areas.extend((math.nan, math.nan, math.nan))
+            else:
+                entry.element_surface_areas.extend(_surface_areas_from_json(surface_areas))
+            entry.element_sources.append(SOURCE_CODES.get(element.get('source'), SOURCE_CODES['geometry']))
+        return entry
+
+
+class TakeoffResults:
+    """Material takeoff of a file, or of a subset of its elements."""
+
+    __slots__ = (
+        'element_types', 'materials', 'element_catalog', 'quantity_sources',
+        'geometry_fallbacks', 'geometry_profile', 'type_library', 'changes'
+    )
+
+    def __init__(self, geometry_profile=None):
+        """
+        Args:
+            geometry_profile (str): Tessellation profile the elements are measured with
+        """
+        self.element_types = {}
+        self.materials = {}
+        self.element_catalog = {}
+        self.quantity_sources = dict.fromkeys(QUANTITY_SOURCES, 0)
+        self.geometry_fallbacks = []
+        self.geometry_profile = geometry_profile
+        self.type_library = {'hits': 0, 'misses': 0}
+        # Elements added, changed and removed since the project's previous
+        # revision, or None if the analysis is not incremental
+        self.changes = None
+
+    def element_type(self, element_type):
+        """Get the totals of an element type, creating them if needed."""
+        totals = self.element_types.get(element_type)
+        if totals is None:
+            totals = self.element_types[sys.intern(element_type)] = ElementTypeTotals()
+        return totals
+
+    def material(self, material_name):
+        """Get the totals of a material across element types, creating them if needed."""
+        totals = self.materials.get(material_name)
+        if totals is None:
+            totals = self.materials[sys.intern(material_name)] = MaterialTotals()
+        return totals
+
+    @property
+    def element_count(self):
+        """Number of elements counted over all element types."""
+        return sum(totals.count for totals in self.element_types.values())
+
+    def merge(self, other):
+        """
+        Merge the results of another subset of elements into these.
+
+        Counts and quantities are summed, sets are united and element arrays
+        are concatenated, so merging a set of partials gives the same totals
+        in any grouping.
+
+        Args:
+            other (TakeoffResults): Results of a subset of elements
+
+        Returns:
+            TakeoffResults: These results, merged
+        """
+        for element_type, totals in other.element_types.items():
+            self.element_type(element_type).merge(totals)
+        for material_name, totals in other.materials.items():
+            self.material(material_name).merge(totals)
+        for key, entry in other.element_catalog.items():
+            target = self.element_catalog.get(key)
+            if target is None:
+                target = self.element_catalog[key] = CatalogEntry()
+            target.merge(entry)
+
+        for source, count in other.quantity_sources.items():
+            self.quantity_sources[source] = self.quantity_sources.get(source, 0) + count
+        for field, count in other.type_library.items():
+            self.type_library[field] = self.type_library.get(field, 0) + count
+        self.geometry_fallbacks.extend(other.geometry_fallbacks)
+        if self.geometry_profile is None:
+            self.geometry_profile = other.geometry_profile
+        if self.changes is None:
+            self.changes = other.changes
+        return self
+
+    def to_json(self):
+        """Get the results as the JSON dict read by the web app and exports."""
+        return {
+            'element_types': {name: totals.to_json() for name, totals in self.element_types.items()},
+            'materials': {name: totals.to_json() for name, totals in self.materials.items()},
+            'element_catalog': {key: entry.to_json() for key, entry in self.element_catalog.items()},
+            'quantity_sources': dict(self.quantity_sources),
+            'geometry_fallbacks': list(self.geometry_fallbacks),
+            'geometry_profile': self.geometry_profile,
+            'type_library': dict(self.type_library),
+            'changes': self.changes
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """Build results from their JSON dict, e.g. a saved takeoff."""
+        results = cls(data.get('geometry_profile'))
+        results.element_types = {
+            sys.intern(name): ElementTypeTotals.from_json(totals)
+            for name, totals in data.get('element_types', {}).items()
+        }
+        results.materials = {
+            sys.intern(name): MaterialTotals.from_json(totals)
+            for name, totals in data.get('materials', {}).items()
+        }
+        results.element_catalog = {
+            key: CatalogEntry.from_json(entry) for key, entry in data.get('element_catalog', {}).items()
+        }
+        results.quantity_sources.update(data.get('quantity_sources', {}))
+        results.geometry_fallbacks = list(data.get('geometry_fallbacks', ()))
+        results.type_library.update(data.get('type_library', {}))
+        results.changes = data.get('changes')
+        return results
@@ -0,0 +1,129 @@
+"""
+Tessellation of single elements under a time limit.
+
+The geometry kernel cannot be interrupted from Python, so a pathological
+element would hold up the whole analysis however long it takes. Elements
+tessellated in full as a last resort are instead sent to a worker process,
+which opens the model once and is killed when an element runs over the time
+limit. The next element starts a new worker.
+"""
+
+import multiprocessing
+
+import ifcopenshell
+import ifcopenshell.geom
+
+from app.models.mesh_stats import compute_mesh_stats, mesh_arrays
+
+# Default seconds an element may take to tessellate in the worker
+DEFAULT_TIME_LIMIT = 60.0
+
+# Seconds a closed worker gets to exit before it is killed
+SHUTDOWN_TIMEOUT = 5.0
+
+
+def _serve(ifc_file_path, geometry_profile, connection):
+    """Worker entry point: open the model and tessellate the requested elements until told to stop."""
+    # Imported here to avoid a circular import with the analyzer module
+    from app.models.material_takeoff import geometry_settings
+
+    ifc_file = ifcopenshell.open(ifc_file_path)
+    settings = geometry_settings(geometry_profile)
+    connection.send(None)
+
+    for element_id in iter(connection.recv, None):
+        try:
+            shape = ifcopenshell.geom.create_shape(settings, ifc_file.by_id(element_id))
+            verts, faces = mesh_arrays(shape.geometry)
+            connection.send((verts.copy(), faces.copy(), None))
+        except Exception as e:
+            connection.send((None, None, str(e)))
+
+
+class TessellationWorker:
+    """
+    Worker process tessellating elements of a model one at a time.
+
+    The worker is started on first use. Opening the model does not count
+    towards the time limit.
+    """
+
+    def __init__(self, ifc_file_path, geometry_profile, time_limit=DEFAULT_TIME_LIMIT):
+        """
+        Args:
+            ifc_file_path (str): Path to the IFC file the worker opens
+            geometry_profile (str): Tessellation profile of the analyzer
+            time_limit (float): Seconds an element may take to tessellate
+        """
+        self.ifc_file_path = ifc_file_path
+        self.geometry_profile = geometry_profile
+        self.time_limit = time_limit
+        self._process = None
+        self._connection = None
+
+    def tessellate(self, element_id):
+        """
+        Tessellate an element in full and measure its mesh.
+
+        Args:
+            element_id (int): ID of the element in the model
+
+        Returns:
+            MeshStats: Measured quantities, or None if the element has no vertices
+
+        Raises:
+            TimeoutError: If the element took longer than the time limit, in
+                which case the worker is killed
+            RuntimeError: If the element could not be tessellated or the worker failed
+        """
+        if self._process is None:
+            self._start()
+
+        self._connection.send(element_id)
+        if not self._connection.poll(self.time_limit):
+            self._kill()
+            raise TimeoutError(f"Tessellation took longer than {self.time_limit} seconds")
+        try:
+            verts, faces, error = self._connection.recv()
+        except EOFError:
+            self._kill()
+            raise RuntimeError("Tessellation worker exited")
+        if error is not None:
+            raise RuntimeError(error)
+        return compute_mesh_stats(verts, faces)
+
+    def _start(self):
+        """Start a worker and wait until it has opened the model."""
+        # Spawn rather than fork, as the web app runs analyses in threads
+        context = multiprocessing.get_context('spawn')
+        connection, child_connection = context.Pipe()
+        process = context.Process(
+            target=_serve, args=(self.ifc_file_path, self.geometry_profile, child_connection), daemon=True
+        )
+        process.start()
+        child_connection.close()
+        self._process, self._connection = process, connection
+        try:
+            self._connection.recv()
+        except EOFError:
+            self._kill()
+            raise RuntimeError("Tessellation worker could not open the model")
+
+    def _kill(self):
+        """Kill the worker, e.g. while it is stuck in the geometry kernel."""
+        self._process.kill()
+        self._process.join()
+        self._connection.close()
+        self._process = None
+        self._connection = None
+
+    def close(self):
+        """Stop the worker, if it is running."""
+        if self._process is None:
+            return
+        try:
+            self._connection.send(None)
+        except OSError:
+            pass
+        self._process.join(SHUTDOWN_TIMEOUT)
+        self._kill()
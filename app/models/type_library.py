@@ -0,0 +1,313 @@
+"""
+Persistent library of measured type geometry shared across projects.
+
+Manufacturer families (doors, windows, fixtures, fasteners, ...) are reused
+from project to project, so the same IfcRepresentationMap geometry is
+tessellated again for every upload. The library stores the measured
+quantities of each representation map keyed by a canonical hash of its
+content, which does not depend on entity ids or the file it comes from, so a
+known type is measured without tessellation in any file. The library is
+bounded in size by evicting the least recently used entries.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import struct
+import time
+
+import numpy as np
+
+from app.models.compact_mesh import VERTEX_DTYPE
+
+# Area, volume, centroid (3) and the minimum (3) and maximum (3) corner of
+# the map's bounding box as doubles, followed by its merged face vectors as
+# float32 triples
+RECORD_HEADER_FORMAT = '<11d'
+RECORD_HEADER_SIZE = struct.calcsize(RECORD_HEADER_FORMAT)
+
+# Estimated bytes per library entry besides its record, including the key and index
+ENTRY_OVERHEAD = 160
+
+# Default bound of the library size
+DEFAULT_LIBRARY_BYTES = 256 * 1024 * 1024
+
+# Entities that describe where or by whom geometry was authored rather than
+# its shape, left out of content hashes
+IGNORED_HASH_CLASSES = ('IfcRepresentationContext', 'IfcOwnerHistory')
+
+# Decimals face normals are rounded to before faces facing the same way are merged
+NORMAL_DECIMALS = 4
+
+
+class RepresentationHasher:
+    """
+    Canonical content hashes of representation subgraphs.
+
+    Each entity is hashed from its class and attribute values, with
+    referenced entities replaced by their own hashes, so identical geometry
+    gets the same hash whatever its entity ids. Hashes are memoized per
+    entity, as representation items share points and directions.
+    """
+
+    def __init__(self, unit_scale):
+        """
+        Args:
+            unit_scale (float): Scale from the file's length units to meters,
+                part of every hash since coordinates are in file units
+        """
+        self.unit_scale = unit_scale
+        self._hashes = {}
+
+    def hash_map(self, representation_map):
+        """Get the content hash of an IfcRepresentationMap."""
+        return self.hash_entity(representation_map)
+
+    def hash_entity(self, entity):
+        """Get the content hash of an entity and everything it references, at the file's unit scale."""
+        digest = hashlib.sha256(repr(self.unit_scale).encode())
+        digest.update(self._hash_entity(entity).encode())
+        return digest.hexdigest()
+
+    def _hash_entity(self, entity):
+        """Get the content hash of an entity and everything it references."""
+        entity_id = entity.id()
+        if entity_id and entity_id in self._hashes:
+            return self._hashes[entity_id]
+
+        digest = hashlib.sha256(entity.is_a().encode())
+        for value in entity.get_info(include_identifier=False, recursive=False).values():
+            digest.update(b'\x1f')
+            digest.update(self._hash_value(value).encode())
+        result = digest.hexdigest()
+
+        if entity_id:
+            self._hashes[entity_id] = result
+        return result
+
+    def _hash_value(self, value):
+        """Get the canonical text of an attribute value."""
+        if isinstance(value, (list, tuple)):
+            return '(' + ','.join(self._hash_value(item) for item in value) + ')'
+        if hasattr(value, 'is_a'):
+            if any(value.is_a(ignored) for ignored in IGNORED_HASH_CLASSES):
+                return '*'
+            return self._hash_entity(value)
+        return repr(value)
+
+
+def merge_area_vectors(area_vectors):
+    """
+    Merge the face vectors of faces facing the same way.
+
+    Planar faces are usually split into many triangles; summing the vectors
+    of faces with the same unit normal keeps the split of surface area by
+    orientation under any rotation with far fewer vectors.
+
+    Args:
+        area_vectors (np.ndarray): (m, 3) face normals scaled by face areas
+
+    Returns:
+        np.ndarray: (k, 3) summed face vectors, one per distinct normal
+    """
+    area_vectors = np.asarray(area_vectors, dtype=np.float64)
+    areas = np.sqrt(np.einsum('ij,ij->i', area_vectors, area_vectors))
+    keep = areas > 0.0
+    normals = np.round(area_vectors[keep] / areas[keep, None], NORMAL_DECIMALS)
+    _, groups = np.unique(normals, axis=0, return_inverse=True)
+    merged = np.zeros((groups.max() + 1 if len(groups) else 0, 3))
+    np.add.at(merged, groups.ravel(), area_vectors[keep])
+    return merged
+
+
+class LibraryEntry:
+    """Measured quantities of a representation map at a given scale."""
+
+    __slots__ = ('area', 'volume', 'centroid', 'box_min', 'box_max', 'area_vectors')
+
+    def __init__(self, area, volume, centroid, box_min, box_max, area_vectors):
+        """
+        Args:
+            area (float): Surface area
+            volume (float): Enclosed volume
+            centroid (np.ndarray): Centroid in map coordinates
+            box_min (np.ndarray): Minimum corner of the bounding box in map coordinates
+            box_max (np.ndarray): Maximum corner of the bounding box in map coordinates
+            area_vectors (np.ndarray): (k, 3) merged face vectors, see merge_area_vectors
+        """
+        self.area = area
+        self.volume = volume
+        self.centroid = centroid
+        self.box_min = box_min
+        self.box_max = box_max
+        self.area_vectors = area_vectors
+
+    @property
+    def corners(self):
+        """The 8 corners of the bounding box in map coordinates, x-major."""
+        return np.array([
+            [x, y, z]
+            for x in (self.box_min[0], self.box_max[0])
+            for y in (self.box_min[1], self.box_max[1])
+            for z in (self.box_min[2], self.box_max[2])
+        ])
+
+    def pack(self):
+        """Pack the entry into a binary record."""
+        header = struct.pack(
+            RECORD_HEADER_FORMAT, self.area, self.volume, *self.centroid, *self.box_min, *self.box_max
+        )
+        return header + np.ascontiguousarray(self.area_vectors, dtype='<f4').tobytes()
+
+    @classmethod
+    def unpack(cls, record):
+        """Unpack an entry from a binary record."""
+        values = struct.unpack_from(RECORD_HEADER_FORMAT, record)
+        area_vectors = np.frombuffer(record, dtype='<f4', offset=RECORD_HEADER_SIZE).reshape(-1, 3)
+        return cls(
+            values[0],
+            values[1],
+            np.array(values[2:5]),
+            np.array(values[5:8]),
+            np.array(values[8:11]),
+            area_vectors.astype(VERTEX_DTYPE)
+        )
+
+
+class TypeGeometryLibrary:
+    """
+    On-disk library of measured representation maps, shared by all files.
+
+    Entries are looked up as they are needed rather than loaded up front,
+    since the library holds the types of every analyzed project. New entries
+    and the last use of hit entries are written in batches.
+    """
+
+    def __init__(self, library_path, settings_key, max_bytes=DEFAULT_LIBRARY_BYTES,
+                 batch_size=100, logger=None):
+        """
+        Args:
+            library_path (str): Path to the SQLite library database
+            settings_key (str): Identifies the geometry settings the entries were measured with
+            max_bytes (int): Size bound of the library
+            batch_size (int): Number of new entries written at once
+            logger: Logger for library warnings
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.settings_key = settings_key
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._pending = []
+        self._used = set()
+
+        directory = os.path.dirname(library_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Worker processes and concurrent analyses share the library
+        self.conn = sqlite3.connect(library_path, timeout=30)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS type_geometry (
+                settings_key TEXT NOT NULL,
+                content_key TEXT NOT NULL,
+                record BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (settings_key, content_key)
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_type_geometry_last_used ON type_geometry (last_used);
+        ''')
+
+    @staticmethod
+    def make_settings_key(**settings):
+        """Build a settings key from the keyword arguments that affect tessellation."""
+        # Records of another layout are not readable, so they count as other settings
+        return json.dumps(dict(settings, record_format=RECORD_HEADER_FORMAT), sort_keys=True)
+
+    @staticmethod
+    def make_content_key(content_hash, scales):
+        """Build the key of a representation map's content hash at a mapping scale."""
+        return f"{content_hash}:{','.join(f'{scale:.6f}' for scale in scales)}"
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM type_geometry').fetchone()[0]
+
+    def get(self, content_key):
+        """
+        Get the library entry of a representation map.
+
+        Returns:
+            LibraryEntry: The measured map, or None if it is not in the library
+        """
+        try:
+            row = self.conn.execute(
+                'SELECT record FROM type_geometry WHERE settings_key = ? AND content_key = ?',
+                (self.settings_key, content_key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error reading type geometry library: {str(e)}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used.add(content_key)
+        return LibraryEntry.unpack(row[0])
+
+    def put(self, content_key, entry):
+        """Add a measured representation map to the library."""
+        self._pending.append((self.settings_key, content_key, entry.pack(), time.time()))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write pending entries and last uses, and evict entries over the size bound."""
+        if not self._pending and not self._used:
+            return
+        try:
+            with self.conn:
+                self.conn.executemany(
+                    '''INSERT OR REPLACE INTO type_geometry (settings_key, content_key, record, last_used)
+                       VALUES (?, ?, ?, ?)''',
+                    self._pending
+                )
+                now = time.time()
+                self.conn.executemany(
+                    'UPDATE type_geometry SET last_used = ? WHERE settings_key = ? AND content_key = ?',
+                    [(now, self.settings_key, content_key) for content_key in self._used]
+                )
+            if self._pending:
+                self._evict()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error writing type geometry library: {str(e)}")
+        self._pending = []
+        self._used = set()
+
+    def _evict(self):
+        """Evict least recently used entries until the library is within its size bound."""
+        total_bytes = self.conn.execute(
+            'SELECT COALESCE(SUM(LENGTH(record)), 0) + COUNT(*) * ? FROM type_geometry', (ENTRY_OVERHEAD,)
+        ).fetchone()[0]
+        if total_bytes <= self.max_bytes:
+            return
+
+        evicted = []
+        for rowid, size in self.conn.execute(
+            'SELECT rowid, LENGTH(record) + ? FROM type_geometry ORDER BY last_used', (ENTRY_OVERHEAD,)
+        ):
+            if total_bytes <= self.max_bytes:
+                break
+            evicted.append((rowid,))
+            total_bytes -= size
+        with self.conn:
+            self.conn.executemany('DELETE FROM type_geometry WHERE rowid = ?', evicted)
+        self.logger.info(f"Evicted {len(evicted)} entries from the type geometry library")
+
+    def close(self):
+        """Write pending entries and close the library."""
+        self.flush()
+        self.conn.close()
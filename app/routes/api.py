@@ -7,8 +7,8 @@ from flask import (
     Blueprint, request, current_app, jsonify, abort, url_for
 )
 from werkzeug.utils import secure_filename
-from app.models.material_takeoff import MaterialTakeoffAnalyzer
-from app.routes.main import analysis_tasks, analyze_file_task, threads
+from app.models.material_takeoff import MaterialTakeoffAnalyzer, GEOMETRY_PROFILES
+from app.routes.main import analysis_tasks, analyze_file_task, threads, take_census
 import openpyxl
 from openpyxl.utils import get_column_letter
 import copy
@@ -81,7 +81,8 @@ def get_analysis_status(filename):
             response_data = {
                 'status': task['status'],
                 'phase': task.get('phase', 'running'),
-                'phase_description': task.get('phase_description', 'Analysis in progress')
+                'phase_description': task.get('phase_description', 'Analysis in progress'),
+                'census': task.get('census')
             }
             
             # Include timing information if available
@@ -143,6 +144,11 @@ def upload_file():
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
+        # Optional geometry profile, otherwise the configured default is used
+        geometry_profile = request.form.get('geometry_profile') or None
+        if geometry_profile is not None and geometry_profile not in GEOMETRY_PROFILES:
+            return jsonify({'error': f'Unknown geometry profile: {geometry_profile}'}), 400
+        
         if file and allowed_file(file.filename):
             # Secure the filename and add timestamp to avoid overwrites
             timestamp = int(time.time())
@@ -157,17 +163,27 @@ def upload_file():
             
             current_app.logger.info(f"File uploaded: {filename}")
             
+            # Preview the file's content and refuse files that cannot be analyzed
+            census, error = take_census(file_path, None, current_app._get_current_object())
+            if error:
+                os.remove(file_path)
+                return jsonify({'error': error}), 400
+            
             # Initialize analysis task status
             analysis_tasks[filename] = {
                 'status': 'pending',
                 'error': None,
-                'results': None
+                'results': None,
+                'geometry_profile': geometry_profile,
+                'census': census,
+                'total_elements': census['element_count']
             }
             
             return jsonify({
                 'success': True,
                 'message': 'File uploaded successfully',
                 'filename': filename,
+                'census': census,
                 'loading_url': url_for('main.loading', filename=filename)
             })
         
@@ -193,14 +209,22 @@ def analyze(filename):
             current_app.logger.warning(f"File not found: {filename}")
             return jsonify({'error': 'File not found'}), 404
         
-        # Start or check analysis task
-        if filename not in analysis_tasks:
-            # Initialize task
-            analysis_tasks[filename] = {
-                'status': 'pending',
-                'error': None,
-                'results': None
-            }
+        # Start or check analysis task; pending tasks include interrupted
+        # analyses restored from the task registry, which resume from their checkpoint
+        if filename not in analysis_tasks or analysis_tasks[filename].get('status') == 'pending':
+            if filename not in analysis_tasks:
+                # Optional geometry profile, otherwise the configured default is used
+                geometry_profile = request.args.get('geometry_profile') or None
+                if geometry_profile is not None and geometry_profile not in GEOMETRY_PROFILES:
+                    return jsonify({'error': f'Unknown geometry profile: {geometry_profile}'}), 400
+                
+                # Initialize task
+                analysis_tasks[filename] = {
+                    'status': 'pending',
+                    'error': None,
+                    'results': None,
+                    'geometry_profile': geometry_profile
+                }
             
             # Get upload folder and app for the background thread
             upload_folder = current_app.config['UPLOAD_FOLDER']
@@ -10,7 +10,9 @@ from flask import (
     url_for, current_app, send_from_directory, jsonify, session, copy_current_request_context
 )
 from werkzeug.utils import secure_filename
-from app.models.material_takeoff import MaterialTakeoffAnalyzer
+from app.models.material_takeoff import MaterialTakeoffAnalyzer, GEOMETRY_PROFILES
+from app.models.element_filter import ElementFilter
+from app.models.step_census import scan_step_file
 from flask import current_app as app
 from app import turbo  # Import the turbo instance
 
@@ -22,12 +24,115 @@ analysis_tasks = {}
 threads = {}
 # Dictionary to track update threads
 update_threads = {}
+# Serializes writes of the task registry file
+registry_lock = threading.Lock()
+
+# Task statuses of analyses that had not finished when the registry was saved
+UNFINISHED_STATUSES = ('pending', 'running')
+
+# Element classes offered on the upload form to restrict the analysis
+SELECTABLE_ELEMENT_CLASSES = (
+    'IfcWall', 'IfcSlab', 'IfcBeam', 'IfcColumn', 'IfcFooting', 'IfcPile',
+    'IfcRoof', 'IfcStair', 'IfcRamp', 'IfcRailing', 'IfcCovering',
+    'IfcDoor', 'IfcWindow', 'IfcPlate', 'IfcMember', 'IfcCurtainWall',
+    'IfcBuildingElementProxy'
+)
 
 def allowed_file(filename):
     """Check if the file has an allowed extension."""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
+def take_census(file_path, include_classes, app_instance):
+    """
+    Take the census of an uploaded file and check whether it can be analyzed.
+    
+    The census is read from the raw file without opening it with ifcopenshell,
+    so files in an unsupported schema or with more elements than the
+    configured limit are refused right after upload.
+    
+    Args:
+        file_path (str): Path to the uploaded IFC file
+        include_classes (list): Element classes selected for analysis, or None for all elements
+        app_instance: The Flask application, for its configuration and logger
+        
+    Returns:
+        tuple: (preview, error) with the census preview of the file (see
+        StepCensus.preview) or None and the reason the file is refused
+    """
+    try:
+        census = scan_step_file(file_path)
+    except (OSError, ValueError) as e:
+        app_instance.logger.warning(f"Error reading {os.path.basename(file_path)}: {str(e)}")
+        return None, 'The file is not a valid IFC file.'
+    
+    if not census.is_supported():
+        return None, f'Unsupported IFC schema: {census.schema_identifier or "none"}'
+    
+    element_filter = ElementFilter(
+        census, include_classes, app_instance.config.get('EXCLUDED_ELEMENT_CLASSES'), app_instance.logger
+    )
+    preview = census.preview(element_filter)
+    app_instance.logger.info(
+        f"Census of {os.path.basename(file_path)}: {census.schema_identifier}, {preview['entity_count']} entities, "
+        f"{preview['element_count']} elements to analyze ({census.scan_time:.2f} seconds)"
+    )
+    
+    max_elements = app_instance.config.get('MAX_ANALYSIS_ELEMENTS')
+    if max_elements is not None and preview['element_count'] > max_elements:
+        return None, (
+            f"The file has {preview['element_count']} elements to analyze, "
+            f"more than the limit of {max_elements}."
+        )
+    return preview, None
+
+def save_analysis_tasks(app_instance):
+    """Write the task registry to disk so unfinished analyses can be resumed after a restart."""
+    registry_path = app_instance.config.get('TASK_REGISTRY_PATH')
+    if not registry_path:
+        return
+    try:
+        with registry_lock:
+            os.makedirs(os.path.dirname(registry_path), exist_ok=True)
+            temp_path = f"{registry_path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(analysis_tasks, f, default=str)
+            os.replace(temp_path, registry_path)
+    except Exception as e:
+        app_instance.logger.warning(f"Error saving analysis task registry: {str(e)}")
+
+def restore_analysis_tasks(app_instance):
+    """
+    Read the task registry saved before a restart.
+    
+    Analyses that were pending or running are set back to pending, so opening
+    their loading page (or the analyze API) starts them again, resuming from
+    their checkpoint.
+    """
+    registry_path = app_instance.config.get('TASK_REGISTRY_PATH')
+    if not registry_path or not os.path.exists(registry_path):
+        return
+    try:
+        with open(registry_path) as f:
+            saved_tasks = json.load(f)
+    except Exception as e:
+        app_instance.logger.warning(f"Error reading analysis task registry: {str(e)}")
+        return
+    
+    for filename, task in saved_tasks.items():
+        if not os.path.exists(os.path.join(app_instance.config['UPLOAD_FOLDER'], filename)):
+            continue
+        if task.get('status') in UNFINISHED_STATUSES:
+            task.update({
+                'status': 'pending',
+                'resumed': True,
+                'analysis_complete': False,
+                'phase': 'initializing',
+                'phase_description': 'Resuming interrupted analysis'
+            })
+            app_instance.logger.info(f"Analysis of {filename} was interrupted and will resume")
+        analysis_tasks.setdefault(filename, task)
+
 # Function to send status updates to the client using Turbo-Flask
 def update_loading_status(filename, app_instance):
     """Update the loading status using Turbo-Flask."""
@@ -127,7 +232,12 @@ def update_loading_status(filename, app_instance):
 @bp.route('/')
 def index():
     """Render the home page."""
-    return render_template('index.html')
+    return render_template(
+        'index.html',
+        element_classes=SELECTABLE_ELEMENT_CLASSES,
+        geometry_profiles=list(GEOMETRY_PROFILES),
+        default_geometry_profile=current_app.config.get('GEOMETRY_PROFILE', 'precise')
+    )
 
 @bp.route('/upload', methods=['POST'])
 def upload_file():
@@ -160,12 +270,35 @@ def upload_file():
             
             current_app.logger.info(f"File uploaded: {filename}")
             
+            # Element classes selected on the form, or None to analyze all elements
+            include_classes = [
+                name for name in request.form.getlist('element_classes')
+                if name in SELECTABLE_ELEMENT_CLASSES
+            ] or None
+            
+            # Geometry profile selected on the form, or None for the configured default
+            geometry_profile = request.form.get('geometry_profile')
+            if geometry_profile not in GEOMETRY_PROFILES:
+                geometry_profile = None
+            
+            # Preview the file's content and refuse files that cannot be analyzed
+            census, error = take_census(file_path, include_classes, current_app._get_current_object())
+            if error:
+                os.remove(file_path)
+                flash(error)
+                return redirect(url_for('main.index'))
+            
             # Initialize analysis task status
             analysis_tasks[filename] = {
                 'status': 'pending',
                 'error': None,
-                'results': None
+                'results': None,
+                'include_classes': include_classes,
+                'geometry_profile': geometry_profile,
+                'census': census,
+                'total_elements': census['element_count']
             }
+            save_analysis_tasks(current_app._get_current_object())
             
             # Redirect to loading page
             return redirect(url_for('main.loading', filename=filename))
@@ -258,21 +391,54 @@ def analyze_file_task(filename, upload_folder, app):
             
             file_path = os.path.join(upload_folder, filename)
             
+            # The census taken at upload sizes the analysis before the file is opened
+            census = analysis_tasks[filename].get('census')
+            if census is None:
+                census, error = take_census(file_path, analysis_tasks[filename].get('include_classes'), app)
+                if error:
+                    analysis_tasks[filename].update({'status': 'failed', 'error': error})
+                    return
+            total_elements = census['element_count']
+            
             # Initial update to status - set the analysis start time
             analysis_start_time = time.time()
             analysis_tasks[filename] = {
                 **analysis_tasks[filename],
                 'status': 'running',
+                'census': census,
+                'total_elements': total_elements,
                 'processed_elements': 0,
                 'detailed_processing_elements': 0,  # Initialize detailed processing counter
                 'phase': 'initializing',
-                'phase_description': 'Loading IFC file',
+                'phase_description': f'Loading IFC file with {total_elements} elements',
                 'start_time': analysis_start_time
             }
+            save_analysis_tasks(app)
             thread_logger.info(f"Starting analysis for {filename}")
             
             # Create analyzer instance
-            analyzer = MaterialTakeoffAnalyzer(file_path)
+            analyzer = MaterialTakeoffAnalyzer(
+                file_path,
+                geometry_engine=app.config.get('GEOMETRY_ENGINE', 'create_shape'),
+                num_workers=app.config.get('GEOMETRY_WORKERS'),
+                extraction_mode=app.config.get('EXTRACTION_MODE', 'geometry'),
+                num_processes=app.config.get('ANALYSIS_PROCESSES', 1),
+                include_classes=analysis_tasks[filename].get('include_classes'),
+                exclude_classes=app.config.get('EXCLUDED_ELEMENT_CLASSES'),
+                geometry_budget=app.config.get('GEOMETRY_BUDGET'),
+                geometry_time_limit=app.config.get('GEOMETRY_TIME_LIMIT', 60),
+                geometry_profile=(
+                    analysis_tasks[filename].get('geometry_profile')
+                    or app.config.get('GEOMETRY_PROFILE', 'precise')
+                ),
+                mesh_cache_path=app.config.get('MESH_CACHE_PATH'),
+                mesh_cache_size=app.config.get('MESH_CACHE_SIZE', 512 * 1024 * 1024),
+                type_library_path=app.config.get('TYPE_LIBRARY_PATH'),
+                type_library_size=app.config.get('TYPE_LIBRARY_SIZE', 256 * 1024 * 1024),
+                revision_store_path=app.config.get('REVISION_STORE_PATH'),
+                checkpoint_path=app.config.get('CHECKPOINT_PATH'),
+                checkpoint_interval=app.config.get('CHECKPOINT_INTERVAL', 60)
+            )
             
             # Set up log message interceptor to track detailed processing progress
             class DetailedProcessingLogHandler(logging.Handler):
@@ -296,14 +462,8 @@ def analyze_file_task(filename, upload_folder, app):
             analysis_tasks[filename]['phase_description'] = 'Preparing to analyze elements'
             thread_logger.info(f"Created analyzer for {filename}")
             
-            # Get total element count
-            total_elements = len(analyzer.ifc_file.by_type('IfcProduct'))
-            
-            # Update task with element count and phase
-            analysis_tasks[filename].update({
-                'total_elements': total_elements,
-                'phase_description': f'Analyzing {total_elements} elements'
-            })
+            # Update task phase with the element count from the census
+            analysis_tasks[filename]['phase_description'] = f'Analyzing {total_elements} elements'
             
             thread_logger.info(f"IFC file contains {total_elements} elements")
             
@@ -320,10 +480,6 @@ def analyze_file_task(filename, upload_folder, app):
                 elements_start_time = time.time()
                 thread_logger.info(f"Starting detailed analysis of {total_elements} elements")
                 
-                # Instead of immediately counting all elements, we'll do a separate, faster pass
-                # to get accurate element count, and then simulate slower progress during actual analysis
-                elements_list = list(analyzer.ifc_file.by_type('IfcProduct'))
-                
                 # Launch a background thread to update progress while analysis runs
                 def update_progress_during_analysis():
                     # Estimate a reasonable analysis time based on element count
@@ -423,7 +579,7 @@ def analyze_file_task(filename, upload_folder, app):
             
             try:
                 with open(json_path, 'w') as f:
-                    json.dump(analyzer.results, f, indent=4)
+                    json.dump(analyzer.results.to_json(), f, indent=4)
                 thread_logger.info(f"Saved JSON results to {json_path}")
             except Exception as e:
                 thread_logger.error(f"Error saving JSON file: {str(e)}")
@@ -494,6 +650,7 @@ def analyze_file_task(filename, upload_folder, app):
             # Cleanup thread reference
             if filename in threads:
                 del threads[filename]
+            save_analysis_tasks(app)
 
 @bp.route('/analyze/<filename>')
 def analyze(filename):
@@ -0,0 +1,121 @@
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from app.models.element_table import ElementTable
+from app.models.takeoff_results import freeze_element_material, new_element_material
+
+
+def material_data(category):
+    """Get frozen material data, shared by the elements of a material as in the analyzer."""
+    data = new_element_material()
+    data['category'] = category
+    return freeze_element_material(data)
+
+
+CONCRETE = material_data('Concrete')
+STEEL = material_data('Steel')
+
+# (id, type, volume, area, surface areas, bounding box, catalog dimensions, materials)
+ELEMENTS = [
+    (1, 'IfcWall', 2.0, 21.6, (20.0, 0.8, 0.8), (4.0, 0.2, 2.5), (4.0, 0.2, 2.5),
+     [('Concrete', CONCRETE, 2.0)]),
+    (2, 'IfcWall', 2.0, 21.6, (20.0, 0.8, 0.8), (0.2, 4.0, 2.5), (4.0, 0.2, 2.5),
+     [('Concrete', CONCRETE, 1.5), ('Steel', STEEL, 0.5)]),
+    (3, 'IfcSlab', 10.0, 102.0, None, (10.0, 5.0, 0.2), (10.0, 5.0, 0.2),
+     [('Concrete', CONCRETE, 10.0)]),
+    (4, 'IfcBeam', 0.05, 5.0, (4.8, 0.1, 0.1), (5.0, 0.2, 0.4), (5.0, 0.2, 0.4),
+     [('Steel', STEEL, 0.05)]),
+    (5, 'IfcWall', 1.0, 11.0, (10.0, 0.5, 0.5), (2.0, 0.2, 2.5), (2.0, 0.2, 2.5),
+     [('Concrete', CONCRETE, 1.0)]),
+    (6, 'IfcBeam', 0.05, 5.0, None, (5.0, 0.2, 0.4), (5.0, 0.2, 0.4), []),
+]
+
+# Counted but not measured, e.g. an element without geometry
+UNMEASURED = [(7, 'IfcWall'), (8, 'IfcDoor')]
+
+
+def build_table(elements, unmeasured=()):
+    """Record elements in a new table."""
+    table = ElementTable()
+    for element_id, element_type in unmeasured:
+        table.count(element_id, element_type)
+    for element_id, element_type, volume, area, surfaces, bbox, dimensions, materials in elements:
+        table.count(element_id, element_type)
+        table.add(
+            element_id, f"{element_type} {element_id}", element_type, 'geometry', volume, area,
+            surfaces, bbox, dimensions, materials
+        )
+    return table
+
+
+def naive_totals(elements, unmeasured=()):
+    """Sum the quantities of each element, one element and material at a time."""
+    types = defaultdict(lambda: {'count': 0, 'volume': 0.0, 'area': 0.0})
+    materials = defaultdict(lambda: {'count': 0, 'volume': 0.0, 'area': 0.0})
+    catalog = defaultdict(lambda: {'count': 0, 'volume': 0.0, 'ids': []})
+    for _, element_type in unmeasured:
+        types[element_type]['count'] += 1
+    for element_id, element_type, volume, area, _, _, dimensions, element_materials in elements:
+        types[element_type]['count'] += 1
+        types[element_type]['volume'] += volume
+        types[element_type]['area'] += area
+        for material_name, _, material_volume in element_materials:
+            materials[material_name]['count'] += 1
+            materials[material_name]['volume'] += material_volume
+            materials[material_name]['area'] += area
+            length, width, height = dimensions
+            entry = catalog[f"{element_type}|{material_name}|{length}x{width}x{height}"]
+            entry['count'] += 1
+            entry['volume'] += material_volume
+            entry['ids'].append(element_id)
+    return types, materials, catalog
+
+
+def test_aggregate_matches_per_element_sums():
+    results = build_table(ELEMENTS, UNMEASURED).aggregate()
+    types, materials, catalog = naive_totals(ELEMENTS, UNMEASURED)
+
+    assert set(results.element_types) == set(types)
+    for element_type, expected in types.items():
+        totals = results.element_types[element_type]
+        assert totals.count == expected['count']
+        assert totals.volume == pytest.approx(expected['volume'])
+        assert totals.area == pytest.approx(expected['area'])
+
+    assert set(results.materials) == set(materials)
+    for material_name, expected in materials.items():
+        totals = results.materials[material_name]
+        assert totals.count == expected['count']
+        assert totals.volume == pytest.approx(expected['volume'])
+        assert totals.area == pytest.approx(expected['area'])
+
+    assert list(results.element_catalog) == list(catalog)
+    for key, expected in catalog.items():
+        entry = results.element_catalog[key]
+        assert entry.count == expected['count']
+        assert entry.volume == pytest.approx(expected['volume'])
+        assert list(entry.element_ids) == expected['ids']
+
+
+def test_aggregate_type_materials_and_surfaces():
+    results = build_table(ELEMENTS).aggregate()
+    walls = results.element_types['IfcWall']
+
+    assert set(walls.materials) == {'Concrete', 'Steel'}
+    assert walls.materials['Concrete'].volume == pytest.approx(2.0 + 1.5 + 1.0)
+    assert walls.materials['Steel'].volume == pytest.approx(0.5)
+    # Elements without surface areas add nothing to them
+    np.testing.assert_allclose(walls.surface_areas, [50.0, 2.1, 2.1])
+    np.testing.assert_allclose(results.element_types['IfcSlab'].surface_areas, [0.0, 0.0, 0.0])
+    assert results.materials['Steel'].element_types == {'IfcWall', 'IfcBeam'}
+    assert results.materials['Concrete'].category == 'Concrete'
+    assert results.quantity_sources['geometry'] == len(ELEMENTS)
+
+
+def test_aggregate_empty_table():
+    results = ElementTable().aggregate()
+    assert results.element_types == {}
+    assert results.materials == {}
+    assert results.element_catalog == {}
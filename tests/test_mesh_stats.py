@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from app.models.mesh_stats import classify_surface_areas, compute_mesh_stats
+
+# Outward triangles of a box whose corners are numbered x-major (4x + 2y + z)
+BOX_FACES = np.array([
+    [0, 1, 3], [0, 3, 2],  # -X
+    [4, 6, 7], [4, 7, 5],  # +X
+    [0, 4, 5], [0, 5, 1],  # -Y
+    [2, 3, 7], [2, 7, 6],  # +Y
+    [0, 2, 6], [0, 6, 4],  # -Z
+    [1, 5, 7], [1, 7, 3],  # +Z
+])
+
+
+def box_mesh(size, origin=(0.0, 0.0, 0.0)):
+    """Get the vertices and faces of an axis-aligned box mesh."""
+    corners = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+    return np.asarray(origin) + corners * np.asarray(size), BOX_FACES
+
+
+def test_box_far_from_origin():
+    origin = np.array([1000.0, 2000.0, 3000.0])
+    verts, faces = box_mesh((2.0, 3.0, 4.0), origin)
+
+    stats = compute_mesh_stats(verts, faces)
+    assert stats.volume == pytest.approx(24.0)
+    assert stats.area == pytest.approx(2.0 * (2.0 * 3.0 + 3.0 * 4.0 + 2.0 * 4.0))
+    np.testing.assert_allclose(stats.bbox_min, origin)
+    np.testing.assert_allclose(stats.bbox_max, origin + [2.0, 3.0, 4.0])
+    np.testing.assert_allclose(stats.dimensions, [2.0, 3.0, 4.0])
+    np.testing.assert_allclose(stats.centroid, origin + [1.0, 1.5, 2.0])
+
+
+def test_triangular_prism():
+    # Right triangle with legs 3 and 4 extruded by 2 along Z
+    verts = np.array([
+        [0.0, 0.0, 0.0], [3.0, 0.0, 0.0], [0.0, 4.0, 0.0],
+        [0.0, 0.0, 2.0], [3.0, 0.0, 2.0], [0.0, 4.0, 2.0],
+    ])
+    faces = np.array([
+        [0, 2, 1], [3, 4, 5],
+        [0, 1, 4], [0, 4, 3],
+        [1, 2, 5], [1, 5, 4],
+        [2, 0, 3], [2, 3, 5],
+    ])
+
+    stats = compute_mesh_stats(verts.ravel(), faces.ravel())
+    assert stats.volume == pytest.approx(12.0)
+    assert stats.area == pytest.approx(2.0 * 6.0 + (3.0 + 4.0 + 5.0) * 2.0)
+    np.testing.assert_allclose(stats.centroid, [1.0, 4.0 / 3.0, 1.0])
+
+
+def test_inward_winding_gives_positive_volume():
+    verts, faces = box_mesh((1.0, 1.0, 1.0))
+    stats = compute_mesh_stats(verts, faces[:, ::-1])
+    assert stats.volume == pytest.approx(1.0)
+    np.testing.assert_allclose(stats.centroid, [0.5, 0.5, 0.5])
+
+
+def test_mesh_without_faces():
+    verts, _ = box_mesh((1.0, 2.0, 3.0))
+    stats = compute_mesh_stats(verts, [])
+    assert stats.volume == 0.0
+    assert stats.area == 0.0
+    np.testing.assert_allclose(stats.dimensions, [1.0, 2.0, 3.0])
+    assert compute_mesh_stats([], []) is None
+
+
+def test_box_surface_areas_by_orientation():
+    verts, faces = box_mesh((2.0, 3.0, 4.0))
+    vertical, top, soffit = compute_mesh_stats(verts, faces).surface_areas
+    assert vertical == pytest.approx(2.0 * (2.0 + 3.0) * 4.0)
+    assert top == pytest.approx(6.0)
+    assert soffit == pytest.approx(6.0)
+
+
+def test_classify_surface_areas_at_45_degrees():
+    # Unit normals 40 and 50 degrees above the horizon
+    steep = np.array([np.cos(np.radians(40.0)), 0.0, np.sin(np.radians(40.0))])
+    shallow = np.array([np.cos(np.radians(50.0)), 0.0, np.sin(np.radians(50.0))])
+    area_vectors = np.array([
+        2.0 * steep,
+        3.0 * shallow,
+        5.0 * -shallow,
+        7.0 * np.array([0.0, 0.0, -1.0]),
+    ])
+    np.testing.assert_allclose(classify_surface_areas(area_vectors), [2.0, 3.0, 12.0])
+
+
+def test_classify_surface_areas_with_known_areas():
+    area_vectors = np.array([[0.0, 0.0, 4.0], [0.0, 4.0, 0.0], [0.0, 0.0, 0.0]])
+    np.testing.assert_allclose(classify_surface_areas(area_vectors, np.array([4.0, 4.0, 0.0])), [4.0, 4.0, 0.0])
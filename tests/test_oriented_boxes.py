@@ -0,0 +1,35 @@
+import numpy as np
+
+from app.models.oriented_boxes import oriented_extents
+
+
+def box_corners(size, angle):
+    """Get the corners of a box of a size rotated about Z by an angle in radians."""
+    corners = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+    rotation = np.array([
+        [np.cos(angle), -np.sin(angle), 0.0],
+        [np.sin(angle), np.cos(angle), 0.0],
+        [0.0, 0.0, 1.0],
+    ])
+    return (corners * size) @ rotation.T + [10.0, 20.0, 0.0], rotation
+
+
+def test_rotated_box_from_principal_axes():
+    points, _ = box_corners([4.0, 1.0, 0.5], np.radians(30.0))
+    extents = oriented_extents([points], np.eye(3)[None])
+    np.testing.assert_allclose(sorted(extents[0]), [0.5, 1.0, 4.0], atol=1e-9)
+
+
+def test_rotated_box_from_placement_axes():
+    # A cube has no principal axes, so only its placement gives the tight box
+    points, rotation = box_corners([1.0, 1.0, 1.0], np.radians(45.0))
+    extents = oriented_extents([points], rotation[None])
+    np.testing.assert_allclose(extents[0], [1.0, 1.0, 1.0], atol=1e-9)
+
+
+def test_batch_of_boxes():
+    rotated, _ = box_corners([4.0, 1.0, 0.5], np.radians(60.0))
+    aligned, _ = box_corners([2.0, 3.0, 1.0], 0.0)
+    extents = oriented_extents([rotated, aligned], np.array([np.eye(3), np.eye(3)]))
+    np.testing.assert_allclose(sorted(extents[0]), [0.5, 1.0, 4.0], atol=1e-9)
+    np.testing.assert_allclose(extents[1], [2.0, 3.0, 1.0], atol=1e-9)
@@ -0,0 +1,61 @@
+import math
+
+import ifcopenshell
+import numpy as np
+import pytest
+
+from app.models.profiles import compute_profile_properties
+
+
+@pytest.fixture
+def ifc_file():
+    return ifcopenshell.file(schema='IFC4')
+
+
+def test_i_shape(ifc_file):
+    profile = ifc_file.createIfcIShapeProfileDef(
+        'AREA', OverallWidth=0.2, OverallDepth=0.4, WebThickness=0.01, FlangeThickness=0.02
+    )
+    properties = compute_profile_properties(profile)
+    # Two flanges and the web between them
+    assert properties.area == pytest.approx(2.0 * 0.2 * 0.02 + (0.4 - 2.0 * 0.02) * 0.01)
+    assert properties.perimeter == pytest.approx(4.0 * 0.2 + 2.0 * 0.4 - 2.0 * 0.01)
+    np.testing.assert_allclose(np.ptp(properties.outline, axis=0), [0.2, 0.4])
+
+
+def test_l_shape(ifc_file):
+    profile = ifc_file.createIfcLShapeProfileDef('AREA', Depth=0.1, Width=0.08, Thickness=0.01)
+    properties = compute_profile_properties(profile)
+    # Two legs sharing their corner square
+    assert properties.area == pytest.approx(0.1 * 0.01 + 0.08 * 0.01 - 0.01 * 0.01)
+    assert properties.perimeter == pytest.approx(2.0 * (0.1 + 0.08))
+
+
+def test_u_shape(ifc_file):
+    profile = ifc_file.createIfcUShapeProfileDef(
+        'AREA', Depth=0.2, FlangeWidth=0.075, WebThickness=0.0085, FlangeThickness=0.0115
+    )
+    properties = compute_profile_properties(profile)
+    assert properties.area == pytest.approx(2.0 * 0.075 * 0.0115 + (0.2 - 2.0 * 0.0115) * 0.0085)
+    assert properties.perimeter == pytest.approx(2.0 * 0.2 + 4.0 * 0.075 - 2.0 * 0.0085)
+
+
+def test_rectangle_hollow(ifc_file):
+    profile = ifc_file.createIfcRectangleHollowProfileDef('AREA', XDim=0.2, YDim=0.1, WallThickness=0.01)
+    properties = compute_profile_properties(profile)
+    assert properties.area == pytest.approx(0.2 * 0.1 - 0.18 * 0.08)
+    assert properties.perimeter == pytest.approx(2.0 * (0.2 + 0.1) + 2.0 * (0.18 + 0.08))
+
+
+def test_circle_hollow(ifc_file):
+    profile = ifc_file.createIfcCircleHollowProfileDef('AREA', Radius=0.1, WallThickness=0.01)
+    properties = compute_profile_properties(profile)
+    assert properties.area == pytest.approx(math.pi * (0.1 ** 2 - 0.09 ** 2))
+    assert properties.perimeter == pytest.approx(2.0 * math.pi * (0.1 + 0.09))
+
+
+def test_tapered_flanges_are_not_supported(ifc_file):
+    profile = ifc_file.createIfcIShapeProfileDef(
+        'AREA', OverallWidth=0.2, OverallDepth=0.4, WebThickness=0.01, FlangeThickness=0.02, FlangeSlope=0.1
+    )
+    assert compute_profile_properties(profile) is None
@@ -0,0 +1,94 @@
+import ifcopenshell
+import numpy as np
+import pytest
+
+from app.models.profile_quantities import ProfileSetQuantities
+from app.models.quantities import QuantityIndex
+
+
+def add_quantities(ifc_file, element, name, **values):
+    """Attach a quantity set of length, area and volume quantities to an element."""
+    quantities = []
+    for quantity_name, value in values.items():
+        if quantity_name.endswith('Volume'):
+            quantities.append(ifc_file.createIfcQuantityVolume(quantity_name, None, None, value))
+        elif quantity_name.endswith('Area'):
+            quantities.append(ifc_file.createIfcQuantityArea(quantity_name, None, None, value))
+        else:
+            quantities.append(ifc_file.createIfcQuantityLength(quantity_name, None, None, value))
+    quantity_set = ifc_file.createIfcElementQuantity(ifcopenshell.guid.new(), Name=name, Quantities=quantities)
+    ifc_file.createIfcRelDefinesByProperties(
+        ifcopenshell.guid.new(), RelatedObjects=[element], RelatingPropertyDefinition=quantity_set
+    )
+
+
+def rotated_placement(ifc_file, location):
+    """Local placement at a location with the X axis along world Y."""
+    return ifc_file.createIfcLocalPlacement(None, ifc_file.createIfcAxis2Placement3D(
+        ifc_file.createIfcCartesianPoint(location),
+        ifc_file.createIfcDirection((0.0, 0.0, 1.0)),
+        ifc_file.createIfcDirection((0.0, 1.0, 0.0))
+    ))
+
+
+def test_wall_box_follows_placement_rotation():
+    ifc_file = ifcopenshell.file(schema='IFC4')
+    wall = ifc_file.createIfcWall(
+        ifcopenshell.guid.new(), ObjectPlacement=rotated_placement(ifc_file, (1.0, 2.0, 0.0))
+    )
+    add_quantities(
+        ifc_file, wall, 'Qto_WallBaseQuantities',
+        Length=10.0, Width=0.2, Height=3.0, NetSideArea=30.0, NetVolume=6.0
+    )
+
+    stats = QuantityIndex(ifc_file).measure(wall)
+    np.testing.assert_allclose(stats.bbox_min, [0.9, 2.0, 0.0])
+    np.testing.assert_allclose(stats.bbox_max, [1.1, 12.0, 3.0])
+    np.testing.assert_allclose(stats.centroid, [1.0, 7.0, 1.5])
+    # Both sides plus the edges around them, as measured from geometry
+    assert stats.area == pytest.approx(2.0 * 30.0 + 2.0 * (10.0 + 3.0) * 0.2)
+    assert stats.volume == pytest.approx(6.0)
+
+
+def test_member_without_width_and_height_uses_profile():
+    ifc_file = ifcopenshell.file(schema='IFC4')
+    beam = ifc_file.createIfcBeam(ifcopenshell.guid.new())
+    add_quantities(
+        ifc_file, beam, 'Qto_BeamBaseQuantities',
+        Length=5.0, CrossSectionArea=0.06, NetSurfaceArea=5.06, NetVolume=0.3
+    )
+    profile = ifc_file.createIfcRectangleProfileDef('AREA', None, None, 0.2, 0.3)
+    profile_set = ifc_file.createIfcMaterialProfileSet(
+        None, None, [ifc_file.createIfcMaterialProfile(None, None, ifc_file.createIfcMaterial('Steel'), profile)]
+    )
+
+    quantity_index = QuantityIndex(ifc_file)
+    assert quantity_index.measure(beam) is None
+
+    cross_section = ProfileSetQuantities(ifc_file).cross_section(profile_set)
+    assert cross_section == pytest.approx((0.2, 0.3))
+    stats = quantity_index.measure(beam, cross_section)
+    np.testing.assert_allclose(stats.dimensions, [0.2, 0.3, 5.0])
+    assert stats.area == pytest.approx(5.06)
+    assert stats.volume == pytest.approx(0.3)
+
+
+def test_missing_extent_is_derived_from_volume():
+    ifc_file = ifcopenshell.file(schema='IFC4')
+    slab = ifc_file.createIfcSlab(ifcopenshell.guid.new())
+    add_quantities(
+        ifc_file, slab, 'Qto_SlabBaseQuantities',
+        Length=10.0, Depth=0.2, Perimeter=30.0, NetArea=50.0, NetVolume=10.0
+    )
+
+    stats = QuantityIndex(ifc_file).measure(slab)
+    np.testing.assert_allclose(stats.dimensions, [10.0, 5.0, 0.2])
+    assert stats.area == pytest.approx(2.0 * 50.0 + 30.0 * 0.2)
+
+
+def test_element_without_volume_is_not_measured():
+    ifc_file = ifcopenshell.file(schema='IFC4')
+    door = ifc_file.createIfcDoor(ifcopenshell.guid.new())
+    add_quantities(ifc_file, door, 'Qto_DoorBaseQuantities', Width=0.9, Height=2.1, Area=1.89)
+
+    assert QuantityIndex(ifc_file).measure(door) is None
@@ -0,0 +1,52 @@
+import ifcopenshell
+import pytest
+
+from app.models.revision_store import ElementHasher, RevisionStore
+
+WALL_GLOBAL_ID = '2O2Fr$t4X7Zf8NOew3FLOH'
+
+
+def make_revision(density, layered=False):
+    """Build a revision with one wall whose material has a MassDensity property."""
+    ifc_file = ifcopenshell.file(schema='IFC4')
+    wall = ifc_file.createIfcWall(WALL_GLOBAL_ID, Name='Wall')
+    concrete = ifc_file.createIfcMaterial('Concrete')
+    ifc_file.createIfcMaterialProperties(
+        'Pset_MaterialCommon', None,
+        [ifc_file.createIfcPropertySingleValue('MassDensity', None, ifc_file.createIfcMassDensityMeasure(density))],
+        concrete
+    )
+
+    material = concrete
+    if layered:
+        layer_set = ifc_file.createIfcMaterialLayerSet([ifc_file.createIfcMaterialLayer(concrete, 0.2)], 'Wall')
+        material = ifc_file.createIfcMaterialLayerSetUsage(layer_set, 'AXIS2', 'POSITIVE', 0.0)
+    ifc_file.createIfcRelAssociatesMaterial(
+        ifcopenshell.guid.new(), RelatedObjects=[wall], RelatingMaterial=material
+    )
+    return ifc_file, wall
+
+
+@pytest.mark.parametrize('layered', [False, True])
+def test_material_property_edit_changes_element_hash(layered):
+    # Entities are only valid while their file is referenced
+    ifc_file, wall = make_revision(2400.0, layered)
+    same_file, same_wall = make_revision(2400.0, layered)
+    edited_file, edited_wall = make_revision(2500.0, layered)
+
+    content_hash = ElementHasher(1.0).hash_element(wall)
+    assert ElementHasher(1.0).hash_element(same_wall) == content_hash
+    assert ElementHasher(1.0).hash_element(edited_wall) != content_hash
+
+
+def test_material_property_edit_is_not_reused(tmp_path):
+    store_path = str(tmp_path / 'revisions.db')
+    ifc_file, wall = make_revision(2400.0)
+    store = RevisionStore(store_path, 'project', 'settings')
+    store.put(WALL_GLOBAL_ID, ElementHasher(1.0).hash_element(wall), {'volume': 1.0})
+    store.close()
+
+    edited_file, edited_wall = make_revision(2500.0)
+    store = RevisionStore(store_path, 'project', 'settings')
+    assert store.get(WALL_GLOBAL_ID, ElementHasher(1.0).hash_element(edited_wall)) == (True, None)
+    store.close()
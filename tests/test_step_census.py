@@ -0,0 +1,67 @@
+import pytest
+
+from app.models.step_census import scan_step_file
+
+STEP_TEXT = r"""ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');
+FILE_NAME('Caf\X2\00E9\X0\.ifc','2024-05-01T10:00:00',('Architect'),('O''Brien Ltd'),'IfcOpenShell 0.8','Modeller 2024',$);
+FILE_SCHEMA(('IFC4'));
+ENDSEC;
+DATA;
+#1=IFCCARTESIANPOINT((0.,0.,0.));
+#2=IFCCARTESIANPOINT((4.,0.,0.));
+#3=IFCCARTESIANPOINT((0.,4.,0.));
+#10=IFCWALL('2O2Fr$t4X7Zf8NOew3FLOH',$,'Wall A',$,$,$,$,$,$);
+#11=IFCWALL('1kTvXnbbzCWw8lcMd1dR4o',$,'Wall B',$,$,$,$,$,$);
+#12 = IFCSLAB('3vB2YO$MX4xv5uCqZZG05x',$,'Slab',$,$,$,$,$,$);
+#13=IFCWALLSTANDARDCASE('0LV8Pk4fn0QRhk8zmCj5ZK',$,'Wall C',$,$,$,$,$,$);
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+
+@pytest.fixture
+def step_file(tmp_path):
+    path = tmp_path / 'model.ifc'
+    path.write_text(STEP_TEXT, encoding='ascii')
+    return str(path)
+
+
+def test_scan_header_and_counts(step_file):
+    census = scan_step_file(step_file)
+
+    assert census.schema_identifier == 'IFC4'
+    assert census.is_supported()
+    assert census.header['description'] == ['ViewDefinition [CoordinationView]']
+    assert census.header['implementation_level'] == '2;1'
+    assert census.header['name'] == 'Café.ifc'
+    assert census.header['organization'] == ["O'Brien Ltd"]
+    assert census.header['originating_system'] == 'Modeller 2024'
+    assert census.header['authorization'] is None
+
+    assert census.class_counts == {'IFCCARTESIANPOINT': 3, 'IFCWALL': 2, 'IFCSLAB': 1, 'IFCWALLSTANDARDCASE': 1}
+    assert census.entity_count == 7
+    # Subtypes are not counted with their supertype
+    assert census.count(['IfcWall']) == 2
+    assert census.count(['IfcWall', 'IfcSlab', 'IfcColumn']) == 3
+
+
+def test_small_chunks_give_same_counts(step_file):
+    assert scan_step_file(step_file, chunk_size=16).class_counts == scan_step_file(step_file).class_counts
+
+
+def test_unsupported_schema(tmp_path):
+    path = tmp_path / 'model.ifc'
+    path.write_text(STEP_TEXT.replace("('IFC4')", "('IFC9')"), encoding='ascii')
+    census = scan_step_file(str(path))
+    assert census.schema_identifier == 'IFC9'
+    assert not census.is_supported()
+
+
+@pytest.mark.parametrize('text', ['', 'solid cube\nendsolid cube\n', 'ISO-10303-21;\nHEADER;\nENDSEC;\n'])
+def test_rejects_files_that_are_not_step(tmp_path, text):
+    path = tmp_path / 'model.ifc'
+    path.write_text(text, encoding='ascii')
+    with pytest.raises(ValueError):
+        scan_step_file(str(path))
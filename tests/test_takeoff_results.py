@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from app.models.element_table import ElementTable
+from app.models.takeoff_results import TakeoffResults, freeze_element_material, new_element_material
+
+
+def material_data(category, grade):
+    """Get frozen material data with a category and a grade."""
+    data = new_element_material()
+    data['category'] = category
+    data['grades'].append(grade)
+    data['properties']['Density'] = 2400.0 if category == 'Concrete' else 7850.0
+    return freeze_element_material(data)
+
+
+CONCRETE = material_data('Concrete', 'C30/37')
+STEEL = material_data('Steel', 'S355')
+
+# (id, type, volume, area, surface areas, bounding box, catalog dimensions, materials)
+ELEMENTS = [
+    (1, 'IfcWall', 2.0, 21.6, (20.0, 0.8, 0.8), (4.0, 0.2, 2.5), (4.0, 0.2, 2.5),
+     [('Concrete', CONCRETE, 2.0)]),
+    (2, 'IfcBeam', 0.05, 5.0, (4.8, 0.1, 0.1), (5.0, 0.2, 0.4), (5.0, 0.2, 0.4),
+     [('Steel', STEEL, 0.05)]),
+    (3, 'IfcSlab', 10.0, 102.0, None, (10.0, 5.0, 0.2), (10.0, 5.0, 0.2),
+     [('Concrete', CONCRETE, 10.0)]),
+    (4, 'IfcWall', 2.0, 21.6, (20.0, 0.8, 0.8), (0.2, 4.0, 2.5), (4.0, 0.2, 2.5),
+     [('Concrete', CONCRETE, 1.5), ('Steel', STEEL, 0.5)]),
+    (5, 'IfcBeam', 0.07, 6.1, (5.9, 0.1, 0.1), (6.0, 0.2, 0.4), (6.0, 0.2, 0.4),
+     [('Steel', STEEL, 0.07)]),
+    (6, 'IfcWall', 1.0, 11.0, (10.0, 0.5, 0.5), (2.0, 0.2, 2.5), (2.0, 0.2, 2.5),
+     [('Concrete', CONCRETE, 1.0)]),
+]
+
+
+def aggregate(elements):
+    """Aggregate elements through an element table."""
+    table = ElementTable()
+    for element_id, element_type, volume, area, surfaces, bbox, dimensions, materials in elements:
+        table.count(element_id, element_type)
+        table.add(
+            element_id, f"{element_type} {element_id}", element_type, 'geometry', volume, area,
+            surfaces, bbox, dimensions, materials
+        )
+    return table.aggregate(TakeoffResults('precise'))
+
+
+def assert_json_close(actual, expected):
+    """Compare JSON values, allowing for rounding in floating point sums."""
+    if isinstance(expected, dict):
+        assert list(actual) == list(expected)
+        for key in expected:
+            assert_json_close(actual[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        for actual_item, expected_item in zip(actual, expected):
+            assert_json_close(actual_item, expected_item)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-12)
+    else:
+        assert actual == expected
+
+
+def test_merged_halves_match_whole():
+    whole = aggregate(ELEMENTS)
+    merged = aggregate(ELEMENTS[:3]).merge(aggregate(ELEMENTS[3:]))
+    assert_json_close(merged.to_json(), whole.to_json())
+
+
+def test_merge_is_independent_of_grouping():
+    left = aggregate(ELEMENTS[:2]).merge(aggregate(ELEMENTS[2:4]).merge(aggregate(ELEMENTS[4:])))
+    right = aggregate(ELEMENTS[:2]).merge(aggregate(ELEMENTS[2:4])).merge(aggregate(ELEMENTS[4:]))
+    assert_json_close(left.to_json(), right.to_json())
+
+
+def test_json_round_trip():
+    results = aggregate(ELEMENTS)
+    results.geometry_fallbacks.append({
+        'id': 6, 'name': 'IfcWall 6', 'element_type': 'IfcWall', 'source': 'bounding_box'
+    })
+    data = results.to_json()
+
+    # Through a JSON string, as saved takeoffs are
+    restored = TakeoffResults.from_json(json.loads(json.dumps(data)))
+    assert restored.to_json() == data
+    assert restored.element_count == len(ELEMENTS)
+    assert restored.materials['Steel'].element_types == {'IfcWall', 'IfcBeam'}
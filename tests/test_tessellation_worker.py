@@ -0,0 +1,52 @@
+import ifcopenshell
+import ifcopenshell.api
+import pytest
+
+from app.models.tessellation_worker import TessellationWorker
+
+
+@pytest.fixture
+def wall_file(tmp_path):
+    """Write a model with a single 4 x 0.2 x 2.5 m wall."""
+    ifc_file = ifcopenshell.file(schema='IFC4')
+    ifcopenshell.api.run('root.create_entity', ifc_file, ifc_class='IfcProject')
+    ifcopenshell.api.run('unit.assign_unit', ifc_file)
+    model = ifcopenshell.api.run('context.add_context', ifc_file, context_type='Model')
+    body = ifcopenshell.api.run(
+        'context.add_context', ifc_file, context_type='Model', context_identifier='Body',
+        target_view='MODEL_VIEW', parent=model
+    )
+    wall = ifcopenshell.api.run('root.create_entity', ifc_file, ifc_class='IfcWall')
+    ifcopenshell.api.run('geometry.edit_object_placement', ifc_file, product=wall)
+    representation = ifcopenshell.api.run(
+        'geometry.add_wall_representation', ifc_file, context=body, length=4.0, height=2.5, thickness=0.2
+    )
+    ifcopenshell.api.run('geometry.assign_representation', ifc_file, product=wall, representation=representation)
+
+    path = str(tmp_path / 'wall.ifc')
+    ifc_file.write(path)
+    return path, wall.id()
+
+
+def test_tessellates_element_in_worker(wall_file):
+    path, wall_id = wall_file
+    worker = TessellationWorker(path, 'precise', time_limit=60.0)
+    try:
+        stats = worker.tessellate(wall_id)
+    finally:
+        worker.close()
+    assert stats.volume == pytest.approx(4.0 * 0.2 * 2.5)
+    assert stats.area == pytest.approx(2.0 * (4.0 * 0.2 + 4.0 * 2.5 + 0.2 * 2.5))
+
+
+def test_gives_up_after_time_limit(wall_file):
+    path, wall_id = wall_file
+    worker = TessellationWorker(path, 'precise', time_limit=0.0)
+    try:
+        with pytest.raises(TimeoutError):
+            worker.tessellate(wall_id)
+        # The killed worker is replaced for the next element
+        worker.time_limit = 60.0
+        assert worker.tessellate(wall_id).volume == pytest.approx(2.0)
+    finally:
+        worker.close()